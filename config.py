@@ -13,7 +13,15 @@ DB_PATH = os.path.join(BASE_DIR, DB_NAME)
 PREFS_NAME = "user_prefs.json"  
 PREFS_PATH = os.path.join(BASE_DIR, PREFS_NAME)  
   
-# 3. 支持的文件格式  
+# 3. 【新增】元数据写回日志 (未落盘的 .am_meta.json 编辑，崩溃后启动时重放)  
+META_JOURNAL_NAME = "meta_journal.log"  
+META_JOURNAL_PATH = os.path.join(BASE_DIR, META_JOURNAL_NAME)  
+  
+# 4. 【新增】缩略图库 (独立的 SQLite 文件，与主库并排存放)  
+THUMB_DB_NAME = "assets_thumbs.db"  
+THUMB_DB_PATH = os.path.join(BASE_DIR, THUMB_DB_NAME)  
+  
+# 5. 支持的文件格式  
 SUPPORTED_EXTS = {  
     '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', # 图片  
     '.mp4', '.mov', '.avi', '.mkv',                           # 视频  
@@ -0,0 +1,47 @@
+# G:\PYthon\AssetManager\core\atomic_io.py
+
+import os
+import json
+import tempfile
+import platform
+
+_IS_WINDOWS = platform.system() == "Windows"
+FILE_ATTRIBUTE_HIDDEN = 0x02
+FILE_ATTRIBUTE_NORMAL = 0x80
+
+def set_hidden(path, hidden=True):
+    """Windows 下直接调用 SetFileAttributesW 设置隐藏属性 (代替每次启动 attrib 子进程)"""
+    if not _IS_WINDOWS: return
+    try:
+        import ctypes
+        attrs = FILE_ATTRIBUTE_HIDDEN if hidden else FILE_ATTRIBUTE_NORMAL
+        ctypes.windll.kernel32.SetFileAttributesW(str(path), attrs)
+    except Exception:
+        pass
+
+def atomic_write_text(path, text, hidden=False):
+    """
+    原子写入：先写同目录下的临时文件并 fsync，再 os.replace 覆盖目标。
+    任何时刻目标文件要么是旧内容，要么是完整的新内容。
+    临时文件名以目标文件名开头，扫描时可按前缀统一忽略。
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # 隐藏 / 只读的目标在 Windows 上可能拒绝被覆盖，先恢复普通属性
+        if hidden and os.path.exists(path): set_hidden(path, False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hidden: set_hidden(path, True)
+
+def atomic_write_json(path, data, hidden=False):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2), hidden)
@@ -1,16 +1,132 @@
 import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
 from config import DB_PATH
 
+# === 连接调优参数 (每个连接打开时设置一次) ===
+BUSY_TIMEOUT = 30            # 秒，写锁被占用时的等待时间
+CACHED_STATEMENTS = 256      # 预编译语句缓存条数
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024    # cache_size 取负值表示 KB
+
+class _ThreadSlot:
+    """单个线程持有的连接 + 事务嵌套深度。线程结束、slot 被回收时自动关闭连接。"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.depth = 0
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+            self.conn = None
+
+    def __del__(self):
+        self.close()
+
 class DBManager:
+    """
+    按线程池化的 SQLite 连接管理器。
+    - 每个线程复用一条长连接 (WAL / synchronous=NORMAL / mmap / 语句缓存)
+    - session() 提供共享的事务上下文，嵌套调用通过 SAVEPOINT 复用同一事务
+    """
     def __init__(self, db_path=DB_PATH):
         self.db_path = db_path
+        self._local = threading.local()
+        self._slots = weakref.WeakSet()
+        self._lock = threading.Lock()
 
-    def get_connection(self):
-        """获取数据库连接，设置 row_factory 以便像字典一样访问数据"""
-        conn = sqlite3.connect(self.db_path)
+    def _open(self):
+        # isolation_level=None: 由 session() 显式管理 BEGIN/COMMIT，避免驱动隐式开事务
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
         # 这一步很关键：让查询结果可以通过 row['name'] 访问，而不是 row[0]
-        conn.row_factory = sqlite3.Row 
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
         return conn
 
+    def _slot(self):
+        slot = getattr(self._local, "slot", None)
+        if slot is None or slot.conn is None:
+            slot = _ThreadSlot(self._open())
+            self._local.slot = slot
+            with self._lock:
+                self._slots.add(slot)
+        return slot
+
+    def get_connection(self):
+        """
+        获取当前线程的池化连接 (自动提交模式)。
+        注意：连接由管理器持有，调用方不要 close()；需要写入请使用 session()。
+        """
+        return self._slot().conn
+
+    @contextmanager
+    def session(self):
+        """
+        共享事务上下文：
+            with db.session() as conn:
+                conn.execute(...)
+        最外层 BEGIN IMMEDIATE / COMMIT，内层嵌套使用 SAVEPOINT，
+        因此批量编辑中调用的各个服务方法会落在同一连接、同一事务里。
+        """
+        slot = self._slot()
+        conn = slot.conn
+        depth = slot.depth
+        savepoint = f"sp_{depth}"
+        conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+        slot.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            slot.depth -= 1
+            if depth == 0:
+                if conn.in_transaction: conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            slot.depth -= 1
+            conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+
+    def in_session(self):
+        """当前线程是否处于 session() 事务中"""
+        slot = getattr(self._local, "slot", None)
+        return bool(slot and slot.depth)
+
+    def close(self):
+        """关闭当前线程的连接"""
+        slot = getattr(self._local, "slot", None)
+        if slot is not None:
+            slot.close()
+            self._local.slot = None
+
+    def optimize(self):
+        """程序退出前调用：让 SQLite 按需更新查询规划器的统计信息 (sqlite_stat1)"""
+        try:
+            self.get_connection().execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """程序退出时调用：关闭所有线程的连接"""
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            slot.close()
+
 # 单例模式：在其他地方直接导入这个实例
-db = DBManager()
\ No newline at end of file
+db = DBManager()
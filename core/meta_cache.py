@@ -0,0 +1,324 @@
+# G:\PYthon\AssetManager\core\meta_cache.py
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from config import META_JOURNAL_PATH
+from core.atomic_io import atomic_write_json
+
+# === 写回参数 ===
+FLUSH_DELAY = 1.5          # 秒，最后一次编辑之后多久落盘 (防抖)
+FLUSH_MAX_DELAY = 10.0     # 秒，连续编辑时最长不超过这个时间必须落盘一次
+CLEAN_CACHE_SIZE = 16      # 已落盘的 meta 在内存里最多保留几份 (LRU)
+OWN_WRITE_MEMORY = 256     # 记住最近多少个目录的自身写入
+
+def _copy_item(item):
+    if not isinstance(item, dict): return item
+    copied = dict(item)
+    for key, val in copied.items():
+        if isinstance(val, list): copied[key] = list(val)
+    return copied
+
+def _copy_meta(meta):
+    """分层拷贝：调用方可以随意改动返回值，不会污染缓存里的数据"""
+    copied = dict(meta)
+    for section in ("files", "sub_folders"):
+        items = meta.get(section)
+        if isinstance(items, dict):
+            copied[section] = {name: _copy_item(info) for name, info in items.items()}
+    for section in ("folder_info", "stats"):
+        if isinstance(meta.get(section), dict):
+            copied[section] = _copy_item(meta[section])
+    return copied
+
+def _find_item(meta, filename):
+    files = meta.get("files")
+    if isinstance(files, dict) and filename in files: return files
+    folders = meta.get("sub_folders")
+    if isinstance(folders, dict) and filename in folders: return folders
+    return None
+
+class _Entry:
+    __slots__ = ("path", "meta", "stamp", "dirty")
+    def __init__(self, path, meta, stamp):
+        self.path = path
+        self.meta = meta
+        self.stamp = stamp      # 文件 (mtime_ns, size)，用于发现外部修改
+        self.dirty = False
+
+class MetaCache:
+    """
+    .am_meta.json 的进程内写回缓存 (write-behind)。
+    - edit() 只修改内存并向日志追加一行，由防抖定时器把同一文件的多次编辑合并成一次写入
+    - 落盘使用临时文件 + rename；进程崩溃时未落盘的编辑留在日志里，启动时 replay_journal() 重放
+    - 已落盘的 meta 保留在一个小 LRU 里，读取前用文件 (mtime, size) 校验是否被外部改动
+    """
+    def __init__(self, journal_path=META_JOURNAL_PATH):
+        self.journal_path = journal_path
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()       # meta_path -> _Entry
+        self._journal = None
+        self._timer = None
+        self._first_dirty_at = 0.0
+        self._last_dirty_at = 0.0
+        self._own_writes = OrderedDict()    # 目录 -> 我们最后一次写入后的目录 mtime
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _live(self, meta_path):
+        """返回缓存中的原始对象 (不拷贝)，必要时从磁盘加载。调用方需持有锁。"""
+        key = self._key(meta_path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.dirty or entry.stamp == self._stamp(meta_path):
+                self._entries.move_to_end(key)
+                return entry.meta
+            del self._entries[key]
+
+        stamp = self._stamp(meta_path)
+        if stamp is None: return None
+        meta = self._read(meta_path)
+        if not isinstance(meta, dict): return None
+        self._entries[key] = _Entry(meta_path, meta, stamp)
+        self._trim()
+        return meta
+
+    def _trim(self):
+        clean = [k for k, e in self._entries.items() if not e.dirty]
+        for key in clean[:max(0, len(clean) - CLEAN_CACHE_SIZE)]:
+            del self._entries[key]
+
+    def _write(self, entry):
+        atomic_write_json(entry.path, entry.meta, hidden=True)
+        entry.stamp = self._stamp(entry.path)
+        entry.dirty = False
+        self._note_own_write(os.path.dirname(entry.path))
+
+    # === 自身写入识别 (供文件监控忽略自己触发的目录变动) ===
+    def _note_own_write(self, folder):
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            return
+        key = self._key(folder)
+        self._own_writes[key] = mtime
+        self._own_writes.move_to_end(key)
+        while len(self._own_writes) > OWN_WRITE_MEMORY:
+            self._own_writes.popitem(last=False)
+
+    def is_own_write(self, folder):
+        """目录当前的 mtime 正好是我们最后一次写 meta 之后的值 → 这次变动是自己造成的"""
+        with self._lock:
+            mtime = self._own_writes.get(self._key(folder))
+        if mtime is None: return False
+        try:
+            return os.stat(folder).st_mtime_ns == mtime
+        except OSError:
+            return False
+
+    # === 读写接口 ===
+    def load(self, meta_path):
+        """读取 meta (含尚未落盘的编辑)，返回可自由修改的副本；文件不存在或损坏返回 None"""
+        with self._lock:
+            meta = self._live(meta_path)
+            return _copy_meta(meta) if meta is not None else None
+
+    def save(self, meta_path, meta):
+        """整体写入 (直写)：立即原子落盘，同时替换缓存内容"""
+        with self._lock:
+            key = self._key(meta_path)
+            entry = _Entry(meta_path, _copy_meta(meta), None)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            try:
+                self._write(entry)
+            except Exception:
+                # 写失败时保留为脏数据，交给下一次 flush 重试
+                entry.dirty = True
+                self._schedule()
+                raise
+            finally:
+                self._trim()
+
+    def edit(self, meta_path, filename, key, value):
+        """
+        修改单个条目的一个字段 (value 可以是 旧值 -> 新值 的函数)。
+        只改内存并记日志，返回该条目更新后的副本；条目不存在返回 None。
+        """
+        with self._lock:
+            meta = self._live(meta_path)
+            if meta is None: return None
+            target = _find_item(meta, filename)
+            if target is None: return None
+
+            current_val = target[filename].get(key)
+            new_val = value(current_val) if callable(value) else value
+            target[filename][key] = new_val
+
+            self._entries[self._key(meta_path)].dirty = True
+            self._append_journal({"path": meta_path, "name": filename, "key": key, "value": new_val})
+            self._schedule()
+            return _copy_item(target[filename])
+
+    def edit_many(self, meta_path, key, values):
+        """
+        批量修改同一个 meta 中多个条目的同一字段：values = {filename: 新值或 旧值 -> 新值 的函数}。
+        一次加锁、一次写日志，返回 {filename: 更新后的副本} (不存在的条目跳过)。
+        """
+        with self._lock:
+            meta = self._live(meta_path)
+            if meta is None: return {}
+            updated, records = {}, []
+            for filename, value in values.items():
+                target = _find_item(meta, filename)
+                if target is None: continue
+                current_val = target[filename].get(key)
+                new_val = value(current_val) if callable(value) else value
+                target[filename][key] = new_val
+                updated[filename] = _copy_item(target[filename])
+                records.append({"path": meta_path, "name": filename, "key": key, "value": new_val})
+            if records:
+                self._entries[self._key(meta_path)].dirty = True
+                self._append_journal(*records)
+                self._schedule()
+            return updated
+
+    # === 日志 ===
+    def _append_journal(self, *records):
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            # 只需进入操作系统缓冲即可应对进程崩溃，不逐条 fsync
+            self._journal.flush()
+        except Exception as e:
+            logging.error(f"写入元数据日志失败: {e}")
+
+    def _reset_journal(self):
+        if self._journal is not None:
+            try:
+                self._journal.close()
+            except Exception:
+                pass
+            self._journal = None
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"清理元数据日志失败: {e}")
+
+    def replay_journal(self):
+        """启动时调用：把上次未落盘的编辑重放到各自的 .am_meta.json，返回重放的条数"""
+        with self._lock:
+            if not os.path.exists(self.journal_path): return 0
+            grouped = OrderedDict()
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue    # 崩溃时写了一半的最后一行
+                        grouped.setdefault(record["path"], []).append(record)
+            except OSError as e:
+                logging.error(f"读取元数据日志失败: {e}")
+                return 0
+
+            replayed = 0
+            for meta_path, records in grouped.items():
+                meta = self._read(meta_path)
+                if not isinstance(meta, dict): continue
+                for record in records:
+                    target = _find_item(meta, record["name"])
+                    if target is None: continue
+                    target[record["name"]][record["key"]] = record["value"]
+                    replayed += 1
+                try:
+                    atomic_write_json(meta_path, meta, hidden=True)
+                except Exception as e:
+                    logging.error(f"重放元数据日志失败 ({meta_path}): {e}")
+                    return replayed
+                self._entries.pop(self._key(meta_path), None)
+
+            self._reset_journal()
+            return replayed
+
+    # === 落盘 ===
+    def _schedule(self):
+        """
+        调用方需持有锁。定时器只在第一次变脏时启动，之后的编辑只记录时间，不再为每次编辑新建线程；
+        到期时若仍在连续编辑则顺延 (见 _on_timer)。
+        """
+        now = time.monotonic()
+        if not self._first_dirty_at: self._first_dirty_at = now
+        self._last_dirty_at = now
+        if self._timer is not None: return
+        self._arm(FLUSH_DELAY)
+
+    def _arm(self, delay):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            # flush() 已取消并替换了这个定时器
+            if self._timer is not threading.current_thread(): return
+            # 最后一次编辑后安静 FLUSH_DELAY 秒再写，但从第一次变脏起最多等 FLUSH_MAX_DELAY 秒
+            due = min(self._last_dirty_at + FLUSH_DELAY, self._first_dirty_at + FLUSH_MAX_DELAY)
+            remaining = due - time.monotonic()
+            if remaining > 0:
+                self._arm(remaining)
+                return
+            self.flush()
+
+    def flush(self):
+        """把所有脏 meta 写回磁盘，全部成功后清空日志。程序退出时也要调用一次。"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._first_dirty_at = 0.0
+
+            failed = False
+            for key, entry in list(self._entries.items()):
+                if not entry.dirty: continue
+                if not os.path.isdir(os.path.dirname(entry.path)):
+                    del self._entries[key]      # 文件夹已被删除/移走，编辑随之作废
+                    continue
+                try:
+                    self._write(entry)
+                except Exception as e:
+                    failed = True
+                    logging.error(f"元数据写回失败 ({entry.path}): {e}")
+
+            if failed:
+                self._schedule()
+            else:
+                self._reset_journal()
+            self._trim()
+
+# 单例模式：在其他地方直接导入这个实例
+meta_cache = MetaCache()
@@ -0,0 +1,170 @@
+# G:\PYthon\AssetManager\core\tree_walker.py
+
+import os
+import queue
+import threading
+from collections import deque, namedtuple
+
+# === 并行遍历参数 ===
+WALK_WORKERS = min(8, (os.cpu_count() or 4) * 2)   # 目录枚举以 I/O 延迟为主，线程数可以多于核心数
+PER_VOLUME_LIMIT = 4                                # 同一个卷上同时枚举的目录数 (机械硬盘不宜过高)
+RESULT_QUEUE_SIZE = 256                             # 结果队列上限，消费者处理不过来时工作线程会等待
+
+# 一个目录的枚举结果：files / folders 为 {名称: 条目记录}，error 为枚举失败时的异常
+DirResult = namedtuple("DirResult", "path rel depth files folders error")
+
+def make_entry_record(name, stat, is_dir):
+    """
+    单个条目的物理层记录 (LocalStoreService 扫描与并行遍历共用，保证字段一致)。
+    stat 可以直接使用 os.DirEntry.stat() 的结果 (Windows 上来自目录枚举缓存)。
+    """
+    common_info = {
+        "ctime": stat.st_ctime,
+        "mtime": stat.st_mtime,
+        "atime": stat.st_atime,
+    }
+    if is_dir:
+        return {**common_info, "size": 0, "type": "FOLDER"}
+    _, ext = os.path.splitext(name)
+    return {**common_info, "size": stat.st_size, "ext": ext.lower()}
+
+def volume_key(path, stat=None):
+    """区分物理卷：Windows 用盘符 / UNC 共享，其他系统用 st_dev"""
+    drive = os.path.splitdrive(os.path.abspath(path))[0]
+    if drive: return drive.upper()
+    try:
+        return (stat or os.stat(path)).st_dev
+    except OSError:
+        return None
+
+class TreeWalker:
+    """
+    并行目录遍历器 (工作窃取)：
+    - 每个工作线程有自己的双端队列，新发现的子目录压入自己队列的尾部 (深度优先，局部性好)
+    - 自己的队列空了就从其他线程队列的头部窃取 (偷走的是较浅、通常较大的子树)
+    - 每个卷有并发上限，某个卷达到上限时线程会先去处理其他卷的目录
+    用法：
+        for result in TreeWalker(max_depth=0).walk([root], should_stop=thread.isInterruptionRequested):
+            ...
+    提前退出循环 (break / 生成器被关闭) 会让所有工作线程停止。
+    """
+    def __init__(self, workers=WALK_WORKERS, per_volume=PER_VOLUME_LIMIT, max_depth=0, skip_prefixes=()):
+        self.workers = max(1, int(workers))
+        self.per_volume = max(1, int(per_volume))
+        self.max_depth = max_depth          # 0 = 不限深度
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    def walk(self, roots, should_stop=None):
+        return _WalkRun(self, roots, should_stop).results()
+
+    def scan_dir(self, path, rel, depth):
+        """枚举单个目录，返回 (DirResult, 子目录任务列表)"""
+        files, folders, subdirs = {}, {}, []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if self.skip_prefixes and name.startswith(self.skip_prefixes): continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if not is_dir and not entry.is_file(): continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        folders[name] = make_entry_record(name, stat, True)
+                        if not self.max_depth or depth < self.max_depth:
+                            subdirs.append((entry.path, os.path.join(rel, name) if rel else name, depth + 1,
+                                            volume_key(entry.path, stat)))
+                    else:
+                        files[name] = make_entry_record(name, stat, False)
+        except OSError as e:
+            return DirResult(path, rel, depth, files, folders, e), []
+        return DirResult(path, rel, depth, files, folders, None), subdirs
+
+class _WalkRun:
+    """一次 walk() 的运行状态"""
+    def __init__(self, walker, roots, should_stop):
+        self.walker = walker
+        self.should_stop = should_stop
+        self.deques = [deque() for _ in range(walker.workers)]
+        self.cond = threading.Condition()
+        self.outstanding = 0            # 已排队 + 正在处理的目录数
+        self.in_use = {}                # 卷 -> 正在枚举的目录数
+        self.done = False
+        self.stopped = False
+        self.out = queue.Queue(RESULT_QUEUE_SIZE)
+        for i, root in enumerate(roots):
+            self.deques[i % walker.workers].append((root, "", 0, volume_key(root)))
+            self.outstanding += 1
+        if not self.outstanding: self.done = True
+
+    def _runnable(self, task):
+        return self.in_use.get(task[3], 0) < self.walker.per_volume
+
+    def _take(self, wid):
+        """取一个可执行的任务：先自己队列的尾部，再窃取其他队列的头部。没有任务且全部完成时返回 None"""
+        with self.cond:
+            while True:
+                if self.stopped or self.done: return None
+                own = self.deques[wid]
+                if own and self._runnable(own[-1]):
+                    task = own.pop()
+                else:
+                    task = None
+                    for offset in range(1, len(self.deques)):
+                        victim = self.deques[(wid + offset) % len(self.deques)]
+                        if victim and self._runnable(victim[0]):
+                            task = victim.popleft()
+                            break
+                if task is not None:
+                    self.in_use[task[3]] = self.in_use.get(task[3], 0) + 1
+                    return task
+                self.cond.wait(0.05)
+
+    def _worker(self, wid):
+        while True:
+            task = self._take(wid)
+            if task is None: return
+            path, rel, depth, vol = task
+            result, subdirs = self.walker.scan_dir(path, rel, depth)
+            with self.cond:
+                self.in_use[vol] -= 1
+                self.deques[wid].extend(subdirs)
+                self.outstanding += len(subdirs)
+                self.cond.notify_all()
+
+            while not self.stopped:
+                try:
+                    self.out.put(result, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            # 结果入队之后才递减计数：done 为真时所有结果必然已经在队列里
+            with self.cond:
+                self.outstanding -= 1
+                if self.outstanding == 0:
+                    self.done = True
+                    self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def results(self):
+        threads = [threading.Thread(target=self._worker, args=(i,), daemon=True, name=f"TreeWalker-{i}")
+                   for i in range(self.walker.workers)]
+        for t in threads: t.start()
+        try:
+            while True:
+                if self.should_stop and self.should_stop(): return
+                try:
+                    yield self.out.get(timeout=0.05)
+                except queue.Empty:
+                    with self.cond:
+                        if self.done and self.out.empty(): return
+        finally:
+            # 正常结束或提前退出都会走到这里；工作线程处理完手头的目录后退出
+            self.stop()
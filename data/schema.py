@@ -1,53 +1,457 @@
 ﻿# G:\PYthon\AssetManager\data\schema.py
 
+import os
+import json
+import logging
+import sqlite3
 from core.db_manager import db
 
+# === 版本化迁移 (PRAGMA user_version) ===
+# 每个迁移函数在同一个事务里执行，成功后把 user_version 写成对应版本号。
+# 新增结构变更时：追加一个 _migrate_vN 函数并登记到 MIGRATIONS 末尾，不要修改已发布的迁移。
+
+def _column_exists(conn, table, column):
+    return any(row["name"] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+def _migrate_v1(conn):
+    """基础表结构 (与旧版 init_tables 一致，IF NOT EXISTS 保证老库可重复执行)"""
+    # 1. 硬盘卷表
+    conn.execute('''CREATE TABLE IF NOT EXISTS volumes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        serial_number TEXT UNIQUE NOT NULL,
+        name TEXT,
+        mount_point TEXT,
+        is_active INTEGER DEFAULT 0
+    )''')
+
+    # 2. 资源表 (增加了 type 字段记录扩展名类型)
+    conn.execute('''CREATE TABLE IF NOT EXISTS assets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        parent_id INTEGER,
+        volume_id INTEGER,
+        name TEXT,
+        path TEXT,
+        type TEXT,
+        size INTEGER,
+        rating INTEGER DEFAULT 0,
+        color TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(volume_id) REFERENCES volumes(id)
+    )''')
+
+    # 3. 标签表
+    conn.execute('CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+
+    # 4. 资产-标签关联表
+    conn.execute('''CREATE TABLE IF NOT EXISTS asset_tags (
+        asset_id INTEGER, tag_id INTEGER,
+        PRIMARY KEY (asset_id, tag_id))''')
+
+    # 5. 收藏颜色表 (Global Color Palette)
+    # hex_value: 颜色代码 (如 #FF5733)
+    # name: 颜色名称 (可选，预留给未来功能)
+    # added_at: 用于排序，让最近收藏的排在前面
+    conn.execute('''CREATE TABLE IF NOT EXISTS saved_colors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hex_value TEXT UNIQUE NOT NULL,
+        name TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+def _legacy_volume_id(conn, drive, cache):
+    """盘符 -> 卷 id (与 AssetService.get_volume_id_by_path 的查找 / 自动注册规则一致)"""
+    volume_id = cache.get(drive)
+    if volume_id is not None: return volume_id
+    row = conn.execute('SELECT id FROM volumes WHERE mount_point = ? ORDER BY is_active DESC, id LIMIT 1', (drive,)).fetchone()
+    if row is None:
+        row = conn.execute('SELECT id FROM volumes WHERE serial_number = ?', (f"AUTO_{drive}",)).fetchone()
+    if row is None:
+        cur = conn.execute('INSERT INTO volumes (mount_point, is_active, name, serial_number) VALUES (?, 1, ?, ?)',
+                           (drive, "自动发现硬盘", f"AUTO_{drive}"))
+        volume_id = cur.lastrowid
+    else:
+        volume_id = row[0]
+    cache[drive] = volume_id
+    return volume_id
+
+def _rekey_legacy_volumes(conn):
+    """
+    旧版加载线程把所有资源都写成 volume_id = 1。按 path 中的盘符找出 (或注册) 真正的卷并改写 volume_id，
+    否则不同盘上卷内路径相同的文件会被当成重复项，去掉 path 后也只能拼出卷 1 的完整路径。
+    改写后与已有行 (新版同步按正确卷写入的同一文件) 冲突时，把旧行的标签 / 星级 / 颜色并入已有行再删除旧行。
+    """
+    if not _column_exists(conn, "assets", "path"): return
+    cache = {}
+    moves = []
+    for row in conn.execute("SELECT id, volume_id, path FROM assets WHERE path IS NOT NULL").fetchall():
+        drive = os.path.splitdrive(row["path"])[0].upper()
+        if not drive: continue
+        volume_id = _legacy_volume_id(conn, drive, cache)
+        if volume_id != row["volume_id"]: moves.append((row["id"], volume_id))
+    if not moves: return
+
+    conn.execute("CREATE TEMP TABLE _volume_moves (id INTEGER PRIMARY KEY, volume_id INTEGER)")
+    conn.executemany("INSERT INTO _volume_moves (id, volume_id) VALUES (?, ?)", moves)
+    conn.execute('''CREATE TEMP TABLE _volume_merges AS
+        SELECT m.id AS old_id, k.id AS keep_id FROM _volume_moves m
+        JOIN assets a ON a.id = m.id
+        JOIN assets k ON k.volume_id = m.volume_id AND k.rel_path = a.rel_path AND k.id <> m.id
+        WHERE a.rel_path IS NOT NULL AND k.id NOT IN (SELECT id FROM _volume_moves)''')
+    merged = conn.execute("SELECT COUNT(*) FROM _volume_merges").fetchone()[0]
+    if merged:
+        conn.execute('''INSERT OR IGNORE INTO asset_tags (asset_id, tag_id)
+            SELECT g.keep_id, t.tag_id FROM _volume_merges g JOIN asset_tags t ON t.asset_id = g.old_id''')
+        conn.execute('''UPDATE assets SET
+            rating = CASE WHEN COALESCE(rating, 0) = 0
+                          THEN (SELECT o.rating FROM _volume_merges g JOIN assets o ON o.id = g.old_id WHERE g.keep_id = assets.id)
+                          ELSE rating END,
+            color = CASE WHEN COALESCE(color, '') = ''
+                         THEN (SELECT o.color FROM _volume_merges g JOIN assets o ON o.id = g.old_id WHERE g.keep_id = assets.id)
+                         ELSE color END
+            WHERE id IN (SELECT keep_id FROM _volume_merges)''')
+        conn.execute("DELETE FROM asset_tags WHERE asset_id IN (SELECT old_id FROM _volume_merges)")
+        conn.execute("DELETE FROM assets WHERE id IN (SELECT old_id FROM _volume_merges)")
+        conn.execute("DELETE FROM _volume_moves WHERE id IN (SELECT old_id FROM _volume_merges)")
+    conn.execute('''UPDATE assets SET volume_id = (SELECT m.volume_id FROM _volume_moves m WHERE m.id = assets.id)
+        WHERE id IN (SELECT id FROM _volume_moves)''')
+    conn.execute("DROP TABLE _volume_merges")
+    conn.execute("DROP TABLE _volume_moves")
+    print(f"  [v] 已按盘符修正旧资源的卷: {len(moves)} 条 (合并重复 {merged} 条)")
+
+def _migrate_v2(conn):
+    """
+    资源唯一键 + 筛选索引：
+    1. 新增 rel_path (卷内相对路径)；回填前先按 path 的盘符修正旧数据的 volume_id (旧版一律写成 1)
+    2. 回填 rel_path
+    3. 一次性去重：INSERT OR REPLACE 在没有唯一约束时每次打开文件夹都会追加重复行，
+       同一 (volume_id, rel_path) 只保留最新的一行 (它携带最近一次同步的元数据)
+    4. 建立 (volume_id, rel_path) 唯一索引及 path / 类型 / 星级 / 颜色 / 标签反查索引
+    """
+    if not _column_exists(conn, "assets", "rel_path"):
+        conn.execute("ALTER TABLE assets ADD COLUMN rel_path TEXT")
+    _rekey_legacy_volumes(conn)
+
+    cur = conn.execute("SELECT id, path FROM assets WHERE rel_path IS NULL AND path IS NOT NULL")
+    while True:
+        rows = cur.fetchmany(5000)
+        if not rows: break
+        conn.executemany("UPDATE assets SET rel_path = ? WHERE id = ?",
+                         [(os.path.splitdrive(row["path"])[1], row["id"]) for row in rows])
+
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS _dup_assets AS
+        SELECT a.id AS old_id FROM assets a
+        JOIN (SELECT volume_id, rel_path, MAX(id) AS keep_id FROM assets
+              GROUP BY volume_id, rel_path HAVING COUNT(*) > 1) k
+          ON a.volume_id IS k.volume_id AND a.rel_path IS k.rel_path
+        WHERE a.id <> k.keep_id''')
+    removed = conn.execute("SELECT COUNT(*) FROM _dup_assets").fetchone()[0]
+    conn.execute("DELETE FROM asset_tags WHERE asset_id IN (SELECT old_id FROM _dup_assets)")
+    conn.execute("DELETE FROM assets WHERE id IN (SELECT old_id FROM _dup_assets)")
+    conn.execute("DROP TABLE _dup_assets")
+    # 顺带清理 remove_from_db 之后残留的孤儿关联
+    conn.execute("DELETE FROM asset_tags WHERE asset_id NOT IN (SELECT id FROM assets)")
+    if removed:
+        print(f"  [-] 已清理重复资源记录: {removed} 条")
+
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_assets_volume_rel ON assets(volume_id, rel_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_path ON assets(path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_type ON assets(type, volume_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_rating ON assets(rating, volume_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_color ON assets(color, volume_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_asset_tags_tag ON asset_tags(tag_id, asset_id)")
+
+def _fts_tokenizer(conn):
+    """优先 trigram (子串 / 中文匹配)，老版本 SQLite 不支持时退回 unicode61"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._fts_probe")
+        return "trigram"
+    except Exception:
+        return "unicode61 remove_diacritics 2"
+
+# 某个资源的全部标签名，空格拼接 (供 FTS 触发器使用)
+_FTS_TAGS_OF = "(SELECT group_concat(t.name, ' ') FROM asset_tags at JOIN tags t ON t.id = at.tag_id WHERE at.asset_id = {id})"
+# 路径分段：把分隔符替换成空格，文件夹名也能被检索到
+_FTS_SEGMENTS_OF = "replace(replace({rel}, '\\', ' '), '/', ' ')"
+
+def _migrate_v3(conn):
+    """
+    全文索引 assets_fts (rowid = assets.id)：文件名 / 路径分段 / 类型 / 标签名。
+    由 assets、tags、asset_tags 上的触发器保持同步，支持 bm25 排序。
+    """
+    tokenizer = _fts_tokenizer(conn)
+    conn.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+        name, segments, type, tags, tokenize = "{tokenizer}")''')
+
+    new_tags = _FTS_TAGS_OF.format(id="new.id")
+    new_segments = _FTS_SEGMENTS_OF.format(rel="new.rel_path")
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_assets_fts_insert AFTER INSERT ON assets BEGIN
+        INSERT INTO assets_fts(rowid, name, segments, type, tags)
+        VALUES (new.id, new.name, {new_segments}, new.type, {new_tags});
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_assets_fts_update AFTER UPDATE OF name, rel_path, type ON assets BEGIN
+        UPDATE assets_fts SET name = new.name, segments = {new_segments}, type = new.type
+        WHERE rowid = new.id;
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_assets_fts_delete AFTER DELETE ON assets BEGIN
+        DELETE FROM assets_fts WHERE rowid = old.id;
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_asset_tags_fts_insert AFTER INSERT ON asset_tags BEGIN
+        UPDATE assets_fts SET tags = {_FTS_TAGS_OF.format(id="new.asset_id")} WHERE rowid = new.asset_id;
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_asset_tags_fts_delete AFTER DELETE ON asset_tags BEGIN
+        UPDATE assets_fts SET tags = {_FTS_TAGS_OF.format(id="old.asset_id")} WHERE rowid = old.asset_id;
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tags_fts_update AFTER UPDATE OF name ON tags BEGIN
+        UPDATE assets_fts SET tags = {_FTS_TAGS_OF.format(id="assets_fts.rowid")}
+        WHERE rowid IN (SELECT asset_id FROM asset_tags WHERE tag_id = new.id);
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tags_fts_delete AFTER DELETE ON tags BEGIN
+        UPDATE assets_fts SET tags = {_FTS_TAGS_OF.format(id="assets_fts.rowid")}
+        WHERE rowid IN (SELECT asset_id FROM asset_tags WHERE tag_id = old.id);
+    END''')
+
+    # 回填已有资源
+    conn.execute("DELETE FROM assets_fts")
+    conn.execute(f'''INSERT INTO assets_fts(rowid, name, segments, type, tags)
+        SELECT a.id, a.name, {_FTS_SEGMENTS_OF.format(rel="a.rel_path")}, a.type, {_FTS_TAGS_OF.format(id="a.id")}
+        FROM assets a''')
+
+def _migrate_v4(conn):
+    """
+    后台索引：
+    - library_roots: 登记的资源库根目录 (crawl_started / last_indexed 用于判断一轮爬取是否完成)
+    - index_jobs: 可恢复的目录任务队列，每个目录一行；state 0=待处理 1=处理中 3=失败，完成即删除
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS library_roots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT UNIQUE NOT NULL,
+        volume_id INTEGER,
+        enabled INTEGER DEFAULT 1,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        crawl_started REAL,
+        last_indexed REAL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS index_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        root_id INTEGER NOT NULL,
+        path TEXT UNIQUE NOT NULL,
+        state INTEGER DEFAULT 0,
+        attempts INTEGER DEFAULT 0,
+        last_error TEXT,
+        updated_at REAL
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_index_jobs_state ON index_jobs(state, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_index_jobs_root ON index_jobs(root_id, state)")
+
+def _migrate_v5(conn):
+    """
+    结构化查询 (services/search_query.py) 需要的列与索引：
+    - assets.mtime (文件修改时间，由同步写入；老数据为 NULL，下次打开对应文件夹时回填)
+    - size / mtime 范围条件走索引
+    规划器能否选中这些索引不依赖统计信息 (迁移时库通常还是空的)，
+    由 search_query 给字段条件加的选择性提示保证，见 tests/test_search_plan.py
+    """
+    if not _column_exists(conn, "assets", "mtime"):
+        conn.execute("ALTER TABLE assets ADD COLUMN mtime REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_size ON assets(size)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_mtime ON assets(mtime)")
+
+def _migrate_v6(conn):
+    """
+    资源只以 (volume_id, rel_path) 为键，去掉保存绝对路径的 path 列：
+    完整路径在查询时由 volumes.mount_point 拼出，换盘符不再需要重建资源记录。
+    去掉 path 之前先按盘符修正仍是 volume_id = 1 的旧行，这是最后一次能从 path 推出真实卷的机会。
+    """
+    _rekey_legacy_volumes(conn)
+    conn.execute("DROP INDEX IF EXISTS idx_assets_path")
+    if _column_exists(conn, "assets", "path"):
+        try:
+            conn.execute("ALTER TABLE assets DROP COLUMN path")
+        except sqlite3.OperationalError:
+            # SQLite < 3.35 不支持 DROP COLUMN：保留空列，不再读写
+            conn.execute("UPDATE assets SET path = NULL")
+
+def _load_legacy_json(filepath):
+    if not os.path.exists(filepath): return []
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except Exception as e:
+        logging.warning(f"旧数据文件读取失败，跳过导入: {filepath} - {e}")
+        return []
+
+def _migrate_v7(conn):
+    """
+    收藏夹 / 标签词表 / 颜色标签从 JSON 文件迁入数据库 (data_manager 改为读写这些表)：
+    - favorites: 收藏的路径，id 保持添加顺序
+    - color_labels: 使用过的颜色标签 (与调色板 saved_colors 不同)
+    - 标签词表直接并入已有的 tags 表，不再与 tags.json 双份维护
+    旧 JSON 只在这里导入一次，文件原样保留但之后不再读取。
+    """
+    from data_manager import FAVORITES_FILE, TAGS_FILE, COLOR_LABELS_FILE
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS favorites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT UNIQUE NOT NULL,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS color_labels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    )''')
+
+    favorites = [os.path.normpath(p) for p in _load_legacy_json(FAVORITES_FILE) if isinstance(p, str) and p]
+    conn.executemany("INSERT OR IGNORE INTO favorites (path) VALUES (?)", [(p,) for p in favorites])
+
+    tags = [str(t).strip() for t in _load_legacy_json(TAGS_FILE) if isinstance(t, (str, int, float))]
+    conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(t,) for t in tags if t])
+
+    # 老版本的 color_labels.json 里可能混有 {"color": ...} 字典
+    colors = []
+    for c in _load_legacy_json(COLOR_LABELS_FILE):
+        if isinstance(c, dict): c = c.get("color", "")
+        c = str(c).strip()
+        if c: colors.append(c)
+    conn.executemany("INSERT OR IGNORE INTO color_labels (name) VALUES (?)", [(c,) for c in colors])
+
+# 资源所在文件夹的卷内路径 (带结尾分隔符)：去掉最后一个分隔符之后的部分
+_FOLDER_OF = "rtrim({rel}, replace(replace({rel}, '\\', ''), '/', ''))"
+# 统计维度 -> 取值表达式 (与 FilterPanel / 筛选代理的取值规则一致：颜色小写、空值记为 '')
+_FACET_VALUE_OF = {
+    "type": "COALESCE({r}.type, '')",
+    "rating": "CAST(COALESCE({r}.rating, 0) AS TEXT)",
+    "color": "lower(COALESCE({r}.color, ''))",
+}
+
+def _facet_bump(r, facet, delta):
+    """r 所在文件夹与整卷 (folder = '') 两个范围的计数各加 delta"""
+    value = _FACET_VALUE_OF[facet].format(r=r)
+    return "\n".join(f'''
+        INSERT INTO facet_counts (volume_id, folder, facet, value, cnt)
+        VALUES (COALESCE({r}.volume_id, 0), {folder}, '{facet}', {value}, {delta})
+        ON CONFLICT(volume_id, folder, facet, value) DO UPDATE SET cnt = cnt + excluded.cnt;'''
+        for folder in (_FOLDER_OF.format(rel=f"{r}.rel_path"), "''"))
+
+def _tag_bump(select_sql, volume, rel):
+    """select_sql 选出的每个 (tag_id, 增量) 计入文件夹与整卷两个范围"""
+    return "\n".join(f'''
+        INSERT INTO tag_counts (volume_id, folder, tag_id, cnt)
+        SELECT COALESCE({volume}, 0), {folder}, {select_sql}
+        ON CONFLICT(volume_id, folder, tag_id) DO UPDATE SET cnt = cnt + excluded.cnt;'''
+        for folder in (_FOLDER_OF.format(rel=rel), "''"))
+
+def _migrate_v8(conn):
+    """
+    增量维护的聚合统计 (由触发器随 assets / asset_tags 的写入更新)：
+    - facet_counts: 类型 / 星级 / 颜色 各取值的资源数
+    - tag_counts: 每个标签的资源数
+    两张表都按 (卷, 文件夹) 记录直接子项的计数，folder = '' 为整卷合计；计数归零的行自动删除。
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS facet_counts (
+        volume_id INTEGER NOT NULL,
+        folder TEXT NOT NULL,
+        facet TEXT NOT NULL,
+        value TEXT NOT NULL,
+        cnt INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (volume_id, folder, facet, value)
+    ) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS tag_counts (
+        volume_id INTEGER NOT NULL,
+        folder TEXT NOT NULL,
+        tag_id INTEGER NOT NULL,
+        cnt INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (volume_id, folder, tag_id)
+    ) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_counts_tag ON tag_counts(tag_id, folder)")
+
+    facets = list(_FACET_VALUE_OF)
+    for facet in facets:
+        changed = f"old.{facet} IS NOT new.{facet} OR old.volume_id IS NOT new.volume_id OR old.rel_path IS NOT new.rel_path"
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_facet_{facet}_update
+            AFTER UPDATE OF {facet}, volume_id, rel_path ON assets WHEN {changed} BEGIN
+            {_facet_bump("old", facet, -1)}
+            {_facet_bump("new", facet, 1)}
+        END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_facet_insert AFTER INSERT ON assets BEGIN
+        {"".join(_facet_bump("new", f, 1) for f in facets)}
+    END''')
+    # 资源被删除时残留的标签关联一并扣除 (之后再删关联行时资源已不存在，不会重复扣)
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_facet_delete AFTER DELETE ON assets BEGIN
+        {"".join(_facet_bump("old", f, -1) for f in facets)}
+        {_tag_bump("at.tag_id, -1 FROM asset_tags at WHERE at.asset_id = old.id", "old.volume_id", "old.rel_path")}
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tag_counts_move
+        AFTER UPDATE OF volume_id, rel_path ON assets
+        WHEN old.volume_id IS NOT new.volume_id OR old.rel_path IS NOT new.rel_path BEGIN
+        {_tag_bump("at.tag_id, -1 FROM asset_tags at WHERE at.asset_id = old.id", "old.volume_id", "old.rel_path")}
+        {_tag_bump("at.tag_id, 1 FROM asset_tags at WHERE at.asset_id = new.id", "new.volume_id", "new.rel_path")}
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tag_counts_insert AFTER INSERT ON asset_tags BEGIN
+        {_tag_bump("new.tag_id, 1 FROM assets a WHERE a.id = new.asset_id", "a.volume_id", "a.rel_path")}
+    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_tag_counts_delete AFTER DELETE ON asset_tags BEGIN
+        {_tag_bump("old.tag_id, -1 FROM assets a WHERE a.id = old.asset_id", "a.volume_id", "a.rel_path")}
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_facet_counts_zero AFTER UPDATE OF cnt ON facet_counts
+        WHEN new.cnt <= 0 BEGIN
+        DELETE FROM facet_counts WHERE volume_id = new.volume_id AND folder = new.folder
+            AND facet = new.facet AND value = new.value;
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_tag_counts_zero AFTER UPDATE OF cnt ON tag_counts
+        WHEN new.cnt <= 0 BEGIN
+        DELETE FROM tag_counts WHERE volume_id = new.volume_id AND folder = new.folder AND tag_id = new.tag_id;
+    END''')
+
+    # 回填已有数据
+    conn.execute("DELETE FROM facet_counts")
+    conn.execute("DELETE FROM tag_counts")
+    folder_of = _FOLDER_OF.format(rel="a.rel_path")
+    for facet in facets:
+        value = _FACET_VALUE_OF[facet].format(r="a")
+        for folder in (folder_of, "''"):
+            conn.execute(f'''INSERT INTO facet_counts (volume_id, folder, facet, value, cnt)
+                SELECT COALESCE(a.volume_id, 0), {folder}, '{facet}', {value}, COUNT(*) FROM assets a
+                GROUP BY 1, 2, 4''')
+    for folder in (folder_of, "''"):
+        conn.execute(f'''INSERT INTO tag_counts (volume_id, folder, tag_id, cnt)
+            SELECT COALESCE(a.volume_id, 0), {folder}, at.tag_id, COUNT(*)
+            FROM asset_tags at JOIN assets a ON a.id = at.asset_id
+            GROUP BY 1, 2, 3''')
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+    (8, _migrate_v8),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    return db.get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """按顺序执行所有未应用的迁移，返回最终版本号"""
+    current = get_schema_version()
+    for version, func in MIGRATIONS:
+        if version <= current: continue
+        try:
+            with db.session() as conn:
+                func(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+        except Exception as e:
+            logging.error(f"数据库迁移失败 (v{version}): {e}")
+            raise
+        print(f"  [v] 数据库已迁移到 v{version}")
+        current = version
+    return current
+
 def init_tables():
-    """初始化数据库表结构"""
-    conn = db.get_connection()
-    with conn:
-        # 1. 硬盘卷表
-        conn.execute('''CREATE TABLE IF NOT EXISTS volumes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            serial_number TEXT UNIQUE NOT NULL, 
-            name TEXT,
-            mount_point TEXT,
-            is_active INTEGER DEFAULT 0 
-        )''')
-
-        # 2. 资源表 (增加了 type 字段记录扩展名类型)
-        conn.execute('''CREATE TABLE IF NOT EXISTS assets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            parent_id INTEGER,
-            volume_id INTEGER,
-            name TEXT,
-            path TEXT, 
-            type TEXT, 
-            size INTEGER,
-            rating INTEGER DEFAULT 0,
-            color TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(volume_id) REFERENCES volumes(id)
-        )''')
-
-        # 3. 标签表
-        conn.execute('CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
-        
-        # 4. 资产-标签关联表
-        conn.execute('''CREATE TABLE IF NOT EXISTS asset_tags (
-            asset_id INTEGER, tag_id INTEGER, 
-            PRIMARY KEY (asset_id, tag_id))''')
-
-        # === 5. 【新增】收藏颜色表 (Global Color Palette) ===
-        # hex_value: 颜色代码 (如 #FF5733)
-        # name: 颜色名称 (可选，预留给未来功能)
-        # added_at: 用于排序，让最近收藏的排在前面
-        conn.execute('''CREATE TABLE IF NOT EXISTS saved_colors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hex_value TEXT UNIQUE NOT NULL,
-            name TEXT,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''')
-    
-    conn.close()
-    print("数据库结构校验完成 (已包含颜色库)。")
\ No newline at end of file
+    """初始化数据库表结构 (执行全部迁移)"""
+    version = migrate()
+    print(f"数据库结构校验完成 (schema v{version})。")
\ No newline at end of file
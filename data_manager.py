@@ -1,77 +1,165 @@
-﻿# G:\PYthon\AssetManager\data_manager.py
+# G:\PYthon\AssetManager\data_manager.py
 import os
-import json
+import bisect
+import logging
+import threading
 from config import BASE_DIR
+from core.db_manager import db
 
-# ==================== 文件路径 ====================
+# ==================== 旧版文件路径 ====================
+# 只在 schema v7 迁移时一次性导入数据库，之后不再读写
 FAVORITES_FILE = os.path.join(BASE_DIR, "favorites.json")
 TAGS_FILE = os.path.join(BASE_DIR, "tags.json")
 COLOR_LABELS_FILE = os.path.join(BASE_DIR, "color_labels.json")
 
-# ==================== 基础读写工具 ====================
-def _load_json(filepath, default=None):
-    if default is None:
-        default = []
-    if not os.path.exists(filepath):
-        return default
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return default
-
-def _save_json(filepath, data):
-    try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"保存失败 {filepath}: {e}")
+# ==================== 会话内缓存 ====================
+# 数据库 (favorites / tags / color_labels 表) 是唯一数据源；每张表在本次运行中只整表读取一次，
+# 之后的存在性判断走 set (O(1))，新增按序插入 (bisect)，写入只执行一条 INSERT / DELETE。
+_lock = threading.RLock()
+
+class _Registry:
+    """一张名称表的内存镜像：set 判重 + 列表保序 (sorted=True 时按名称排序，否则按添加顺序)"""
+    def __init__(self, table, column, sorted_=False):
+        self.table = table
+        self.column = column
+        self.sorted = sorted_
+        self.items = None
+        self.index = None
+        self.max_id = 0
+
+    def _load(self):
+        rows = db.get_connection().execute(
+            f"SELECT id, {self.column} FROM {self.table} ORDER BY id").fetchall()
+        names = [row[1] for row in rows if row[1]]
+        self.items = sorted(names) if self.sorted else names
+        self.index = set(names)
+        self.max_id = rows[-1][0] if rows else 0
+
+    def ensure_loaded(self):
+        if self.items is None: self._load()
+
+    def refresh(self):
+        """
+        并入其他途径新增的行 (例如同步文件夹时 AssetService 写入 tags 表的标签)。
+        只查询 id 大于已知最大值的行，走主键范围，代价与新增行数成正比。
+        """
+        if self.items is None:
+            self._load()
+            return
+        rows = db.get_connection().execute(
+            f"SELECT id, {self.column} FROM {self.table} WHERE id > ? ORDER BY id", (self.max_id,)).fetchall()
+        for row_id, name in rows:
+            self._remember(name)
+            self.max_id = max(self.max_id, row_id)
+
+    def _remember(self, name):
+        if not name or name in self.index: return
+        self.index.add(name)
+        if self.sorted: bisect.insort(self.items, name)
+        else: self.items.append(name)
+
+    def contains(self, name):
+        self.ensure_loaded()
+        return name in self.index
+
+    def add_many(self, names):
+        """插入缺失的名称，返回实际新增的数量"""
+        self.ensure_loaded()
+        new_names = [n for n in dict.fromkeys(names) if n and n not in self.index]
+        if not new_names: return 0
+        try:
+            with db.session() as conn:
+                conn.executemany(f"INSERT OR IGNORE INTO {self.table} ({self.column}) VALUES (?)",
+                                 [(n,) for n in new_names])
+        except Exception as e:
+            logging.error(f"保存失败 {self.table}: {e}")
+            return 0
+        for name in new_names: self._remember(name)
+        return len(new_names)
+
+    def remove(self, name, where_extra=""):
+        self.ensure_loaded()
+        if name not in self.index: return False
+        try:
+            with db.session() as conn:
+                cur = conn.execute(f"DELETE FROM {self.table} WHERE {self.column} = ?{where_extra}", (name,))
+                if cur.rowcount == 0: return False
+        except Exception as e:
+            logging.error(f"删除失败 {self.table}: {e}")
+            return False
+        self.index.discard(name)
+        if self.sorted:
+            pos = bisect.bisect_left(self.items, name)
+            if pos < len(self.items) and self.items[pos] == name: del self.items[pos]
+        else:
+            self.items.remove(name)
+        return True
+
+_favorites = _Registry("favorites", "path")
+_tags = _Registry("tags", "name", sorted_=True)
+_colors = _Registry("color_labels", "name")
+
+def reset_cache():
+    """丢弃内存镜像，下次访问时重新从数据库读取 (外部直接改库后调用)"""
+    with _lock:
+        for registry in (_favorites, _tags, _colors):
+            registry.items = None
+            registry.index = None
+            registry.max_id = 0
 
 # ==================== 1. 收藏夹管理 ====================
 def get_favorites():
-    return _load_json(FAVORITES_FILE, [])
+    with _lock:
+        _favorites.ensure_loaded()
+        return list(_favorites.items)
 
 def add_favorite(path):
-    path = os.path.normpath(path)
-    favs = get_favorites()
-    if path not in favs:
-        favs.append(path)
-        _save_json(FAVORITES_FILE, favs)
+    with _lock:
+        _favorites.add_many([os.path.normpath(path)])
 
 def remove_favorite(path):
-    path = os.path.normpath(path)
-    favs = get_favorites()
-    if path in favs:
-        favs.remove(path)
-        _save_json(FAVORITES_FILE, favs)
+    with _lock:
+        _favorites.remove(os.path.normpath(path))
 
 def is_favorite(path):
-    return os.path.normpath(path) in get_favorites()
+    with _lock:
+        return _favorites.contains(os.path.normpath(path))
 
 # ==================== 2. 标签管理 ====================
 def get_all_tags():
-    return _load_json(TAGS_FILE, [])
+    """按名称排序的全部标签 (包含同步时写入数据库的标签)"""
+    with _lock:
+        _tags.refresh()
+        return list(_tags.items)
+
+def has_tag(tag_name):
+    with _lock:
+        return _tags.contains(str(tag_name).strip())
 
 def add_tag(tag_name):
     tag_name = str(tag_name).strip()
     if not tag_name:
         return
-    tags = get_all_tags()
-    if tag_name not in tags:
-        tags.append(tag_name)
-        tags.sort()
-        _save_json(TAGS_FILE, tags)
+    with _lock:
+        _tags.add_many([tag_name])
+
+def add_tags(tag_names):
+    """批量添加 (一个事务)"""
+    with _lock:
+        _tags.add_many([str(t).strip() for t in tag_names])
 
 def remove_tag(tag_name):
-    tags = get_all_tags()
-    if tag_name in tags:
-        tags.remove(tag_name)
-        _save_json(TAGS_FILE, tags)
+    """从词表中移除；仍有资源引用的标签保留，避免 asset_tags 出现孤儿关联"""
+    with _lock:
+        _tags.remove(str(tag_name).strip(),
+                     " AND NOT EXISTS (SELECT 1 FROM asset_tags WHERE tag_id = tags.id)")
 
 # ==================== 3. 【核心新增】颜色标签管理 ====================
 def get_all_colors():
     """获取所有记录过的颜色"""
-    return _load_json(COLOR_LABELS_FILE, [])
+    with _lock:
+        _colors.ensure_loaded()
+        return list(_colors.items)
 
 def record_color(color_val):
     """
@@ -80,17 +168,5 @@ def record_color(color_val):
     """
     color_val = str(color_val).strip()
     if not color_val: return
-    
-    colors = get_all_colors()
-    
-    # 兼容性处理：确保列表里都是字符串
-    simple_colors = []
-    for c in colors:
-        if isinstance(c, dict):
-            simple_colors.append(c.get("color", ""))
-        else:
-            simple_colors.append(c)
-    
-    if color_val not in simple_colors:
-        simple_colors.append(color_val)
-        _save_json(COLOR_LABELS_FILE, simple_colors)
\ No newline at end of file
+    with _lock:
+        _colors.add_many([color_val])
@@ -48,6 +48,11 @@ def exception_hook(exctype, value, traceback):
 sys.excepthook = exception_hook
 
 from config import DB_PATH
+from core.db_manager import db
+from core.meta_cache import meta_cache
+from services.thumbnail_store import thumb_db
+from services.indexer_service import library_indexer
+from services.preference_service import PreferenceService
 from data.schema import init_tables
 from ui.main_window import AssetManagerWindow
 from ui.styles import DARK_THEME
@@ -67,6 +72,13 @@ def main():
         logging.error(f"数据库初始化异常: {e}")
         return
 
+    # 重放上次异常退出时未落盘的 .am_meta.json 编辑
+    try:
+        replayed = meta_cache.replay_journal()
+        if replayed: print(f"已恢复未保存的元数据编辑: {replayed} 条")
+    except Exception as e:
+        logging.error(f"元数据日志重放失败: {e}")
+
     # 【核心新增】启动时扫描硬盘，注册卷ID
     try:
         print("正在同步硬盘信息...")
@@ -94,6 +106,16 @@ def main():
     palette.setColor(QPalette.ColorRole.Highlight, QColor("#0078d7"))
     palette.setColor(QPalette.ColorRole.HighlightedText, QColor("#ffffff"))
     
+    # 后台索引线程必须先于连接池关闭停止
+    app.aboutToQuit.connect(library_indexer.stop)
+    # 退出时更新查询统计信息，再关闭所有线程的池化连接 (WAL checkpoint 随之完成)
+    app.aboutToQuit.connect(db.optimize)
+    app.aboutToQuit.connect(db.close_all)
+    app.aboutToQuit.connect(thumb_db.close_all)
+    # 退出时把写回缓存里的元数据编辑与偏好设置全部落盘
+    app.aboutToQuit.connect(meta_cache.flush)
+    app.aboutToQuit.connect(PreferenceService.flush)
+
     app.setPalette(palette)
     app.setStyleSheet(DARK_THEME)
     
@@ -104,6 +126,9 @@ def main():
     
     window = AssetManagerWindow()
     window.show()
+
+    # 资源库后台索引 (低优先级，从上次中断处继续)
+    library_indexer.start()
     
     sys.exit(app.exec())
 
@@ -1,8 +1,11 @@
 # G:\PYthon\AssetManager\services\asset_service.py
 
 from core.db_manager import db
+from services import search_query
 import os
 import shutil
+import time
+import threading
 import ctypes
 from ctypes import wintypes
 import logging
@@ -42,147 +45,560 @@ class CTypesTrash:
             raise OSError("操作被用户取消")
 
 class AssetService:
+    # 盘符 -> 卷ID 缓存 (每次同步 / 打开文件夹都要解析，不必每次查库)；硬盘重新映射后由 invalidate_volume_cache 清空
+    _volume_cache = {}
+    _volume_lock = threading.Lock()
+
     # === 【核心新增】根据路径获取/创建卷ID ===
     @staticmethod
     def get_volume_id_by_path(path):
-        conn = db.get_connection()
         try:
             abs_path = os.path.abspath(path)
             drive, _ = os.path.splitdrive(abs_path)
             if not drive: return 1 # 默认 fallback
             
             drive = drive.upper()
+            cached = AssetService._volume_cache.get(drive)
+            if cached is not None: return cached
             
-            # 1. 尝试查找
-            cur = conn.execute('SELECT id FROM volumes WHERE mount_point = ?', (drive,))
-            row = cur.fetchone()
-            if row: return row[0]
-            
-            # 2. 如果没找到，自动注册一个新的
-            with conn:
-                cur = conn.execute('INSERT INTO volumes (mount_point, is_active, name, serial_number) VALUES (?, 1, ?, ?)', 
-                                   (drive, "自动发现硬盘", f"AUTO_{drive}"))
-                return cur.lastrowid
+            with AssetService._volume_lock:
+                # 1. 尝试查找 (同一盘符可能残留离线的旧卷记录，优先在线的)
+                cur = db.get_connection().execute(
+                    'SELECT id FROM volumes WHERE mount_point = ? ORDER BY is_active DESC, id LIMIT 1', (drive,))
+                row = cur.fetchone()
+                if row:
+                    volume_id = row[0]
+                else:
+                    # 2. 如果没找到，自动注册一个新的
+                    with db.session() as conn:
+                        cur = conn.execute('INSERT INTO volumes (mount_point, is_active, name, serial_number) VALUES (?, 1, ?, ?)', 
+                                           (drive, "自动发现硬盘", f"AUTO_{drive}"))
+                        volume_id = cur.lastrowid
+                AssetService._volume_cache[drive] = volume_id
+                return volume_id
         except Exception as e:
             logging.error(f"获取卷ID失败: {e}")
             return 1
-        finally:
-            conn.close()
 
     @staticmethod
-    def sync_from_meta(folder_path, volume_id, meta_data):
-        if not meta_data: return
-        conn = db.get_connection()
-        
+    def invalidate_volume_cache():
+        """卷的盘符映射变化后调用 (StartupService.sync_drives)"""
+        with AssetService._volume_lock:
+            AssetService._volume_cache.clear()
+
+    @staticmethod
+    def split_volume_path(full_path):
+        """拆分为 (盘符, 卷内相对路径)，后者与 volume_id 一起构成资源唯一键"""
+        drive, rel_path = os.path.splitdrive(os.path.abspath(full_path))
+        return drive.upper(), rel_path
+
+    @staticmethod
+    def asset_key(full_path):
+        """
+        完整路径 -> (volume_id, rel_path)。
+        数据库只保存卷内相对路径，完整路径在查询时由 volumes.mount_point 拼出，
+        因此移动硬盘换了盘符只需更新一行 volumes，资源记录不用重建。
+        """
+        return AssetService.get_volume_id_by_path(full_path), AssetService.split_volume_path(full_path)[1]
+
+    # 按 id 重建单个资源的全文索引行 (与 schema 中的 FTS 触发器保持同一列定义)
+    _FTS_REBUILD_SQL = '''
+        INSERT INTO assets_fts(rowid, name, segments, type, tags)
+        SELECT a.id, a.name, replace(replace(a.rel_path, '\\', ' '), '/', ' '), a.type,
+               (SELECT group_concat(t.name, ' ') FROM asset_tags at JOIN tags t ON t.id = at.tag_id WHERE at.asset_id = a.id)
+        FROM assets a WHERE a.id = ?
+    '''
+
+    # 最近一次批量同步的统计 (rows / seconds / rows_per_sec)，用于跟踪性能回归
+    last_sync_stats = None
+
+    @staticmethod
+    def _file_type(info):
+        """assets.type 的取值：扩展名大写，没有扩展名为 FILE (文件夹为 FOLDER)"""
+        raw_ext = info.get("ext", "")
+        return raw_ext.replace(".", "").upper() if raw_ext else "FILE"
+
+    @staticmethod
+    def _meta_to_rows(folder_path, volume_id, meta_data):
+        """把 meta 展开成 assets 行 + {rel_path: [tags]}"""
+        rows = []
+        tags_by_rel = {}
         files_map = meta_data.get("files", {})
         sub_folders = meta_data.get("sub_folders", {})
-        
+
+        for filename, info in files_map.items():
+            _, rel_path = AssetService.split_volume_path(os.path.join(folder_path, filename))
+            rows.append((volume_id, filename, rel_path, AssetService._file_type(info),
+                         info.get("size", 0), info.get("rating", 0), info.get("color", ""), info.get("mtime")))
+            tags_by_rel[rel_path] = info.get("tags", [])
+
+        dir_items = sub_folders.items() if isinstance(sub_folders, dict) else []
+        for folder_name, info in dir_items:
+            if not isinstance(info, dict): info = {}
+            _, rel_path = AssetService.split_volume_path(os.path.join(folder_path, folder_name))
+            rows.append((volume_id, folder_name, rel_path, "FOLDER",
+                         0, info.get("rating", 0), info.get("color", ""), info.get("mtime")))
+            tags_by_rel[rel_path] = info.get("tags", [])
+        return rows, tags_by_rel
+
+    @staticmethod
+    def _resolve_tag_ids(conn, names, tag_map):
+        """标签名 -> id；tag_map 为本次同步的缓存，缺失的标签一次性批量创建"""
+        missing = [n for n in names if n not in tag_map]
+        if missing:
+            conn.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(n,) for n in missing])
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(f'SELECT id, name FROM tags WHERE name IN ({marks})', chunk):
+                    tag_map[row[1]] = row[0]
+        return {tag_map[n] for n in names if n in tag_map}
+
+    @staticmethod
+    def _clean_tags(tags_list):
+        result = []
+        for tag in tags_list or []:
+            tag = str(tag).strip()
+            if tag and tag not in result: result.append(tag)
+        return result
+
+    @staticmethod
+    def _changed_subset(meta_data, changes):
+        """按扫描变更集裁剪 meta，只保留新增 / 修改的条目"""
+        names = set(changes.get("added", [])) | set(changes.get("modified", []))
+        files_map = meta_data.get("files", {})
+        sub_folders = meta_data.get("sub_folders", {})
+        if not isinstance(sub_folders, dict): sub_folders = {}
+        return {
+            "files": {n: files_map[n] for n in names if n in files_map},
+            "sub_folders": {n: sub_folders[n] for n in names if n in sub_folders},
+        }
+
+    @staticmethod
+    def _delete_by_rel_paths(conn, volume_id, rel_paths):
+        """删除条目及其子树 (被删除的文件夹下的所有资源)，走 (volume_id, rel_path) 索引范围扫描"""
+        if not rel_paths: return
+        params = [(volume_id, r, volume_id, r + os.sep, r + chr(ord(os.sep) + 1)) for r in rel_paths]
+        where = '(volume_id = ? AND rel_path = ?) OR (volume_id = ? AND rel_path >= ? AND rel_path < ?)'
+        conn.executemany(f'DELETE FROM asset_tags WHERE asset_id IN (SELECT id FROM assets WHERE {where})', params)
+        conn.executemany(f'DELETE FROM assets WHERE {where}', params)
+
+    @staticmethod
+    def _apply_tag_diff(conn, to_add, to_remove):
+        """
+        写入 asset_tags 差集 ({(asset_id, tag_id)})。
+        关联表的 FTS 触发器是逐行重算的；批量时先摘掉受影响资源的索引行 (触发器随之空转)，
+        写完关联后每个资源只重建一次
+        """
+        if not to_add and not to_remove: return
+        touched = [(asset_id,) for asset_id in {a for a, _ in to_add} | {a for a, _ in to_remove}]
+        conn.executemany('DELETE FROM assets_fts WHERE rowid = ?', touched)
+        if to_remove:
+            conn.executemany('DELETE FROM asset_tags WHERE asset_id = ? AND tag_id = ?', list(to_remove))
+        if to_add:
+            conn.executemany('INSERT OR IGNORE INTO asset_tags (asset_id, tag_id) VALUES (?, ?)', list(to_add))
+        conn.executemany(AssetService._FTS_REBUILD_SQL, touched)
+
+    @staticmethod
+    def sync_from_meta(folder_path, volume_id, meta_data, changes=None):
+        """
+        批量同步一个文件夹的 meta 到数据库 (集合式)：
+        1. 行数据 executemany 写入临时表，再一条 UPSERT 合并进 assets (内容未变的行不写)
+        2. 标签名 -> id 映射每次同步只加载一次
+        3. asset_tags 做差集增删，不再整行删除重建
+        传入 LocalStoreService.scan_changes 的变更集时只处理新增 / 修改 / 删除的条目。
+        返回统计信息 dict，同时记录到 AssetService.last_sync_stats。
+        """
+        if not meta_data: return None
+        started = time.perf_counter()
+        removed_rel = []
+        if changes and not changes.get("full"):
+            removed_rel = [AssetService.split_volume_path(os.path.join(folder_path, n))[1]
+                           for n in changes.get("removed", [])]
+            meta_data = AssetService._changed_subset(meta_data, changes)
+        rows, tags_by_rel = AssetService._meta_to_rows(folder_path, volume_id, meta_data)
+        if not rows and not removed_rel: return None
+
+        tags_added = tags_removed = 0
         try:
-            with conn:
-                for filename, info in files_map.items():
-                    full_path = os.path.join(folder_path, filename)
-                    raw_ext = info.get("ext", "")
-                    file_type = raw_ext.replace(".", "").upper() if raw_ext else "FILE"
-                    cursor = conn.execute('''
-                        INSERT OR REPLACE INTO assets 
-                        (volume_id, name, path, type, size, rating, color)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (volume_id, filename, full_path, file_type, 
-                          info.get("size", 0), info.get("rating", 0), info.get("color", "")))
-                    asset_id = cursor.lastrowid
-                    tags = info.get("tags", [])
-                    if tags and asset_id:
-                        AssetService._sync_tags_for_asset(conn, asset_id, tags)
-
-                dir_items = sub_folders.items() if isinstance(sub_folders, dict) else []
-                for folder_name, info in dir_items:
-                    full_path = os.path.join(folder_path, folder_name)
-                    rating = info.get("rating", 0) if isinstance(info, dict) else 0
-                    color = info.get("color", "") if isinstance(info, dict) else ""
-                    cursor = conn.execute('''
-                        INSERT OR REPLACE INTO assets 
-                        (volume_id, name, path, type, size, rating, color)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (volume_id, folder_name, full_path, "FOLDER", 
-                          0, rating, color))
-                    asset_id = cursor.lastrowid
-                    tags = info.get("tags", []) if isinstance(info, dict) else []
-                    if tags and asset_id:
-                        AssetService._sync_tags_for_asset(conn, asset_id, tags)
+            with db.session() as conn:
+                AssetService._delete_by_rel_paths(conn, volume_id, removed_rel)
+                conn.execute('''CREATE TEMP TABLE IF NOT EXISTS sync_stage (
+                    volume_id INTEGER, name TEXT, rel_path TEXT,
+                    type TEXT, size INTEGER, rating INTEGER, color TEXT, mtime REAL)''')
+                conn.execute('DELETE FROM temp.sync_stage')
+                conn.executemany('INSERT INTO temp.sync_stage VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+                # WHERE true: 消除 INSERT ... SELECT 与 ON CONFLICT 的语法歧义
+                conn.execute('''
+                    INSERT INTO assets (volume_id, name, rel_path, type, size, rating, color, mtime)
+                    SELECT volume_id, name, rel_path, type, size, rating, color, mtime FROM temp.sync_stage WHERE true
+                    ON CONFLICT(volume_id, rel_path) DO UPDATE SET
+                        name = excluded.name, type = excluded.type,
+                        size = excluded.size, rating = excluded.rating, color = excluded.color, mtime = excluded.mtime
+                    WHERE assets.name IS NOT excluded.name
+                       OR assets.type IS NOT excluded.type OR assets.size IS NOT excluded.size
+                       OR assets.rating IS NOT excluded.rating OR assets.color IS NOT excluded.color
+                       OR assets.mtime IS NOT excluded.mtime
+                ''')
+
+                id_by_rel = {}
+                existing = set()
+                for row in conn.execute('''
+                    SELECT a.id, a.rel_path FROM assets a
+                    JOIN temp.sync_stage s ON a.volume_id = s.volume_id AND a.rel_path = s.rel_path'''):
+                    id_by_rel[row[1]] = row[0]
+                for row in conn.execute('''
+                    SELECT at.asset_id, at.tag_id FROM asset_tags at
+                    JOIN assets a ON a.id = at.asset_id
+                    JOIN temp.sync_stage s ON a.volume_id = s.volume_id AND a.rel_path = s.rel_path'''):
+                    existing.add((row[0], row[1]))
+
+                tag_map = {row[1]: row[0] for row in conn.execute('SELECT id, name FROM tags')}
+                desired = set()
+                for rel_path, tags in tags_by_rel.items():
+                    asset_id = id_by_rel.get(rel_path)
+                    if not asset_id: continue
+                    for tag_id in AssetService._resolve_tag_ids(conn, AssetService._clean_tags(tags), tag_map):
+                        desired.add((asset_id, tag_id))
+
+                to_add = desired - existing
+                to_remove = existing - desired
+                AssetService._apply_tag_diff(conn, to_add, to_remove)
+                tags_added, tags_removed = len(to_add), len(to_remove)
+                conn.execute('DELETE FROM temp.sync_stage')
         except Exception as e:
             logging.error(f"数据库同步失败: {folder_path} - {e}")
-        finally:
-            conn.close()
+            return None
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            "rows": len(rows),
+            "removed": len(removed_rel),
+            "tags_added": tags_added,
+            "tags_removed": tags_removed,
+            "seconds": elapsed,
+            "rows_per_sec": len(rows) / elapsed if elapsed > 0 else float(len(rows)),
+        }
+        AssetService.last_sync_stats = stats
+        logging.info(f"同步完成: {folder_path} - {stats['rows']} 行, {stats['rows_per_sec']:.0f} 行/秒")
+        return stats
+
+    @staticmethod
+    def prune_missing_children(folder_path, volume_id, keep_names):
+        """
+        删除数据库中该文件夹下已不存在的直接子项 (连同其子树)。
+        用于没有旧 meta 可以求差集的场景 (后台索引)，返回删除的子项数。
+        """
+        _, rel_dir = AssetService.split_volume_path(folder_path)
+        prefix = os.path.join(rel_dir, "")
+        keep = set(keep_names)
+        try:
+            with db.session() as conn:
+                rows = conn.execute('''SELECT rel_path FROM assets
+                    WHERE volume_id = ? AND rel_path >= ? AND rel_path < ? AND instr(substr(rel_path, ?), ?) = 0''',
+                    (volume_id, prefix, prefix[:-1] + chr(ord(os.sep) + 1), len(prefix) + 1, os.sep)).fetchall()
+                missing = [row[0] for row in rows if row[0][len(prefix):] not in keep]
+                AssetService._delete_by_rel_paths(conn, volume_id, missing)
+            return len(missing)
+        except Exception as e:
+            logging.error(f"清理已删除条目失败: {folder_path} - {e}")
+            return 0
 
     @staticmethod
     def _sync_tags_for_asset(conn, asset_id, tags_list):
-        conn.execute('DELETE FROM asset_tags WHERE asset_id = ?', (asset_id,))
-        for tag in tags_list:
-            tag = tag.strip()
-            if not tag: continue
-            conn.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag,))
-            cur = conn.execute('SELECT id FROM tags WHERE name = ?', (tag,))
-            row = cur.fetchone()
-            if row: conn.execute('INSERT INTO asset_tags (asset_id, tag_id) VALUES (?, ?)', (asset_id, row[0]))
+        """单个资源的标签差集同步"""
+        desired = AssetService._resolve_tag_ids(conn, AssetService._clean_tags(tags_list), {})
+        existing = {row[0] for row in conn.execute('SELECT tag_id FROM asset_tags WHERE asset_id = ?', (asset_id,))}
+        if existing - desired:
+            conn.executemany('DELETE FROM asset_tags WHERE asset_id = ? AND tag_id = ?',
+                             [(asset_id, t) for t in existing - desired])
+        if desired - existing:
+            conn.executemany('INSERT OR IGNORE INTO asset_tags (asset_id, tag_id) VALUES (?, ?)',
+                             [(asset_id, t) for t in desired - existing])
 
     @staticmethod
     def update_tags(full_path, tags_list):
-        conn = db.get_connection()
+        volume_id, rel_path = AssetService.asset_key(full_path)
         try:
-            with conn:
-                cur = conn.execute('SELECT id FROM assets WHERE path = ?', (full_path,))
+            with db.session() as conn:
+                cur = conn.execute('SELECT id FROM assets WHERE volume_id = ? AND rel_path = ?', (volume_id, rel_path))
                 row = cur.fetchone()
                 if row: AssetService._sync_tags_for_asset(conn, row[0], tags_list)
         except Exception as e: logging.error(f"数据库标签更新失败: {e}")
-        finally: conn.close()
 
     @staticmethod
-    def search_assets(keyword=""):
+    def update_tags_many(tags_by_path):
+        """批量同步多个资源的标签 ({full_path: tags_list})：一个事务，标签名 -> id 只解析一次"""
+        if not tags_by_path: return
+        try:
+            with db.session() as conn:
+                tag_map = {}
+                to_add, to_remove = set(), set()
+                for full_path, tags_list in tags_by_path.items():
+                    volume_id, rel_path = AssetService.asset_key(full_path)
+                    row = conn.execute('SELECT id FROM assets WHERE volume_id = ? AND rel_path = ?', (volume_id, rel_path)).fetchone()
+                    if not row: continue
+                    desired = AssetService._resolve_tag_ids(conn, AssetService._clean_tags(tags_list), tag_map)
+                    existing = {r[0] for r in conn.execute('SELECT tag_id FROM asset_tags WHERE asset_id = ?', (row[0],))}
+                    to_add.update((row[0], t) for t in desired - existing)
+                    to_remove.update((row[0], t) for t in existing - desired)
+                AssetService._apply_tag_diff(conn, to_add, to_remove)
+        except Exception as e: logging.error(f"数据库批量标签更新失败: {e}")
+
+    # === 聚合统计 (facet_counts / tag_counts 由 schema v8 的触发器增量维护) ===
+    @staticmethod
+    def _folder_key(folder_path):
+        """文件夹 -> (volume_id, 统计表中的 folder 键：卷内路径 + 结尾分隔符)"""
+        volume_id, rel_dir = AssetService.asset_key(folder_path)
+        return volume_id or 0, os.path.join(rel_dir, "")
+
+    @staticmethod
+    def _empty_facets():
+        return {"tags": {}, "rating": {}, "type": {}, "color": {}}
+
+    @staticmethod
+    def _add_facet(stats, facet, value, count):
+        if facet == "rating":
+            value = int(value or 0)
+        elif facet == "color":
+            value = value or "none"
+        stats[facet][value] = stats[facet].get(value, 0) + count
+
+    @staticmethod
+    def count_meta_facets(meta_data):
+        """
+        按 facet_counts 的取值规则逐条统计 meta 中的条目，结构同 get_facet_counts。
+        用于从文件夹的聚合统计中扣除视图隐藏的少数条目 (取值规则与 FilterPanel.count_facets 略有不同)。
+        """
+        stats = AssetService._empty_facets()
+        sub_folders = meta_data.get("sub_folders", {})
+        items = [(AssetService._file_type(info), info) for info in meta_data.get("files", {}).values()]
+        if isinstance(sub_folders, dict):
+            items += [("FOLDER", info if isinstance(info, dict) else {}) for info in sub_folders.values()]
+        for file_type, info in items:
+            AssetService._add_facet(stats, "type", file_type, 1)
+            AssetService._add_facet(stats, "rating", info.get("rating", 0), 1)
+            AssetService._add_facet(stats, "color", str(info.get("color", "") or "").lower(), 1)
+            for tag in info.get("tags", []):
+                stats["tags"][tag] = stats["tags"].get(tag, 0) + 1
+        return stats
+
+    @staticmethod
+    def get_facet_counts(folder_path=None, volume_id=None):
+        """
+        标签 / 星级 / 类型 / 颜色的资源数，结构与 FilterPanel 的统计一致：
+        {"tags": {名称: n}, "rating": {0-5: n}, "type": {类型: n}, "color": {颜色或 'none': n}}
+        - folder_path: 该文件夹的直接子项
+        - volume_id: 整卷
+        - 都不传: 所有在线卷合计
+        直接读聚合表，与资源总数无关。
+        """
+        if folder_path:
+            volume_id, folder = AssetService._folder_key(folder_path)
+            scope, params = "c.volume_id = ? AND c.folder = ?", [volume_id, folder]
+        elif volume_id is not None:
+            scope, params = "c.volume_id = ? AND c.folder = ''", [volume_id]
+        else:
+            scope, params = "c.folder = '' AND c.volume_id IN (SELECT id FROM volumes WHERE is_active = 1)", []
+        stats = AssetService._empty_facets()
+        try:
+            conn = db.get_connection()
+            for row in conn.execute(f'SELECT c.facet, c.value, SUM(c.cnt) FROM facet_counts c WHERE {scope} GROUP BY 1, 2', params):
+                AssetService._add_facet(stats, row[0], row[1], row[2])
+            for row in conn.execute(f'''SELECT t.name, SUM(c.cnt) FROM tag_counts c JOIN tags t ON t.id = c.tag_id
+                                        WHERE {scope} GROUP BY c.tag_id''', params):
+                stats["tags"][row[0]] = row[1]
+        except Exception as e:
+            logging.error(f"读取统计失败: {e}")
+        return stats
+
+    @staticmethod
+    def get_tag_count(tag_name):
+        """整个资源库中带有该标签的资源数"""
+        row = db.get_connection().execute('''
+            SELECT COALESCE(SUM(c.cnt), 0) FROM tag_counts c JOIN tags t ON t.id = c.tag_id
+            WHERE t.name = ? AND c.folder = ?''', (tag_name, "")).fetchone()
+        return row[0]
+
+    @staticmethod
+    def get_tag_usage():
+        """{标签名: 使用该标签的资源数} (全部卷)，读 tag_counts 的整卷合计行"""
+        try:
+            conn = db.get_connection()
+            return {row[0]: row[1] for row in conn.execute('''
+                SELECT t.name, SUM(c.cnt) FROM tag_counts c JOIN tags t ON t.id = c.tag_id
+                WHERE c.folder = '' GROUP BY c.tag_id''')}
+        except Exception as e:
+            logging.error(f"读取标签使用次数失败: {e}")
+            return {}
+
+    @staticmethod
+    def get_search_facets(keyword=""):
+        """
+        搜索结果的分面统计 (结构同 get_facet_counts)。
+        无关键字时结果就是所有在线资源，直接读聚合表；否则在结果集上做一次 GROUP BY。
+        """
+        keyword = (keyword or "").strip()
+        if not keyword: return AssetService.get_facet_counts()
+        stats = AssetService._empty_facets()
         conn = db.get_connection()
-        # 修复：确保 volumes 关联正确
-        sql = '''
-            SELECT DISTINCT a.id, a.name, a.path as full_path, v.name as drive_name, a.type, a.rating, a.size, a.color
-            FROM assets a
-            JOIN volumes v ON a.volume_id = v.id
-            LEFT JOIN asset_tags at ON a.id = at.asset_id
-            LEFT JOIN tags t ON at.tag_id = t.id
-            WHERE v.is_active = 1 
-        '''
+        try:
+            sql, params = AssetService.build_search_query(conn, keyword)
+            conn.execute('DROP TABLE IF EXISTS temp.facet_hits')
+            conn.execute(f'CREATE TEMP TABLE facet_hits AS SELECT id, type, rating, color FROM ({sql})', params)
+            for facet, expr in (("type", "COALESCE(type, '')"), ("rating", "COALESCE(rating, 0)"), ("color", "lower(COALESCE(color, ''))")):
+                for row in conn.execute(f'SELECT {expr}, COUNT(*) FROM temp.facet_hits GROUP BY 1'):
+                    AssetService._add_facet(stats, facet, row[0], row[1])
+            for row in conn.execute('''SELECT t.name, COUNT(*) FROM temp.facet_hits h
+                                       JOIN asset_tags at ON at.asset_id = h.id JOIN tags t ON t.id = at.tag_id
+                                       GROUP BY at.tag_id'''):
+                stats["tags"][row[0]] = row[1]
+        except Exception as e:
+            logging.error(f"搜索分面统计失败: {keyword} - {e}")
+        finally:
+            conn.execute('DROP TABLE IF EXISTS temp.facet_hits')
+        return stats
+
+    SEARCH_PAGE_SIZE = 500
+    _fts_trigram = None
+
+    @staticmethod
+    def _is_fts_trigram(conn):
+        if AssetService._fts_trigram is None:
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'assets_fts'").fetchone()
+            AssetService._fts_trigram = bool(row and "trigram" in row[0])
+        return AssetService._fts_trigram
+
+    @staticmethod
+    def _build_fts_filter(conn, keyword):
+        """
+        关键字 -> (MATCH 表达式, 附加 LIKE 条件, 参数)
+        trigram 分词至少需要 3 个字符，更短的词 (如两个汉字) 退回到 FTS 表内的 LIKE，
+        仍然只扫描单表，不再经过标签 JOIN 扇出。
+        """
+        trigram = AssetService._is_fts_trigram(conn)
+        match_terms, like_sql, like_params = [], [], []
+        for term in keyword.split():
+            if trigram and len(term) < 3:
+                like_kw = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                like_sql.append("(f.name LIKE ? ESCAPE '\\' OR f.segments LIKE ? ESCAPE '\\' "
+                                "OR f.type LIKE ? ESCAPE '\\' OR f.tags LIKE ? ESCAPE '\\')")
+                like_params.extend([like_kw] * 4)
+            else:
+                quoted = '"' + term.replace('"', '""') + '"'
+                match_terms.append(quoted if trigram else quoted + '*')
+        return " ".join(match_terms), like_sql, like_params
+
+    @staticmethod
+    def build_search_query(conn, keyword=""):
+        """
+        关键字 -> (sql, params)，不含分页。
+        结构化查询 (tag:x rating>=4 ...) 由 search_query 编译；纯关键字走 FTS5 + bm25 排序；
+        无关键字时按最近入库倒序。
+        """
+        keyword = (keyword or "").strip()
         params = []
-        if keyword:
-            sql += " AND (a.name LIKE ? OR a.type LIKE ? OR t.name LIKE ?)"
-            like_kw = f'%{keyword}%'
-            params.append(like_kw)
-            params.append(like_kw)
-            params.append(like_kw)
+        if search_query.is_structured(keyword):
+            # 字段 / 布尔语法：编译成索引条件 (语法错误抛 SearchQueryError)
+            where, params = search_query.compile_query(keyword, trigram=AssetService._is_fts_trigram(conn))
+            sql = f'''
+                SELECT a.id, a.name, COALESCE(v.mount_point, '') || a.rel_path as full_path, v.name as drive_name, a.type, a.rating, a.size, a.color
+                FROM assets a
+                JOIN volumes v ON a.volume_id = v.id
+                WHERE v.is_active = 1 AND {where}
+                ORDER BY a.id DESC
+            '''
+        elif keyword:
+            match_expr, like_sql, like_params = AssetService._build_fts_filter(conn, keyword)
+            where = ["v.is_active = 1"]
+            if match_expr:
+                where.append("assets_fts MATCH ?")
+                params.append(match_expr)
+            where.extend(like_sql)
+            params.extend(like_params)
+            # 权重: 文件名 > 标签 > 类型 > 路径分段
+            order = "bm25(assets_fts, 10.0, 2.0, 4.0, 6.0)" if match_expr else "a.id DESC"
+            sql = f'''
+                SELECT a.id, a.name, COALESCE(v.mount_point, '') || a.rel_path as full_path, v.name as drive_name, a.type, a.rating, a.size, a.color
+                FROM assets_fts f
+                JOIN assets a ON a.id = f.rowid
+                JOIN volumes v ON a.volume_id = v.id
+                WHERE {" AND ".join(where)}
+                ORDER BY {order}
+            '''
         else:
-            sql += " LIMIT 500"
+            sql = '''
+                SELECT a.id, a.name, COALESCE(v.mount_point, '') || a.rel_path as full_path, v.name as drive_name, a.type, a.rating, a.size, a.color
+                FROM assets a
+                JOIN volumes v ON a.volume_id = v.id
+                WHERE v.is_active = 1
+                ORDER BY a.id DESC
+            '''
+        return sql, params
+
+    @staticmethod
+    def explain_search(keyword=""):
+        """返回查询计划 (EXPLAIN QUERY PLAN 的 detail 列)，用于确认每种条件都走了索引"""
+        conn = db.get_connection()
+        sql, params = AssetService.build_search_query(conn, keyword)
+        return [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
 
+    @staticmethod
+    def search_assets(keyword="", limit=SEARCH_PAGE_SIZE, offset=0):
+        """
+        全文检索 (FTS5 + bm25 排序)，分页返回。
+        无关键字时按最近入库倒序返回一页。
+        """
+        conn = db.get_connection()
         try:
-            cursor = conn.execute(sql, params)
-            results = [dict(row) for row in cursor.fetchall()]
-            return results
+            sql, params = AssetService.build_search_query(conn, keyword)
+            cursor = conn.execute(sql + " LIMIT ? OFFSET ?", params + [int(limit), int(offset)])
+            return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logging.error(f"搜索失败: {e}")
             return []
-        finally:
-            conn.close()
+
+    @staticmethod
+    def iter_search_pages(keyword="", page_size=SEARCH_PAGE_SIZE, max_results=None):
+        """逐页产出搜索结果 (list[dict])，直到取完或达到 max_results"""
+        offset = 0
+        while max_results is None or offset < max_results:
+            limit = page_size if max_results is None else min(page_size, max_results - offset)
+            page = AssetService.search_assets(keyword, limit=limit, offset=offset)
+            if not page: break
+            yield page
+            if len(page) < limit: break
+            offset += len(page)
 
     @staticmethod
     def update_rating(full_path, rating):
-        conn = db.get_connection()
+        volume_id, rel_path = AssetService.asset_key(full_path)
         try:
-            with conn: conn.execute('UPDATE assets SET rating = ? WHERE path = ?', (rating, full_path))
+            with db.session() as conn:
+                conn.execute('UPDATE assets SET rating = ? WHERE volume_id = ? AND rel_path = ?', (rating, volume_id, rel_path))
         except: pass
-        finally: conn.close()
 
     @staticmethod
     def update_color(full_path, color_name):
-        conn = db.get_connection()
+        volume_id, rel_path = AssetService.asset_key(full_path)
         try:
-            with conn: conn.execute('UPDATE assets SET color = ? WHERE path = ?', (color_name, full_path))
+            with db.session() as conn:
+                conn.execute('UPDATE assets SET color = ? WHERE volume_id = ? AND rel_path = ?', (color_name, volume_id, rel_path))
         except: pass
-        finally: conn.close()
+
+    # 允许批量更新的列 (列名会拼进 SQL，必须是白名单)
+    _BATCH_COLUMNS = ("rating", "color")
+
+    @staticmethod
+    def update_attr_many(column, value, full_paths):
+        """批量设置多个资源的同一列 (星级 / 颜色)：一个事务，executemany 走 (volume_id, rel_path) 唯一索引"""
+        if column not in AssetService._BATCH_COLUMNS or not full_paths: return
+        try:
+            with db.session() as conn:
+                conn.executemany(f'UPDATE assets SET {column} = ? WHERE volume_id = ? AND rel_path = ?',
+                                 [(value, *AssetService.asset_key(p)) for p in full_paths])
+        except Exception as e: logging.error(f"数据库批量更新失败 ({column}): {e}")
 
     @staticmethod
     def delete_file(full_path, permanently=False):
@@ -200,8 +616,8 @@ class AssetService:
 
     @staticmethod
     def remove_from_db(full_path):
-        conn = db.get_connection()
+        """删除条目 (文件夹连同其子树) 及其标签关联"""
+        volume_id, rel_path = AssetService.asset_key(full_path)
         try:
-            with conn: conn.execute('DELETE FROM assets WHERE path = ?', (full_path,))
-        except: pass
-        finally: conn.close()
\ No newline at end of file
+            with db.session() as conn: AssetService._delete_by_rel_paths(conn, volume_id, [rel_path])
+        except: pass
\ No newline at end of file
@@ -0,0 +1,263 @@
+# G:\PYthon\AssetManager\services\change_feed_service.py
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+from abc import ABC, abstractmethod
+from services.local_store import LocalStoreService
+
+# === 变更订阅参数 ===
+COALESCE_DELAY = 0.5        # 秒，目录安静这么久后才把变更交给下游 (连续写入只处理一次)
+MAX_DELAY = 5.0             # 秒，持续有变更时最多攒这么久就交一次
+POLL_TIMEOUT = 0.25         # 秒，后端一次等待事件的上限 (也是响应 stop() 的延迟)
+
+# 后端上报的事件类型
+CHANGED = "changed"         # 目录的直接子项有变化，path 为该目录
+DIR_ADDED = "dir_added"     # 新建 / 移入了一个目录，path 为新目录 (子树需要完整索引)
+OVERFLOW = "overflow"       # 事件丢失 (内核队列溢出)，path 为受影响的根目录，None 表示全部
+
+class ChangeFeedBackend(ABC):
+    """
+    平台文件变更通知的后端接口 (未实现全部抽象方法的后端在实例化时即报错，不会进入订阅线程)。
+    - add_root / remove_root：递归订阅 / 取消一个根目录，add_root 返回是否完整订阅 (监视数量不足时为 False)
+    - read(timeout)：等待并返回一批 [(事件类型, 路径)]，超时返回 []
+    """
+    @abstractmethod
+    def add_root(self, root): ...
+    @abstractmethod
+    def remove_root(self, root): ...
+    @abstractmethod
+    def read(self, timeout): ...
+    def close(self): pass
+
+class InotifyBackend(ChangeFeedBackend):
+    """Linux inotify (ctypes)：每个目录一个监视，新建的子目录自动补上监视"""
+    IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+    IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+    IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+    IN_Q_OVERFLOW, IN_IGNORED = 0x4000, 0x8000
+    IN_ONLYDIR, IN_DONT_FOLLOW, IN_ISDIR = 0x01000000, 0x02000000, 0x40000000
+    IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+
+    # 只关心条目的增删改；写入中的 IN_MODIFY 不订阅，等 IN_CLOSE_WRITE
+    WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                  IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+    _EVENT = struct.Struct("iIII")      # wd, mask, cookie, len
+
+    def __init__(self):
+        import ctypes, ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0: raise OSError(self._get_errno(), "inotify_init1 失败")
+        self._paths = {}        # wd -> 目录路径
+        self._wds = {}          # 目录路径 -> wd
+        self._roots = set()
+
+    def _watch(self, path):
+        """返回 False 表示系统监视数量已用完 (fs.inotify.max_user_watches)"""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            err = self._get_errno()
+            if err == errno.ENOSPC: return False
+            return True         # 目录已消失 / 无权限：跳过即可
+        self._paths[wd] = path
+        self._wds[path] = wd
+        return True
+
+    def _watch_tree(self, top):
+        """为 top 及其全部子目录加监视 (meta 临时文件不是目录，不必过滤)"""
+        if not self._watch(top): return False
+        for dirpath, dirnames, _ in os.walk(top, onerror=lambda e: None):
+            for name in dirnames:
+                if not self._watch(os.path.join(dirpath, name)): return False
+        return True
+
+    def _unwatch_tree(self, top):
+        prefix = os.path.join(top, "")
+        for path in [p for p in self._wds if p == top or p.startswith(prefix)]:
+            wd = self._wds.pop(path)
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def add_root(self, root):
+        self._roots.add(root)
+        return self._watch_tree(root)
+
+    def remove_root(self, root):
+        self._roots.discard(root)
+        self._unwatch_tree(root)
+
+    def _root_of(self, path):
+        return next((r for r in self._roots if path == r or path.startswith(os.path.join(r, ""))), None)
+
+    def read(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready: return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            raw_name = data[offset + self._EVENT.size: offset + self._EVENT.size + length].rstrip(b"\0")
+            offset += self._EVENT.size + length
+
+            if mask & self.IN_Q_OVERFLOW:
+                events.append((OVERFLOW, None))
+                continue
+            directory = self._paths.get(wd)
+            if directory is None: continue
+            if mask & self.IN_IGNORED:
+                self._paths.pop(wd, None)
+                if self._wds.get(directory) == wd: del self._wds[directory]
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                # 目录本身被删 / 移走：由父目录的事件负责更新，这里只清理监视
+                continue
+
+            name = os.fsdecode(raw_name)
+            # 自己写回 .am_meta.json (含原子写入的临时文件) 不算变更
+            if not name or name.startswith(LocalStoreService.META_FILENAME): continue
+            path = os.path.join(directory, name)
+            events.append((CHANGED, directory))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    if not self._watch_tree(path): events.append((OVERFLOW, self._root_of(path)))
+                    events.append((DIR_ADDED, path))
+                elif mask & self.IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def create_backend():
+    """当前平台可用的后端；没有可用后端时返回 None (资源库继续靠定期重新爬取保持新鲜)"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyBackend()
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify 不可用: {e}")
+    # Windows 的 ReadDirectoryChangesW 后端尚未实现，在此按平台接入
+    return None
+
+class ChangeFeed:
+    """
+    资源库根目录的实时变更订阅：后台线程读取后端事件，按目录合并，
+    目录安静 COALESCE_DELAY 秒 (或最早的变更已等待 MAX_DELAY 秒) 后
+    一次性交给 on_changes(dirs, new_trees, overflow_roots)。
+    overflow_roots 中的根目录丢失过事件，需要下游重新完整爬取 (None 表示全部根目录)。
+    """
+    def __init__(self, on_changes, backend_factory=create_backend):
+        self._on_changes = on_changes
+        self._backend_factory = backend_factory
+        self._backend = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._roots = set()             # 已订阅的根目录
+        self._incomplete = set()        # 监视数量不足、没能完整订阅的根目录
+        self._since = {}                # 根目录 -> 开始订阅的时间 (time.time())
+        self._pending_roots = []        # (操作, 根目录)，由读取线程执行 (后端不是线程安全的)
+        self._applied = threading.Event()   # 读取线程已执行完 _pending_roots
+        self._applied.set()
+
+    def start(self):
+        """启动订阅线程；平台没有可用后端时返回 False"""
+        if self._thread and self._thread.is_alive(): return True
+        self._backend = self._backend_factory()
+        if self._backend is None: return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ChangeFeed", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout)
+        self._thread = None
+        if self._backend is not None: self._backend.close()
+        self._backend = None
+        with self._lock:
+            self._roots.clear()
+            self._incomplete.clear()
+            self._since.clear()
+            self._pending_roots.clear()
+            self._applied.set()
+
+    def is_active(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def set_roots(self, roots, timeout=60.0):
+        """
+        让订阅的根目录与 roots 一致 (新增的订阅、消失的取消)。
+        等到读取线程装好监视再返回，调用方随后开始的爬取不会漏掉两者之间的变更。
+        """
+        roots = {os.path.abspath(r) for r in roots}
+        with self._lock:
+            ops = [("add", r) for r in roots - self._roots] + [("remove", r) for r in self._roots - roots]
+            if not ops: return
+            self._pending_roots += ops
+            self._roots = roots
+            self._applied.clear()
+        self._applied.wait(timeout)
+
+    def live_roots(self):
+        """已完整订阅的根目录 -> 开始订阅的时间；此后的变更都会被报告，无需定期重新爬取"""
+        with self._lock:
+            if not self.is_active(): return {}
+            return {r: t for r, t in self._since.items() if r in self._roots and r not in self._incomplete}
+
+    def _apply_root_changes(self):
+        with self._lock:
+            ops, self._pending_roots = self._pending_roots, []
+        if not ops: return
+        for op, root in ops:
+            if op == "remove":
+                self._backend.remove_root(root)
+                with self._lock:
+                    self._incomplete.discard(root)
+                    self._since.pop(root, None)
+            elif not self._backend.add_root(root):
+                logging.warning(f"文件监视数量不足，{root} 仍按定期爬取更新")
+                with self._lock: self._incomplete.add(root)
+            else:
+                with self._lock: self._since[root] = time.time()
+        with self._lock:
+            if not self._pending_roots: self._applied.set()
+
+    def _run(self):
+        dirs, trees, overflow = set(), set(), set()
+        first = last = None
+        while not self._stop.is_set():
+            try:
+                self._apply_root_changes()
+                events = self._backend.read(POLL_TIMEOUT)
+                now = time.monotonic()
+                for kind, path in events:
+                    if kind == CHANGED: dirs.add(path)
+                    elif kind == DIR_ADDED: trees.add(path)
+                    elif kind == OVERFLOW: overflow.add(path)
+                if events:
+                    last = now
+                    if first is None: first = now
+                if first is not None and (now - last >= COALESCE_DELAY or now - first >= MAX_DELAY):
+                    if None in overflow: overflow = {None}
+                    # 新目录的子树会被完整索引，其中的变更不必再逐个处理
+                    dirs = {d for d in dirs if not any(d == t or d.startswith(os.path.join(t, "")) for t in trees)}
+                    self._on_changes(dirs, trees, overflow)
+                    dirs, trees, overflow = set(), set(), set()
+                    first = last = None
+            except Exception as e:
+                logging.error(f"变更订阅线程异常: {e}")
+                time.sleep(POLL_TIMEOUT)
@@ -35,9 +35,23 @@ class ColorLabelService:
             if color_name:  
                 # 3. 记录历史
                 PreferenceService.add_recent_color(color_name)  
-                # 4. 【新增】记录到全局 color_labels.json
+                # 4. 【新增】记录到全局颜色标签表 (color_labels)
                 data_manager.record_color(color_name)
                   
             return updated_info  
           
-        return None
\ No newline at end of file
+        return None
+
+    @staticmethod
+    def set_color_many(full_paths, color_name):
+        """
+        批量设置颜色：每个文件夹只读写一次 meta，数据库一个事务，历史记录只写一次。
+        返回 {full_path: 更新后的元数据}
+        """
+        updated = LocalStoreService.update_attr_many(full_paths, "color", color_name)
+        if updated:
+            AssetService.update_attr_many("color", color_name, list(updated))
+            if color_name:
+                PreferenceService.add_recent_color(color_name)
+                data_manager.record_color(color_name)
+        return updated
@@ -4,6 +4,7 @@ from services.local_store import LocalStoreService
 from services.tag_service import TagService
 import os
 import logging
+from core.tree_walker import TreeWalker
 
 class FolderTagService:
     @staticmethod
@@ -21,52 +22,56 @@ class FolderTagService:
     @staticmethod
     def _apply_recursive(folder_path, tags_list):
         """递归遍历目录并添加标签"""
-        # 遍历当前目录下的所有文件和文件夹
-        for root, dirs, files in os.walk(folder_path):
+        # 目录枚举由 TreeWalker 并行完成，打标签 (写 meta / 数据库) 仍在当前线程顺序执行
+        walker = TreeWalker(skip_prefixes=(LocalStoreService.META_FILENAME,))
+        for result in walker.walk([folder_path]):
             # 给文件打标签
-            for file in files:
-                if file == LocalStoreService.META_FILENAME: continue
-                full_path = os.path.join(root, file)
-                TagService.add_tags_batch(full_path, tags_list)
+            for file in result.files:
+                TagService.add_tags_batch(os.path.join(result.path, file), tags_list)
             
             # 给文件夹打标签
-            for d in dirs:
-                full_path = os.path.join(root, d)
-                TagService.add_tags_batch(full_path, tags_list)
+            for d in result.folders:
+                TagService.add_tags_batch(os.path.join(result.path, d), tags_list)
 
     @staticmethod
-    def scan_and_apply_auto_tags(folder_path, meta_data):
+    def scan_and_apply_auto_tags(folder_path, meta_data, changes=None):
         """
         【核心逻辑】供扫描线程调用。
         检查当前文件夹是否有自动标签配置，如果有，找出没有标签的新文件进行自动标记。
+        传入 scan_changes 的变更集时只检查新增 / 修改的条目；
+        打上标签后同步回 meta_data，后续入库和界面展示用的都是最新标签。
         """
-        auto_tags = LocalStoreService.get_folder_auto_tags(folder_path)
+        folder_info = meta_data.get("folder_info") if isinstance(meta_data.get("folder_info"), dict) else None
+        if folder_info is not None:
+            auto_tags = folder_info.get("auto_tags", [])
+        else:
+            auto_tags = LocalStoreService.get_folder_auto_tags(folder_path)
         if not auto_tags:
             return False
 
+        candidates = None
+        if changes and not changes.get("full"):
+            candidates = set(changes.get("added", [])) | set(changes.get("modified", []))
+            if not candidates: return False
+
         updated = False
-        # 1. 检查文件
         files_map = meta_data.get("files", {})
-        for filename, info in files_map.items():
-            current_tags = info.get("tags", [])
-            # 只要自动标签不在当前标签里，就追加
-            missing_tags = [t for t in auto_tags if t not in current_tags]
-            
-            if missing_tags:
-                full_path = os.path.join(folder_path, filename)
-                # 直接调用 TagService 写入
-                TagService.add_tags_batch(full_path, missing_tags)
-                updated = True
-
-        # 2. 检查子文件夹 (同理)
         sub_folders = meta_data.get("sub_folders", {})
-        if isinstance(sub_folders, dict):
-            for dirname, info in sub_folders.items():
-                current_tags = info.get("tags", [])
+        targets = [files_map]
+        # 2. 子文件夹同理
+        if isinstance(sub_folders, dict): targets.append(sub_folders)
+
+        for entries in targets:
+            names = entries.keys() if candidates is None else [n for n in candidates if n in entries]
+            for name in list(names):
+                current_tags = entries[name].get("tags", [])
+                # 只要自动标签不在当前标签里，就追加
                 missing_tags = [t for t in auto_tags if t not in current_tags]
                 if missing_tags:
-                    full_path = os.path.join(folder_path, dirname)
-                    TagService.add_tags_batch(full_path, missing_tags)
+                    full_path = os.path.join(folder_path, name)
+                    # 直接调用 TagService 写入
+                    new_info = TagService.add_tags_batch(full_path, missing_tags)
+                    if new_info: entries[name] = new_info
                     updated = True
                 
         return updated
\ No newline at end of file
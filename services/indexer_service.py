@@ -0,0 +1,325 @@
+# G:\PYthon\AssetManager\services\indexer_service.py
+
+import os
+import time
+import logging
+import threading
+from core.db_manager import db
+from services.local_store import LocalStoreService
+from services.asset_service import AssetService
+from services.folder_tag_service import FolderTagService
+from services.change_feed_service import ChangeFeed
+
+# === 后台索引参数 ===
+STATE_PENDING, STATE_RUNNING, STATE_FAILED = 0, 1, 3
+MAX_ATTEMPTS = 3                 # 同一目录失败超过这个次数后不再重试 (直到下一轮爬取)
+RESCAN_INTERVAL = 6 * 3600       # 秒，一轮爬取完成后多久重新爬取
+IDLE_WAIT = 30                   # 秒，队列为空时的轮询间隔
+# 资源预算：按上一次任务的实际耗时计算需要休眠多久
+DUTY_CYCLE = 0.3                 # 墙钟时间占比 (包含 I/O 等待)
+CPU_BUDGET = 0.15                # 本线程最多占用单核 CPU 的比例
+IO_BUDGET_ENTRIES = 2000         # 每秒最多处理的目录条目数
+MAX_SLEEP = 5.0
+ROOTS_REFRESH = 60               # 秒，多久核对一次变更订阅的根目录 (加入 / 移除资源库后生效)
+
+class IndexerService:
+    """资源库根目录与持久化目录任务队列 (index_jobs)。所有方法可在任意线程调用。"""
+
+    # === 根目录 ===
+    @staticmethod
+    def add_root(path):
+        path = os.path.abspath(path)
+        if not os.path.isdir(path): return None
+        volume_id = AssetService.get_volume_id_by_path(path)
+        with db.session() as conn:
+            conn.execute('INSERT OR IGNORE INTO library_roots (path, volume_id) VALUES (?, ?)', (path, volume_id))
+            conn.execute('UPDATE library_roots SET enabled = 1 WHERE path = ?', (path,))
+            root_id = conn.execute('SELECT id FROM library_roots WHERE path = ?', (path,)).fetchone()[0]
+            IndexerService._start_crawl(conn, root_id, path)
+        return root_id
+
+    @staticmethod
+    def remove_root(path):
+        path = os.path.abspath(path)
+        with db.session() as conn:
+            row = conn.execute('SELECT id FROM library_roots WHERE path = ?', (path,)).fetchone()
+            if not row: return False
+            conn.execute('DELETE FROM index_jobs WHERE root_id = ?', (row[0],))
+            conn.execute('DELETE FROM library_roots WHERE id = ?', (row[0],))
+        return True
+
+    @staticmethod
+    def get_roots():
+        rows = db.get_connection().execute('''
+            SELECT r.id, r.path, r.enabled, r.last_indexed,
+                   (SELECT COUNT(*) FROM index_jobs j WHERE j.root_id = r.id AND j.state IN (0, 1)) AS pending
+            FROM library_roots r ORDER BY r.path''').fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _start_crawl(conn, root_id, path):
+        conn.execute('UPDATE library_roots SET crawl_started = ? WHERE id = ?', (time.time(), root_id))
+        conn.execute('''INSERT INTO index_jobs (root_id, path, state, attempts, updated_at) VALUES (?, ?, 0, 0, ?)
+            ON CONFLICT(path) DO UPDATE SET state = 0, attempts = 0, last_error = NULL''', (root_id, path, time.time()))
+
+    # === 任务队列 ===
+    @staticmethod
+    def reset_running():
+        """启动时调用：上次异常退出时处理到一半的任务重新排队"""
+        with db.session() as conn:
+            conn.execute('UPDATE index_jobs SET state = 0 WHERE state = 1')
+
+    @staticmethod
+    def pending_count():
+        return db.get_connection().execute('SELECT COUNT(*) FROM index_jobs WHERE state IN (0, 1)').fetchone()[0]
+
+    @staticmethod
+    def claim_next():
+        """取出最早的待处理任务并标记为处理中，返回 (job_id, root_id, path)；没有任务返回 None"""
+        with db.session() as conn:
+            row = conn.execute('''SELECT j.id, j.root_id, j.path FROM index_jobs j
+                JOIN library_roots r ON r.id = j.root_id AND r.enabled = 1
+                WHERE j.state = 0 ORDER BY j.id LIMIT 1''').fetchone()
+            if not row: return None
+            conn.execute('UPDATE index_jobs SET state = 1, updated_at = ? WHERE id = ?', (time.time(), row[0]))
+            return row[0], row[1], row[2]
+
+    @staticmethod
+    def finish_job(job_id, root_id, sub_folders):
+        """任务完成：删除任务行，同时把子文件夹加入队列 (同一事务，中途退出不会丢目录)"""
+        now = time.time()
+        with db.session() as conn:
+            conn.execute('DELETE FROM index_jobs WHERE id = ?', (job_id,))
+            conn.executemany('INSERT OR IGNORE INTO index_jobs (root_id, path, state, attempts, updated_at) VALUES (?, ?, 0, 0, ?)',
+                             [(root_id, p, now) for p in sub_folders])
+
+    @staticmethod
+    def fail_job(job_id, error):
+        with db.session() as conn:
+            conn.execute('''UPDATE index_jobs SET attempts = attempts + 1, last_error = ?, updated_at = ?,
+                state = CASE WHEN attempts + 1 >= ? THEN 3 ELSE 0 END WHERE id = ?''',
+                (str(error)[:500], time.time(), MAX_ATTEMPTS, job_id))
+
+    @staticmethod
+    def enqueue_tree(path):
+        """把一个目录 (及其子树) 加入爬取队列，返回所属根目录 id；不在任何根目录下时返回 None"""
+        path = os.path.abspath(path)
+        roots = db.get_connection().execute('SELECT id, path FROM library_roots WHERE enabled = 1').fetchall()
+        owner = max((r for r in roots if path == r[1] or path.startswith(os.path.join(r[1], ""))),
+                    key=lambda r: len(r[1]), default=None)
+        if owner is None: return None
+        with db.session() as conn:
+            conn.execute('''INSERT INTO index_jobs (root_id, path, state, attempts, updated_at) VALUES (?, ?, 0, 0, ?)
+                ON CONFLICT(path) DO UPDATE SET state = 0, attempts = 0, last_error = NULL''', (owner[0], path, time.time()))
+        return owner[0]
+
+    @staticmethod
+    def recrawl_roots(paths=None):
+        """变更订阅丢失事件时调用：这些根目录 (None = 全部) 立即开始新一轮爬取"""
+        with db.session() as conn:
+            rows = conn.execute('SELECT id, path FROM library_roots WHERE enabled = 1').fetchall()
+            for root_id, path in rows:
+                if paths is None or path in paths: IndexerService._start_crawl(conn, root_id, path)
+
+    @staticmethod
+    def schedule_rescans(live_roots=None):
+        """
+        队列空闲时调用：
+        1. 没有剩余任务的根目录标记本轮爬取完成
+        2. 完成时间超过 RESCAN_INTERVAL 的根目录开始新一轮爬取
+        live_roots: {根目录: 开始订阅的时间}。订阅开始时仍在 RESCAN_INTERVAL 内的根目录 (或订阅后已补爬过一轮)
+                    由变更订阅保持新鲜，不再定期重新爬取；程序未运行期间的变化由订阅后的首轮补爬发现
+        """
+        now = time.time()
+        live_roots = live_roots or {}
+        with db.session() as conn:
+            conn.execute('''UPDATE library_roots SET last_indexed = ?
+                WHERE crawl_started IS NOT NULL AND (last_indexed IS NULL OR last_indexed < crawl_started)
+                  AND NOT EXISTS (SELECT 1 FROM index_jobs j WHERE j.root_id = library_roots.id AND j.state IN (0, 1))''', (now,))
+            conn.execute('DELETE FROM index_jobs WHERE state = 3 AND updated_at < ?', (now - RESCAN_INTERVAL,))
+            due = conn.execute('''SELECT id, path, last_indexed FROM library_roots
+                WHERE enabled = 1 AND (last_indexed IS NULL OR last_indexed < ?)
+                  AND NOT EXISTS (SELECT 1 FROM index_jobs j WHERE j.root_id = library_roots.id AND j.state IN (0, 1))''',
+                (now - RESCAN_INTERVAL,)).fetchall()
+            due = [(root_id, path) for root_id, path, last_indexed in due
+                   if path not in live_roots or (last_indexed or 0) < live_roots[path] - RESCAN_INTERVAL]
+            for root_id, path in due:
+                IndexerService._start_crawl(conn, root_id, path)
+        return len(due)
+
+    # === 单个目录 ===
+    @staticmethod
+    def index_folder(path):
+        """
+        索引一个目录 (不递归)：只读扫描 (不写 .am_meta.json)，同步到数据库，
+        清理数据库中已不存在的子项。返回 (子文件夹路径列表, 条目数)。
+        """
+        if not os.path.isdir(path):
+            # 目录已被删除：父目录下一轮索引时会把它从数据库中清理掉
+            return [], 0
+        meta, _ = LocalStoreService.scan_changes(path, persist=False)
+        if meta is None: raise OSError(f"无法读取目录: {path}")
+
+        volume_id = AssetService.get_volume_id_by_path(path)
+        files = meta.get("files", {})
+        folders = meta.get("sub_folders", {}) if isinstance(meta.get("sub_folders"), dict) else {}
+        AssetService.sync_from_meta(path, volume_id, meta)
+        AssetService.prune_missing_children(path, volume_id, list(files) + list(folders))
+        return [os.path.join(path, name) for name in folders], len(files) + len(folders)
+
+    @staticmethod
+    def apply_changes(path):
+        """
+        变更订阅报告的单个目录 (不递归)：增量扫描后同步数据库，返回条目数。
+        已有 .am_meta.json 的目录 (用户打开过) 同时写回 meta，其余目录保持只读，与后台索引一致。
+        """
+        if not os.path.isdir(path):
+            # 目录本身已删除：父目录的变更会把它从数据库中清理掉
+            return 0
+        persist = os.path.exists(LocalStoreService.get_meta_path(path))
+        meta, changes = LocalStoreService.scan_changes(path, persist=persist)
+        if meta is None: raise OSError(f"无法读取目录: {path}")
+
+        volume_id = AssetService.get_volume_id_by_path(path)
+        files = meta.get("files", {})
+        folders = meta.get("sub_folders", {}) if isinstance(meta.get("sub_folders"), dict) else {}
+        if persist: FolderTagService.scan_and_apply_auto_tags(path, meta, changes)
+        AssetService.sync_from_meta(path, volume_id, meta, changes)
+        AssetService.prune_missing_children(path, volume_id, list(files) + list(folders))
+        return len(files) + len(folders)
+
+class LibraryIndexer:
+    """
+    后台索引线程：按顺序处理 index_jobs，每处理完一个目录按资源预算休眠，
+    让界面操作与前台扫描优先。任务状态都在数据库中，重启后从断点继续。
+    平台支持时同时订阅所有根目录的文件变更 (ChangeFeed)：变化的目录先于爬取任务增量更新，
+    被完整订阅的根目录不再定期重新爬取。
+    """
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.indexed_dirs = 0
+        self.indexed_entries = 0
+        self.feed = ChangeFeed(self._on_feed_changes)
+        self._dirty = set()             # 变更订阅报告、等待增量更新的目录
+        self._dirty_lock = threading.Lock()
+        self._roots_checked = None      # 上次核对订阅根目录的时间 (None = 下一轮立即核对)
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LibraryIndexer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread: self._thread.join(timeout)
+        self._thread = None
+        self.feed.stop()
+
+    def wake(self):
+        """有新根目录或新任务时调用，结束空闲等待"""
+        self._roots_checked = None
+        self._wake.set()
+
+    def _on_feed_changes(self, dirs, new_trees, overflow_roots):
+        """ChangeFeed 线程的回调：新目录 / 丢失事件的根目录进爬取队列，其余目录登记后交给索引线程"""
+        try:
+            for path in new_trees: IndexerService.enqueue_tree(path)
+            if overflow_roots:
+                IndexerService.recrawl_roots(None if None in overflow_roots else overflow_roots)
+        except Exception as e:
+            logging.error(f"登记文件变更失败: {e}")
+        with self._dirty_lock:
+            self._dirty.update(dirs)
+        self._wake.set()
+
+    def _refresh_feed_roots(self):
+        """让变更订阅的根目录与 library_roots 一致 (每 ROOTS_REFRESH 秒，或 wake() 之后)"""
+        now = time.monotonic()
+        if self._roots_checked is not None and now - self._roots_checked < ROOTS_REFRESH: return
+        self._roots_checked = now
+        roots = [r["path"] for r in IndexerService.get_roots() if r["enabled"]]
+        if roots and not self.feed.start(): return
+        self.feed.set_roots(roots)
+
+    def _take_dirty(self):
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def _apply_dirty(self, dirty):
+        """增量更新变更订阅报告的目录，返回处理的条目数"""
+        entries = 0
+        for path in sorted(dirty):
+            if self._stop.is_set(): break
+            try:
+                entries += IndexerService.apply_changes(path)
+                self.indexed_dirs += 1
+            except Exception as e:
+                logging.error(f"增量更新失败: {path} - {e}")
+        self.indexed_entries += entries
+        return entries
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _sleep(self, seconds):
+        """可被 stop() / wake() 打断的休眠；返回 True 表示应当退出"""
+        self._wake.wait(seconds)
+        self._wake.clear()
+        return self._stop.is_set()
+
+    @staticmethod
+    def _budget_sleep(wall, cpu, entries):
+        return min(MAX_SLEEP, max(0.0,
+                                  wall / DUTY_CYCLE - wall,
+                                  cpu / CPU_BUDGET - wall,
+                                  entries / IO_BUDGET_ENTRIES - wall))
+
+    def _run(self):
+        try:
+            IndexerService.reset_running()
+        except Exception as e:
+            logging.error(f"索引队列恢复失败: {e}")
+
+        while not self._stop.is_set():
+            try:
+                self._refresh_feed_roots()
+                dirty = self._take_dirty()
+                if dirty:
+                    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                    entries = self._apply_dirty(dirty)
+                    wall = time.perf_counter() - wall_start
+                    cpu = time.thread_time() - cpu_start
+                    if self._sleep(self._budget_sleep(wall, cpu, entries)): break
+                    continue
+
+                job = IndexerService.claim_next()
+                if job is None:
+                    if IndexerService.schedule_rescans(self.feed.live_roots()): continue
+                    if self._sleep(IDLE_WAIT): break
+                    continue
+
+                job_id, root_id, path = job
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    sub_folders, entries = IndexerService.index_folder(path)
+                    IndexerService.finish_job(job_id, root_id, sub_folders)
+                    self.indexed_dirs += 1
+                    self.indexed_entries += entries
+                except Exception as e:
+                    logging.error(f"后台索引失败: {path} - {e}")
+                    IndexerService.fail_job(job_id, e)
+                    entries = 0
+                wall = time.perf_counter() - wall_start
+                cpu = time.thread_time() - cpu_start
+                if self._sleep(self._budget_sleep(wall, cpu, entries)): break
+            except Exception as e:
+                logging.error(f"后台索引线程异常: {e}")
+                if self._sleep(IDLE_WAIT): break
+
+# 单例模式：在其他地方直接导入这个实例
+library_indexer = LibraryIndexer()
@@ -1,11 +1,10 @@
 # G:\PYthon\AssetManager\services\local_store.py
 
 import os
-import json
 import uuid
 import time
-import subprocess
-import platform
+from core.meta_cache import meta_cache
+from core.tree_walker import make_entry_record
 
 class LocalStoreService:
     META_FILENAME = ".am_meta.json"
@@ -14,36 +13,16 @@ class LocalStoreService:
     def get_meta_path(folder_path):
         return os.path.join(folder_path, LocalStoreService.META_FILENAME)
 
-    @staticmethod
-    def _hide_file(file_path):
-        if platform.system() == "Windows":
-            try:
-                subprocess.run(["attrib", "+h", file_path], check=False)
-            except Exception:
-                pass
-
     @staticmethod
     def load_local_meta(folder_path):
-        meta_path = LocalStoreService.get_meta_path(folder_path)
-        if not os.path.exists(meta_path):
-            return None
-        try:
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, PermissionError):
-            return None
+        """经由写回缓存读取 (包含尚未落盘的编辑)，返回值可以随意修改"""
+        return meta_cache.load(LocalStoreService.get_meta_path(folder_path))
 
     @staticmethod
     def save_local_meta(folder_path, data):
-        meta_path = LocalStoreService.get_meta_path(folder_path)
+        """整体保存：立即原子写入 (临时文件 + rename) 并设置隐藏属性"""
         try:
-            if platform.system() == "Windows" and os.path.exists(meta_path):
-                subprocess.run(["attrib", "-h", meta_path], check=False)
-            
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            LocalStoreService._hide_file(meta_path)
+            meta_cache.save(LocalStoreService.get_meta_path(folder_path), data)
         except Exception as e:
             print(f"JSON保存失败: {e}")
 
@@ -62,11 +41,7 @@ class LocalStoreService:
         meta = LocalStoreService.load_local_meta(folder_path)
         if not meta:
             # 如果没有 meta，先初始化一个结构
-            meta = {
-                "folder_info": {"uuid": str(uuid.uuid4()), "created_at": time.time()},
-                "files": {},
-                "sub_folders": {}
-            }
+            meta = LocalStoreService._new_meta()
         
         if "folder_info" not in meta:
             meta["folder_info"] = {}
@@ -75,103 +50,131 @@ class LocalStoreService:
         LocalStoreService.save_local_meta(folder_path, meta)
         return True
 
+    # 用户层字段：扫描时从旧 meta 继承，物理层变化不影响它们
+    USER_FIELDS = {"tags": [], "rating": 0, "color": "", "view_count": 0, "pinned": False}
+
     @staticmethod
-    def scan_and_update(folder_path):
-        if not os.path.exists(folder_path): return None
+    def _new_meta():
+        return {
+            "folder_info": {"uuid": str(uuid.uuid4()), "created_at": time.time()},
+            "files": {},
+            "sub_folders": {}
+        }
+
+    @staticmethod
+    def _merge_user_fields(phys_info, stored, is_folder):
+        merged = dict(phys_info)
+        for key, default in LocalStoreService.USER_FIELDS.items():
+            merged[key] = stored.get(key, default) if stored else (list(default) if isinstance(default, list) else default)
+        if is_folder and stored:
+            merged["file_count"] = stored.get("file_count", 0)
+        return merged
+
+    @staticmethod
+    def _is_unchanged(stored, stat, is_folder):
+        """(size, mtime) 指纹一致，且旧记录结构完整，即可直接复用"""
+        if not isinstance(stored, dict): return False
+        if stored.get("mtime") != stat.st_mtime: return False
+        if is_folder: return stored.get("type") == "FOLDER"
+        return stored.get("size") == stat.st_size and "ext" in stored
+
+    @staticmethod
+    def scan_changes(folder_path, persist=True):
+        """
+        增量扫描：对比目录 mtime 与每个条目的 (size, mtime) 指纹。
+        - 未变化的条目直接复用旧记录
+        - 没有任何变化时不写 .am_meta.json
+        - persist=False 时只读不写 (后台索引不在用户目录里生成 meta 文件)
+        返回 (meta, changes)；changes = {"added": [...], "removed": [...], "modified": [...], "full": bool}
+        full=True 表示这是该文件夹第一次增量扫描 (旧 meta 缺少指纹信息)，下游应按全量处理。
+        """
+        if not os.path.exists(folder_path): return None, None
 
-        # 1. 扫描物理层
         try:
-            with os.scandir(folder_path) as entries:
-                real_files = {}
-                real_dirs = {} 
-                for entry in entries:
-                    if entry.name == LocalStoreService.META_FILENAME: continue
-                    
-                    stat = entry.stat()
-                    common_info = {
-                        "ctime": stat.st_ctime,
-                        "mtime": stat.st_mtime,
-                        "atime": stat.st_atime,
-                    }
-                    
-                    if entry.is_file():
-                        _, ext = os.path.splitext(entry.name)
-                        real_files[entry.name] = {
-                            **common_info,
-                            "size": stat.st_size,
-                            "ext": ext.lower()
-                        }
-                    elif entry.is_dir():
-                        real_dirs[entry.name] = {
-                            **common_info,
-                            "size": 0,
-                            "type": "FOLDER"
-                        }
-        except PermissionError: return None
-
-        # 2. 读取逻辑层
+            dir_mtime = os.stat(folder_path).st_mtime
+        except OSError:
+            return None, None
+
+        # 1. 读取逻辑层
         old_meta = LocalStoreService.load_local_meta(folder_path)
-        if old_meta is None:
-            old_meta = {
-                "folder_info": {"uuid": str(uuid.uuid4()), "created_at": time.time()},
-                "files": {},
-                "sub_folders": {}
-            }
-        
+        is_new = old_meta is None
+        if is_new: old_meta = LocalStoreService._new_meta()
+
         old_files = old_meta.get("files", {})
         old_folders = old_meta.get("sub_folders", {})
-        if isinstance(old_folders, list): old_folders = {}
+        structure_fixed = False
+        if not isinstance(old_files, dict): old_files, structure_fixed = {}, True
+        if not isinstance(old_folders, dict): old_folders, structure_fixed = {}, True
+        old_stats = old_meta.get("stats", {}) if isinstance(old_meta.get("stats"), dict) else {}
 
-        # 3. 合并数据 (Files)
+        added, modified = [], []
         new_files_data = {}
-        for name, phys_info in real_files.items():
-            if name in old_files:
-                stored = old_files[name]
-                new_files_data[name] = {
-                    **phys_info,
-                    "tags": stored.get("tags", []),
-                    "rating": stored.get("rating", 0),
-                    "color": stored.get("color", ""),
-                    "view_count": stored.get("view_count", 0),
-                    "pinned": stored.get("pinned", False)
-                }
-            else:
-                new_files_data[name] = {
-                    **phys_info, "tags": [], "rating": 0, "color": "", "view_count": 0, "pinned": False
-                }
-
-        # 4. 合并数据 (Folders)
         new_folders_data = {}
-        for name, phys_info in real_dirs.items():
-            if name in old_folders:
-                stored = old_folders[name]
-                new_folders_data[name] = {
-                    **phys_info,
-                    "tags": stored.get("tags", []),
-                    "rating": stored.get("rating", 0),
-                    "color": stored.get("color", ""),
-                    "view_count": stored.get("view_count", 0),
-                    "pinned": stored.get("pinned", False),
-                    "file_count": stored.get("file_count", 0) 
-                }
-            else:
-                new_folders_data[name] = {
-                    **phys_info, "tags": [], "rating": 0, "color": "", "view_count": 0, "pinned": False
-                }
+
+        # 2. 扫描物理层 (scandir 的 stat 在 Windows 上来自目录枚举缓存)
+        try:
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    # 同时跳过原子写入过程中的临时文件 (.am_meta.json.xxxx.tmp)
+                    if entry.name.startswith(LocalStoreService.META_FILENAME): continue
+                    try:
+                        is_dir = entry.is_dir()
+                        if not is_dir and not entry.is_file(): continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+
+                    name = entry.name
+                    old_map = old_folders if is_dir else old_files
+                    target = new_folders_data if is_dir else new_files_data
+                    stored = old_map.get(name)
+
+                    if LocalStoreService._is_unchanged(stored, stat, is_dir):
+                        stored["atime"] = stat.st_atime   # 访问时间只随下次写入落盘，不单独触发写
+                        target[name] = stored
+                        continue
+
+                    phys_info = make_entry_record(name, stat, is_dir)
+                    target[name] = LocalStoreService._merge_user_fields(phys_info, stored, is_dir)
+                    (modified if stored else added).append(name)
+        except PermissionError: return None, None
+
+        # 3. 目录 mtime 未变时条目名集合不可能变化，无需再求差集
+        removed = []
+        if is_new or old_stats.get("dir_mtime") != dir_mtime:
+            removed = [n for n in old_files if n not in new_files_data]
+            removed += [n for n in old_folders if n not in new_folders_data]
+
+        changes = {
+            "added": added,
+            "removed": removed,
+            "modified": modified,
+            "full": is_new or "dir_mtime" not in old_stats,
+        }
+        dirty = is_new or structure_fixed or changes["full"] or added or removed or modified
+
+        if not dirty:
+            return old_meta, changes
 
         new_meta = {
             "folder_info": old_meta.get("folder_info"),
             "stats": { 
                 "file_count": len(new_files_data), 
                 "dir_count": len(new_folders_data), 
-                "last_scan": time.time() 
+                "last_scan": time.time(),
+                "dir_mtime": dir_mtime
             },
             "files": new_files_data,
             "sub_folders": new_folders_data 
         }
 
-        LocalStoreService.save_local_meta(folder_path, new_meta)
-        return new_meta
+        if persist: LocalStoreService.save_local_meta(folder_path, new_meta)
+        return new_meta, changes
+
+    @staticmethod
+    def scan_and_update(folder_path):
+        meta, _ = LocalStoreService.scan_changes(folder_path)
+        return meta
 
     @staticmethod
     def increment_view_count(folder_path, filename):
@@ -179,25 +182,38 @@ class LocalStoreService:
 
     @staticmethod
     def update_file_attr(folder_path, filename, key, value):
-        meta = LocalStoreService.load_local_meta(folder_path)
-        if not meta: return None
-        
-        target_dict = None
-        
-        if "files" in meta and filename in meta["files"]:
-            target_dict = meta["files"]
-        elif "sub_folders" in meta and isinstance(meta["sub_folders"], dict) and filename in meta["sub_folders"]:
-            target_dict = meta["sub_folders"]
-            
-        if target_dict:
-            current_val = target_dict[filename].get(key)
-            if callable(value):
-                new_val = value(current_val)
-            else:
-                new_val = value
-                
-            target_dict[filename][key] = new_val
-            LocalStoreService.save_local_meta(folder_path, meta)
-            return target_dict[filename]
-            
-        return None
\ No newline at end of file
+        """
+        修改单个条目的属性。只改内存中的 meta 并记入日志，
+        由 meta_cache 合并后延迟落盘 (批量打星 / 打标签时同一文件夹只写一次)。
+        """
+        return meta_cache.edit(LocalStoreService.get_meta_path(folder_path), filename, key, value)
+
+    @staticmethod
+    def update_attr_many(full_paths, key, value):
+        """
+        批量修改多个条目的同一属性 (value 可以是 旧值 -> 新值 的函数)。
+        按所在文件夹分组，每个文件夹只加载 / 写回一次 meta。返回 {full_path: 更新后的条目}。
+        """
+        by_folder = {}
+        for full_path in full_paths:
+            if not full_path: continue
+            by_folder.setdefault(os.path.dirname(full_path), []).append(full_path)
+
+        result = {}
+        for folder, paths in by_folder.items():
+            names = {os.path.basename(p): p for p in paths}
+            updated = meta_cache.edit_many(LocalStoreService.get_meta_path(folder), key,
+                                           {name: value for name in names})
+            for name, info in updated.items():
+                result[names[name]] = info
+        return result
+
+    @staticmethod
+    def flush():
+        """把所有未落盘的编辑立即写回 (程序退出时调用)"""
+        meta_cache.flush()
+
+    @staticmethod
+    def is_own_write(folder_path):
+        """目录变动是否只是我们自己写 .am_meta.json 造成的"""
+        return meta_cache.is_own_write(folder_path)
\ No newline at end of file
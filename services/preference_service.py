@@ -3,78 +3,169 @@
 import os
 import json
 import time
+import logging
+import threading
+from collections import OrderedDict
 from config import PREFS_PATH
+from core.atomic_io import atomic_write_json
+
+# === 写回参数 ===
+SAVE_DELAY = 1.0        # 秒，第一次修改之后多久落盘 (期间的修改合并写入)
+HISTORY_KEYS = ("recent_colors", "recent_tags", "search_history")
 
 class PreferenceService:
+    """
+    用户偏好 (user_prefs.json)。
+    - 文件只在首次访问或被外部修改 (mtime / size 变化) 时读取一次，之后读写都在内存里
+    - 历史记录在内存中是 OrderedDict (值 -> 时间，最近的在末尾)，添加一条是 O(1)
+    - 修改后延迟合并落盘 (临时文件 + rename)，程序退出时 flush()
+    文件格式不变：历史记录仍按最近优先存成 [{"val", "time"}] 列表。
+    """
     MAX_HISTORY_COUNT = 20
 
+    _lock = threading.RLock()
+    _data = None            # 除历史记录外的其他键
+    _histories = {}         # key -> OrderedDict(val -> time)
+    _stamp = None           # 最近一次读 / 写后文件的 (mtime_ns, size)
+    _dirty = False
+    _timer = None
+
+    @staticmethod
+    def _file_stamp():
+        try:
+            st = os.stat(PREFS_PATH)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
     @staticmethod
-    def _load_prefs():
+    def _read_file():
         if not os.path.exists(PREFS_PATH): return {}
         try:
-            with open(PREFS_PATH, 'r', encoding='utf-8') as f: return json.load(f)
+            with open(PREFS_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
         except: return {}
 
     @staticmethod
-    def _save_prefs(data):
-        try:
-            with open(PREFS_PATH, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except: pass
+    def _ensure_loaded():
+        """调用方需持有锁。未加载或文件被外部修改 (且没有未落盘的修改) 时重新读取"""
+        cls = PreferenceService
+        if cls._data is not None and (cls._dirty or cls._file_stamp() == cls._stamp): return
+        data = cls._read_file()
+        cls._stamp = cls._file_stamp()
+        cls._histories = {}
+        for key in HISTORY_KEYS:
+            history = OrderedDict()
+            # 文件中最近的在前，内存中最近的在末尾
+            for item in reversed(data.pop(key, []) or []):
+                if isinstance(item, dict) and item.get("val"): val, stamp = item["val"], item.get("time", 0)
+                elif isinstance(item, str) and item: val, stamp = item, 0
+                else: continue
+                history.pop(val, None)
+                history[val] = stamp
+            cls._histories[key] = history
+        cls._data = data
+
+    @staticmethod
+    def _snapshot():
+        data = dict(PreferenceService._data)
+        for key, history in PreferenceService._histories.items():
+            data[key] = [{"val": val, "time": stamp} for val, stamp in reversed(history.items())]
+        return data
+
+    @staticmethod
+    def _mark_dirty():
+        """调用方需持有锁。定时器只在第一次变脏时启动，期间的修改合并到同一次写入"""
+        cls = PreferenceService
+        cls._dirty = True
+        if cls._timer is not None: return
+        cls._timer = threading.Timer(SAVE_DELAY, cls.flush)
+        cls._timer.daemon = True
+        cls._timer.start()
+
+    @staticmethod
+    def flush():
+        """立即落盘 (程序退出时调用)"""
+        cls = PreferenceService
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+                cls._timer = None
+            if not cls._dirty: return
+            try:
+                atomic_write_json(PREFS_PATH, cls._snapshot())
+                cls._stamp = cls._file_stamp()
+                cls._dirty = False
+            except Exception as e:
+                logging.error(f"保存偏好设置失败: {e}")
+
+    @staticmethod
+    def _get(key, default=None):
+        with PreferenceService._lock:
+            PreferenceService._ensure_loaded()
+            return PreferenceService._data.get(key, default)
+
+    @staticmethod
+    def _set(**values):
+        with PreferenceService._lock:
+            PreferenceService._ensure_loaded()
+            PreferenceService._data.update(values)
+            PreferenceService._mark_dirty()
+
+    @staticmethod
+    def _history_values(key):
+        """最近优先的值列表"""
+        with PreferenceService._lock:
+            PreferenceService._ensure_loaded()
+            return [str(v) for v in reversed(PreferenceService._histories[key]) if v]
 
     @staticmethod
     def _add_to_history(key, value):
-        data = PreferenceService._load_prefs()
-        history = data.get(key, [])
-        cleaned = []
-        for item in history:
-            if isinstance(item, dict): cleaned.append(item)
-            elif isinstance(item, str): cleaned.append({"val": item, "time": 0})
-        cleaned = [x for x in cleaned if x["val"] != value]
-        cleaned.insert(0, {"val": value, "time": time.time()})
-        if len(cleaned) > PreferenceService.MAX_HISTORY_COUNT: cleaned = cleaned[:PreferenceService.MAX_HISTORY_COUNT]
-        data[key] = cleaned
-        PreferenceService._save_prefs(data)
+        PreferenceService._add_many_to_history(key, [value])
+
+    @staticmethod
+    def _add_many_to_history(key, values):
+        """记录多个值 (后面的值排在更前面)；每个值 O(1)，超出上限时从最旧的一端淘汰"""
+        values = [v for v in values if v]
+        if not values: return
+        with PreferenceService._lock:
+            PreferenceService._ensure_loaded()
+            history = PreferenceService._histories[key]
+            now = time.time()
+            for value in values:
+                history[value] = now
+                history.move_to_end(value)
+            while len(history) > PreferenceService.MAX_HISTORY_COUNT:
+                history.popitem(last=False)
+            PreferenceService._mark_dirty()
 
     # === 【新增】删除历史记录 ===
     @staticmethod
     def remove_search_history(keyword):
-        data = PreferenceService._load_prefs()
-        history = data.get("search_history", [])
-        # 过滤掉要删除的
-        new_history = [
-            x for x in history 
-            if (isinstance(x, dict) and x["val"] != keyword) or (isinstance(x, str) and x != keyword)
-        ]
-        data["search_history"] = new_history
-        PreferenceService._save_prefs(data)
-        
+        with PreferenceService._lock:
+            PreferenceService._ensure_loaded()
+            # 过滤掉要删除的
+            if PreferenceService._histories["search_history"].pop(keyword, None) is not None:
+                PreferenceService._mark_dirty()
         # 返回新的纯文本列表供界面刷新
-        result = []
-        for item in new_history:
-            if isinstance(item, dict): result.append(item.get("val"))
-            elif isinstance(item, str): result.append(item)
-        return result
+        return PreferenceService._history_values("search_history")
 
     # === 窗口布局 ===
     @staticmethod
     def save_window_layout(geometry_hex, state_hex):
-        data = PreferenceService._load_prefs()
-        data["window_geometry"] = geometry_hex
-        data["window_state"] = state_hex
-        PreferenceService._save_prefs(data)
+        PreferenceService._set(window_geometry=geometry_hex, window_state=state_hex)
+        # 关闭窗口时保存，随后就要退出，直接落盘
+        PreferenceService.flush()
 
     @staticmethod
     def get_window_layout():
-        data = PreferenceService._load_prefs()
-        return data.get("window_geometry"), data.get("window_state")
+        return PreferenceService._get("window_geometry"), PreferenceService._get("window_state")
 
     # === 颜色 ===
     @staticmethod
     def get_recent_colors():
-        data = PreferenceService._load_prefs()
-        raw = data.get("recent_colors", [])
-        return [x["val"] if isinstance(x, dict) else x for x in raw]
+        return PreferenceService._history_values("recent_colors")
 
     @staticmethod
     def add_recent_color(color_name):
@@ -84,29 +175,21 @@ class PreferenceService:
     # === 标签 ===
     @staticmethod
     def get_recent_tags():
-        data = PreferenceService._load_prefs()
-        history = data.get("recent_tags", [])
-        result = []
-        for item in history:
-            if isinstance(item, dict): result.append(item.get("val"))
-            elif isinstance(item, str): result.append(item)
-        return [str(r) for r in result if r]
+        return PreferenceService._history_values("recent_tags")
 
     @staticmethod
     def add_recent_tag(tag_name):
         if tag_name: PreferenceService._add_to_history("recent_tags", tag_name.strip())
 
+    @staticmethod
+    def add_recent_tags(tag_names):
+        PreferenceService._add_many_to_history("recent_tags", [str(t).strip() for t in tag_names if t])
+
     # === 搜索历史 ===
     @staticmethod
     def get_search_history():
-        data = PreferenceService._load_prefs()
-        history = data.get("search_history", [])
-        result = []
-        for item in history:
-            if isinstance(item, dict): result.append(item.get("val"))
-            elif isinstance(item, str): result.append(item)
-        return [str(r) for r in result if r]
+        return PreferenceService._history_values("search_history")
 
     @staticmethod
     def add_search_history(keyword):
-        if keyword: PreferenceService._add_to_history("search_history", keyword.strip())
\ No newline at end of file
+        if keyword: PreferenceService._add_to_history("search_history", keyword.strip())
@@ -31,4 +31,15 @@ class RatingService:
         # 2. 更新全局数据库 (assets_library.db)
         AssetService.update_rating(full_path, rating)
         
-        return updated_info
\ No newline at end of file
+        return updated_info
+
+    @staticmethod
+    def set_rating_many(full_paths, rating):
+        """
+        批量设置星级：每个文件夹只读写一次 meta，数据库一个事务。
+        返回 {full_path: 更新后的元数据}
+        """
+        rating = max(0, min(5, int(rating)))
+        updated = LocalStoreService.update_attr_many(full_paths, "rating", rating)
+        AssetService.update_attr_many("rating", rating, list(updated))
+        return updated
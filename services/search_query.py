@@ -0,0 +1,348 @@
+# G:\PYthon\AssetManager\services\search_query.py
+
+import re
+import time
+import datetime
+
+# === 结构化搜索语法 ===
+# 示例: tag:client-x rating>=4 type:png color:red size>10MB modified<30d
+#       (type:psd OR type:ai) -tag:废弃 "final draft"
+# - 空格分隔的条件默认 AND，支持 AND / OR / NOT (或前缀 -) 与括号
+# - 字段条件编译成 assets 上的索引条件 / asset_tags 关联子查询；普通关键字走 FTS5
+# - 所有值都以参数绑定，不拼接进 SQL
+
+class SearchQueryError(ValueError):
+    """查询语法错误 (消息可直接显示给用户)"""
+
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+              "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+MAX_SQL_INTEGER = 2 ** 63 - 1     # SQLite INTEGER 的上限，更大的整数绑定时会溢出
+MAX_RATING = 5
+AGE_UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "mo": 30 * 86400, "y": 365 * 86400}
+
+FIELD_ALIASES = {
+    "tag": "tag", "tags": "tag", "标签": "tag",
+    "type": "type", "ext": "type", "类型": "type",
+    "color": "color", "颜色": "color",
+    "rating": "rating", "star": "rating", "星级": "rating",
+    "size": "size", "大小": "size",
+    "modified": "modified", "mtime": "modified", "修改": "modified",
+    "name": "name", "文件名": "name",
+    "path": "path", "路径": "path",
+}
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<term>-?(?:[^\s()"]+?(?:>=|<=|!=|>|<|=|:))?(?:"(?:[^"]|"")*"|[^\s()"]+))
+''', re.VERBOSE)
+_FIELD_TERM_RE = re.compile(r'^(?P<field>[^\s:<>=!"]+)(?P<op>>=|<=|!=|>|<|=|:)(?P<value>.+)$', re.S)
+
+# === 语法树 ===
+class And:
+    def __init__(self, items): self.items = items
+    def __repr__(self): return f"And({self.items!r})"
+
+class Or:
+    def __init__(self, items): self.items = items
+    def __repr__(self): return f"Or({self.items!r})"
+
+class Not:
+    def __init__(self, item): self.item = item
+    def __repr__(self): return f"Not({self.item!r})"
+
+class Field:
+    def __init__(self, field, op, value): self.field, self.op, self.value = field, op, value
+    def __repr__(self): return f"Field({self.field}{self.op}{self.value!r})"
+
+class Text:
+    def __init__(self, value, phrase=False): self.value, self.phrase = value, phrase
+    def __repr__(self): return f"Text({self.value!r})"
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('""', '"'), True
+    return value, False
+
+def tokenize(text):
+    """-> [(kind, value)]，kind 为 ( ) AND OR NOT TERM"""
+    tokens, pos = [], 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m: raise SearchQueryError(f"无法解析: {text[pos:pos + 20]}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "ws": continue
+        if kind in ("lparen", "rparen"):
+            tokens.append((m.group(), None))
+            continue
+        raw = m.group()
+        upper = raw.upper()
+        if upper in ("AND", "OR", "NOT"):
+            tokens.append((upper, None))
+        elif raw == "-":
+            tokens.append(("TERM", raw))
+        elif raw.startswith("-"):
+            tokens.append(("NOT", None))
+            tokens.append(("TERM", raw[1:]))
+        else:
+            tokens.append(("TERM", raw))
+    return tokens
+
+class _Parser:
+    """
+    递归下降：
+        expr   := and ( OR and )*
+        and    := unary ( [AND] unary )*
+        unary  := NOT unary | atom
+        atom   := '(' expr ')' | TERM
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens: return None
+        node = self.expr()
+        if self.pos != len(self.tokens): raise SearchQueryError("括号不匹配")
+        return node
+
+    def expr(self):
+        items = [self.conj()]
+        while self.peek() == "OR":
+            self.take()
+            items.append(self.conj())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def conj(self):
+        items = [self.unary()]
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND": self.take()
+            items.append(self.unary())
+        return items[0] if len(items) == 1 else And(items)
+
+    def unary(self):
+        if self.peek() == "NOT":
+            self.take()
+            return Not(self.unary())
+        return self.atom()
+
+    def atom(self):
+        kind = self.peek()
+        if kind is None: raise SearchQueryError("查询不完整")
+        if kind == "(":
+            self.take()
+            node = self.expr()
+            if self.peek() != ")": raise SearchQueryError("缺少右括号")
+            self.take()
+            return node
+        if kind != "TERM": raise SearchQueryError(f"意外的 {kind}")
+        return _make_term(self.take()[1])
+
+def _make_term(raw):
+    m = _FIELD_TERM_RE.match(raw)
+    if m and m.group("field").lower() in FIELD_ALIASES:
+        value, _ = _unquote(m.group("value"))
+        if not value: raise SearchQueryError(f"缺少取值: {raw}")
+        return Field(FIELD_ALIASES[m.group("field").lower()], m.group("op"), value)
+    value, phrase = _unquote(raw)
+    return Text(value, phrase)
+
+def parse(text):
+    """查询字符串 -> 语法树 (空查询返回 None)"""
+    return _Parser(tokenize(text or "")).parse()
+
+def is_structured(text):
+    """是否用到了字段 / 布尔语法；纯关键字仍走原来的 bm25 排序检索"""
+    try:
+        tokens = tokenize(text or "")
+    except SearchQueryError:
+        return False
+    for kind, value in tokens:
+        if kind != "TERM": return True
+        if isinstance(_make_term(value), Field): return True
+    return False
+
+# === 取值解析 ===
+def parse_size(value):
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([a-zA-Z]*)', value.strip())
+    if not m or m.group(2).upper() not in SIZE_UNITS: raise SearchQueryError(f"无法识别的大小: {value}")
+    number, unit = m.group(1), SIZE_UNITS[m.group(2).upper()]
+    try:
+        # 整数用整数运算，避免大数经过 float 损失精度
+        size = int(float(number) * unit) if "." in number else int(number) * unit
+    except OverflowError:
+        size = MAX_SQL_INTEGER + 1
+    if size > MAX_SQL_INTEGER: raise SearchQueryError(f"大小超出范围: {value}")
+    return size
+
+def parse_time(value, now=None):
+    """
+    -> (起始时间戳, 结束时间戳, is_age)
+    相对时间 30d / 2w / 6h / 3mo / 1y 返回 (now - 时长, now, True)；
+    日期 2024-01-31 / 2024-01 / 2024 返回该日 / 月 / 年的 [起, 止) 区间
+    """
+    value = value.strip()
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*(s|min|h|d|w|mo|y)', value, re.I)
+    if m:
+        now = time.time() if now is None else now
+        return now - float(m.group(1)) * AGE_UNITS[m.group(2).lower()], now, True
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m", "%Y"):
+        try:
+            start = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        try:
+            if fmt == "%Y":
+                end = start.replace(year=start.year + 1)
+            elif fmt == "%Y-%m":
+                end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+            else:
+                end = start + datetime.timedelta(days=1)
+            return start.timestamp(), end.timestamp(), False
+        except (ValueError, OverflowError, OSError):
+            # 9999 年末 / 0001 年初等边界日期：区间或时间戳超出 datetime 的范围
+            raise SearchQueryError(f"时间超出范围: {value}")
+    raise SearchQueryError(f"无法识别的时间: {value}")
+
+# === 编译 ===
+# 字段条件的选择性提示 (likelihood)：没有 sqlite_stat4 时，SQLite 把单边范围估成全表的 1/4，
+# ANALYZE 之后又按均匀分布估算等值条件 (rating 几乎全是 0 时 rating:5 也被估成半张表)，
+# 两种情况下按 ORDER BY a.id 顺序扫全表都会压过索引。筛选条件通常很窄，这里显式声明。
+FIELD_SELECTIVITY = 0.01
+
+_FLIP = {">": "<", "<": ">", ">=": "<=", "<=": ">=", "=": "=", "!=": "!="}
+
+def _escape_fts(value):
+    return '"' + value.replace('"', '""') + '"'
+
+def _range_upper(prefix):
+    """前缀匹配的上界：prefix <= x < upper 可以走索引范围扫描 (代替 LIKE 'prefix%')"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class _Compiler:
+    def __init__(self, trigram, now=None):
+        self.trigram = trigram
+        self.now = now
+        self.params = []
+
+    def compile(self, node):
+        if isinstance(node, And):
+            return "(" + " AND ".join(self.compile(i) for i in node.items) + ")"
+        if isinstance(node, Or):
+            return "(" + " OR ".join(self.compile(i) for i in node.items) + ")"
+        if isinstance(node, Not):
+            return "NOT (" + self.compile(node.item) + ")"
+        if isinstance(node, Text):
+            return self._fts(None, node.value)
+        return getattr(self, "_field_" + node.field)(node.op, node.value)
+
+    def _bind(self, *values):
+        self.params.extend(values)
+
+    def _indexed(self, cond):
+        """声明为高选择性的单列条件：只影响查询规划，不影响结果"""
+        return f"likelihood({cond}, {FIELD_SELECTIVITY})"
+
+    def _fts(self, column, value):
+        """全文条件：rowid IN (FTS 子查询)，由 FTS5 倒排索引求值"""
+        if self.trigram and len(value) < 3:
+            # trigram 无法索引少于 3 个字符的词，只能在 FTS 表内做 LIKE (仍是单表扫描，不经过 JOIN)
+            like = '%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            cols = [column] if column else ["name", "segments", "type", "tags"]
+            self._bind(*([like] * len(cols)))
+            cond = " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in cols)
+            return f"a.id IN (SELECT rowid FROM assets_fts WHERE {cond})"
+        expr = _escape_fts(value) if self.trigram else _escape_fts(value) + "*"
+        self._bind(f"{column} : {expr}" if column else expr)
+        return "a.id IN (SELECT rowid FROM assets_fts WHERE assets_fts MATCH ?)"
+
+    def _compare(self, column, op, value):
+        op = "=" if op == ":" else op
+        self._bind(value)
+        cond = f"a.{column} {op} ?"
+        return cond if op == "!=" else self._indexed(cond)
+
+    def _field_tag(self, op, value):
+        if op not in (":", "=", "!="): raise SearchQueryError(f"标签不支持 {op}")
+        # tags.name 唯一索引 -> idx_asset_tags_tag (tag_id, asset_id) -> assets 主键
+        if value.endswith("*") and len(value) > 1:
+            prefix = value[:-1]
+            self._bind(prefix, _range_upper(prefix))
+            cond = "a.id IN (SELECT at.asset_id FROM tags t JOIN asset_tags at ON at.tag_id = t.id WHERE t.name >= ? AND t.name < ?)"
+        else:
+            self._bind(value)
+            cond = "a.id IN (SELECT at.asset_id FROM tags t JOIN asset_tags at ON at.tag_id = t.id WHERE t.name = ?)"
+        return f"NOT {cond}" if op == "!=" else cond
+
+    def _field_type(self, op, value):
+        if op not in (":", "=", "!="): raise SearchQueryError(f"类型不支持 {op}")
+        values = [v.strip().lstrip(".").upper() for v in value.split(",") if v.strip()]
+        if not values: raise SearchQueryError(f"缺少类型: {value}")
+        self._bind(*values)
+        cond = f"a.type IN ({','.join('?' * len(values))})"
+        return f"NOT {cond}" if op == "!=" else self._indexed(cond)
+
+    def _field_color(self, op, value):
+        if op not in (":", "=", "!="): raise SearchQueryError(f"颜色不支持 {op}")
+        if value.lower() in ("none", "无"):
+            return "COALESCE(a.color, '') != ''" if op == "!=" else "COALESCE(a.color, '') = ''"
+        return self._compare("color", op, value)
+
+    def _field_rating(self, op, value):
+        try:
+            rating = int(value)
+        except ValueError:
+            raise SearchQueryError(f"星级必须是整数: {value}")
+        if not 0 <= rating <= MAX_RATING: raise SearchQueryError(f"星级应在 0-{MAX_RATING} 之间: {value}")
+        return self._compare("rating", op, rating)
+
+    def _field_size(self, op, value):
+        return self._compare("size", op, parse_size(value))
+
+    def _field_modified(self, op, value):
+        start, end, is_age = parse_time(value, self.now)
+        if is_age:
+            # modified<30d 表示 "30 天以内"，即 mtime > now - 30d；modified:30d 同 <30d
+            op = {":": "<", "=": "<", "!=": ">="}.get(op, op)
+            self._bind(start)
+            return self._indexed(f"a.mtime {_FLIP[op]} ?")
+        op = "=" if op == ":" else op
+        if op in ("=", "!="):
+            # 日期相等表示落在这一天 (或这个月 / 年) 之内
+            self._bind(start, end)
+            if op == "!=": return "NOT (a.mtime >= ? AND a.mtime < ?)"
+            # 两个边界分别声明，规划器才能把它们合成一次索引范围扫描
+            return f"({self._indexed('a.mtime >= ?')} AND {self._indexed('a.mtime < ?')})"
+        # 早于某日 = 该日起点之前；晚于某日 = 该日结束之后
+        self._bind(end if op in (">", "<=") else start)
+        return self._indexed(f"a.mtime {'>=' if op == '>' else '<' if op == '<=' else op} ?")
+
+    def _field_name(self, op, value):
+        if op not in (":", "="): raise SearchQueryError(f"文件名不支持 {op}")
+        fts = self._fts("name", value)
+        if op == "=":
+            # 精确文件名：先由 FTS 缩小候选，再做等值比较 (name 列没有单独的索引)
+            self._bind(value)
+            return f"({fts} AND a.name = ?)"
+        return fts
+
+    def _field_path(self, op, value):
+        if op not in (":", "="): raise SearchQueryError(f"路径不支持 {op}")
+        return self._fts("segments", value)
+
+def compile_query(text, trigram=True, now=None):
+    """查询字符串 -> (WHERE 条件, 参数)；空查询返回 ("1", [])"""
+    tree = parse(text)
+    if tree is None: return "1", []
+    compiler = _Compiler(trigram, now)
+    return compiler.compile(tree), compiler.params
@@ -1,5 +1,6 @@
 from core.db_manager import db
 from core.drive_scanner import WindowsDriveScanner
+from services.asset_service import AssetService
 
 class StartupService:
     @staticmethod
@@ -16,8 +17,7 @@ class StartupService:
         current_map = WindowsDriveScanner.get_physical_drives() 
         # 结果示例: {'A1B2-C3D4': 'E:', 'X9Y8-Z7W6': 'F:'}
 
-        conn = db.get_connection()
-        with conn:
+        with db.session() as conn:
             # 2. 重置状态：先假设所有硬盘都拔了
             conn.execute("UPDATE volumes SET is_active = 0")
 
@@ -39,6 +39,8 @@ class StartupService:
                     print(f"  [+] 新硬盘注册: {mount_point} ({serial})")
                 else:
                     print(f"  [v] 硬盘已激活: {mount_point} ({serial})")
+
+        # 盘符可能已经改变；资源只保存卷内相对路径，更新 volumes 即完成重新挂载
+        AssetService.invalidate_volume_cache()
         
-        conn.close()
         print("同步完成。系统进入沉浸模式。")
\ No newline at end of file
@@ -143,4 +143,37 @@ class TagService:
             # 【核心】同步到数据库
             AssetService.update_tags(full_path, new_tags)
                 
-        return updated_info
\ No newline at end of file
+        return updated_info
+
+    # === 批量接口 (多选操作)：每个文件夹只读写一次 meta，数据库一个事务，全局标签 / 历史各写一次 ===
+    @staticmethod
+    def add_tags_many(full_paths, tag_list):
+        """给多个文件添加同一组标签，返回 {full_path: 更新后的元数据}"""
+        tag_list = [t for t in dict.fromkeys(str(t).strip() for t in tag_list or []) if t]
+        if not tag_list: return {}
+
+        def update_logic(old_tags):
+            if not isinstance(old_tags, list): old_tags = []
+            return old_tags + [t for t in tag_list if t not in old_tags]
+
+        updated = LocalStoreService.update_attr_many(full_paths, "tags", update_logic)
+        if updated:
+            PreferenceService.add_recent_tags(tag_list)
+            data_manager.add_tags(tag_list)
+            AssetService.update_tags_many({p: info.get("tags", []) for p, info in updated.items()})
+        return updated
+
+    @staticmethod
+    def remove_tags_many(full_paths, tag_list):
+        """从多个文件移除一组标签，返回 {full_path: 更新后的元数据}"""
+        remove_set = {str(t).strip() for t in tag_list or []}
+        if not remove_set: return {}
+
+        def update_logic(old_tags):
+            if not isinstance(old_tags, list): return []
+            return [t for t in old_tags if t not in remove_set]
+
+        updated = LocalStoreService.update_attr_many(full_paths, "tags", update_logic)
+        if updated:
+            AssetService.update_tags_many({p: info.get("tags", []) for p, info in updated.items()})
+        return updated
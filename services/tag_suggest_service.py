@@ -0,0 +1,158 @@
+# G:\PYthon\AssetManager\services\tag_suggest_service.py
+
+import time
+import heapq
+import itertools
+import bisect
+import threading
+import unicodedata
+import data_manager
+from services.asset_service import AssetService
+from services.preference_service import PreferenceService
+
+# === 补全参数 ===
+SUGGEST_LIMIT = 100         # 默认返回的候选数量
+USAGE_TTL = 60.0            # 秒，使用次数 (asset_tags 聚合) 的缓存时间
+
+def normalize_tag(text):
+    """补全用的规范化形式：NFKC (全角转半角) + casefold + 去首尾空白"""
+    return unicodedata.normalize("NFKC", str(text)).casefold().strip()
+
+def _trigrams(norm):
+    return {norm[i:i + 3] for i in range(len(norm) - 2)}
+
+class TagSuggestService:
+    """
+    标签输入补全。词表在内存中只建一次索引，之后增量追加：
+    - 前缀索引：按规范化名称排序的数组，前缀匹配是 bisect 出的一段连续区间
+    - 子串索引：trigram -> 标签编号列表，只在最短的那条倒排表里逐个核对子串
+      (少于 3 个字的输入没有 trigram，直接扫描预先规范化好的名称)
+    - 排序：完全匹配 > 前缀匹配 > 最近使用 (PreferenceService) > 使用次数 (asset_tags) > 名称
+    """
+    _lock = threading.RLock()
+    _known = set()          # 已建索引的原始名称
+    _source_count = 0       # 上次 sync 时词表的长度
+    _names = []             # 编号 -> 原始名称
+    _norms = []             # 编号 -> 规范化名称
+    _by_norm = {}           # 规范化名称 -> 编号 (完全匹配)
+    _sorted = []            # [(规范化名称, 编号)] 前缀索引
+    _grams = {}             # trigram -> [编号]
+    _usage = {}             # 原始名称 -> 使用次数
+    _usage_loaded_at = 0.0
+    _popular = None         # 按 (使用次数降序, 名称) 排好的编号，空输入时直接取前几项
+
+    @staticmethod
+    def _add(name, keep_sorted=True):
+        """调用方需持有锁。大小写不同的同名标签各自保留，完全匹配指向最早的一个"""
+        cls = TagSuggestService
+        norm = normalize_tag(name)
+        if not norm or name in cls._known: return
+        tag_id = len(cls._names)
+        cls._known.add(name)
+        cls._names.append(name)
+        cls._norms.append(norm)
+        cls._by_norm.setdefault(norm, tag_id)
+        if keep_sorted: bisect.insort(cls._sorted, (norm, tag_id))
+        cls._popular = None
+        for gram in _trigrams(norm):
+            cls._grams.setdefault(gram, []).append(tag_id)
+
+    @staticmethod
+    def _rebuild(names):
+        cls = TagSuggestService
+        cls._known, cls._names, cls._norms, cls._by_norm, cls._grams = set(), [], [], {}, {}
+        for name in names: cls._add(name, keep_sorted=False)
+        # 整体建索引时一次性排序，比逐个 insort 快
+        cls._sorted = sorted((norm, i) for i, norm in enumerate(cls._norms))
+
+    @staticmethod
+    def sync(force_usage=False):
+        """
+        与 data_manager 的标签词表对齐 (弹窗打开时调用)：只追加新标签；
+        词表变少 (有标签被移除) 时整体重建。使用次数按 USAGE_TTL 刷新。
+        """
+        cls = TagSuggestService
+        names = data_manager.get_all_tags()
+        with cls._lock:
+            if not cls._names or len(names) < cls._source_count:
+                cls._rebuild(names)
+            elif len(names) != cls._source_count:
+                for name in names:
+                    if name not in cls._known: cls._add(name)
+            cls._source_count = len(names)
+            if force_usage or time.monotonic() - cls._usage_loaded_at > USAGE_TTL:
+                cls._usage = AssetService.get_tag_usage()
+                cls._usage_loaded_at = time.monotonic()
+                cls._popular = None
+
+    @staticmethod
+    def add_tags(tag_names):
+        """新建标签后立即可被补全 (不必等下一次 sync)"""
+        with TagSuggestService._lock:
+            for name in tag_names:
+                name = str(name).strip()
+                if name: TagSuggestService._add(name)
+
+    @staticmethod
+    def find(text):
+        """规范化后完全相同的已有标签名，没有则返回 None"""
+        with TagSuggestService._lock:
+            tag_id = TagSuggestService._by_norm.get(normalize_tag(text))
+            return TagSuggestService._names[tag_id] if tag_id is not None else None
+
+    @staticmethod
+    def count():
+        return len(TagSuggestService._names)
+
+    @staticmethod
+    def _candidates(query):
+        """调用方需持有锁。返回 (匹配的编号集合, 前缀匹配的编号集合)"""
+        cls = TagSuggestService
+        start = bisect.bisect_left(cls._sorted, (query,))
+        prefix = set()
+        for norm, tag_id in itertools.islice(cls._sorted, start, None):
+            if not norm.startswith(query): break
+            prefix.add(tag_id)
+
+        if len(query) >= 3:
+            postings = [cls._grams.get(g) for g in _trigrams(query)]
+            if not all(postings): return prefix, prefix
+            pool = min(postings, key=len)
+        else:
+            pool = range(len(cls._norms))
+        norms = cls._norms
+        matched = {i for i in pool if i not in prefix and query in norms[i]}
+        matched |= prefix
+        return matched, prefix
+
+    @staticmethod
+    def suggest(text, limit=SUGGEST_LIMIT, exclude=()):
+        """
+        返回按相关度排序的前 limit 个标签名。
+        text 为空时返回除 exclude 外最常用的标签。
+        """
+        cls = TagSuggestService
+        query = normalize_tag(text)
+        recent = {name: i for i, name in enumerate(PreferenceService.get_recent_tags())}
+        exclude = set(exclude)
+        with cls._lock:
+            names, usage = cls._names, cls._usage
+            if query:
+                matched, prefix = cls._candidates(query)
+                exact = cls._by_norm.get(query)
+            else:
+                # 空输入：非最近使用的部分按使用次数排序，只需要预排好的前几项 + 最近使用的标签
+                if cls._popular is None:
+                    cls._popular = sorted(range(len(names)), key=lambda i: (-usage.get(names[i], 0), cls._norms[i]))
+                head = cls._popular[:limit + len(exclude) + len(recent)]
+                recent_ids = [cls._by_norm.get(normalize_tag(name)) for name in recent]
+                matched, prefix, exact = set(head) | {i for i in recent_ids if i is not None}, (), None
+            no_recent = len(recent)
+
+            def rank(tag_id):
+                name = names[tag_id]
+                return (tag_id != exact, tag_id not in prefix, recent.get(name, no_recent),
+                        -usage.get(name, 0), cls._norms[tag_id])
+
+            candidates = (i for i in matched if names[i] not in exclude)
+            return [names[i] for i in heapq.nsmallest(limit, candidates, key=rank)]
@@ -0,0 +1,175 @@
+# G:\PYthon\AssetManager\services\thumbnail_store.py
+
+import os
+import time
+import logging
+import threading
+from config import THUMB_DB_PATH
+from core.db_manager import DBManager
+
+# === 缩略图库参数 ===
+THUMB_TIERS = (128, 256)                 # 尺寸档位 (最长边像素)
+MAX_STORE_BYTES = 512 * 1024 * 1024      # 缩略图库容量上限
+EVICT_TARGET_RATIO = 0.9                 # 超限后淘汰到上限的 90%，避免每次写入都触发淘汰
+ACCESS_GRANULARITY = 3600                # 秒；last_access 超过这个间隔才回写，读多写少
+
+# 缩略图使用独立的库文件：体积大、可随时丢弃，不影响主库的备份与 VACUUM
+thumb_db = DBManager(THUMB_DB_PATH)
+
+class ThumbnailStore:
+    """
+    持久化缩略图库 (SQLite BLOB)。
+    - 以 (规范化路径, 尺寸档位) 为键，记录原图 mtime；mtime 不一致即视为失效
+    - 按 last_access 做 LRU 淘汰，总大小受 MAX_STORE_BYTES 限制
+    - 可在任意线程调用 (DBManager 按线程池化连接)
+    """
+    _lock = threading.Lock()
+    _ready = False
+    _total_bytes = 0
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _ensure():
+        if ThumbnailStore._ready: return
+        with ThumbnailStore._lock:
+            if ThumbnailStore._ready: return
+            with thumb_db.session() as conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS thumbnails (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    tier INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    format TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    last_access INTEGER NOT NULL
+                )''')
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_thumbnails_key ON thumbnails(path, tier)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_access ON thumbnails(last_access)")
+                total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails").fetchone()[0]
+            ThumbnailStore._total_bytes = total
+            ThumbnailStore._ready = True
+
+    @staticmethod
+    def get(path, tier, mtime):
+        """返回 (format, bytes)；没有或已过期返回 None"""
+        ThumbnailStore._ensure()
+        conn = thumb_db.get_connection()
+        row = conn.execute("SELECT id, mtime, format, data, last_access FROM thumbnails WHERE path = ? AND tier = ?",
+                           (ThumbnailStore._key(path), tier)).fetchone()
+        if not row or row["mtime"] != mtime: return None
+
+        now = int(time.time())
+        if now - row["last_access"] > ACCESS_GRANULARITY:
+            try:
+                with thumb_db.session() as wconn:
+                    wconn.execute("UPDATE thumbnails SET last_access = ? WHERE id = ?", (now, row["id"]))
+            except Exception as e:
+                logging.error(f"更新缩略图访问时间失败: {e}")
+        return row["format"], bytes(row["data"])
+
+    @staticmethod
+    def has_all_tiers(path, mtime):
+        """预热时判断是否需要重新生成"""
+        ThumbnailStore._ensure()
+        row = thumb_db.get_connection().execute(
+            "SELECT COUNT(*) FROM thumbnails WHERE path = ? AND mtime = ?",
+            (ThumbnailStore._key(path), mtime)).fetchone()
+        return row[0] >= len(THUMB_TIERS)
+
+    @staticmethod
+    def put_many(path, mtime, encoded):
+        """写入同一原图的多个档位：encoded = {tier: (format, bytes)}"""
+        if not encoded: return
+        ThumbnailStore._ensure()
+        key = ThumbnailStore._key(path)
+        now = int(time.time())
+        with thumb_db.session() as conn:
+            old = conn.execute(f"SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails WHERE path = ? AND tier IN ({','.join('?' * len(encoded))})",
+                               (key, *encoded)).fetchone()[0]
+            conn.executemany('''INSERT INTO thumbnails (path, tier, mtime, format, data, nbytes, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path, tier) DO UPDATE SET
+                    mtime = excluded.mtime, format = excluded.format, data = excluded.data,
+                    nbytes = excluded.nbytes, last_access = excluded.last_access''',
+                [(key, tier, mtime, fmt, data, len(data), now) for tier, (fmt, data) in encoded.items()])
+        with ThumbnailStore._lock:
+            ThumbnailStore._total_bytes += sum(len(data) for _, data in encoded.values()) - old
+            over = ThumbnailStore._total_bytes > MAX_STORE_BYTES
+        if over: ThumbnailStore.evict()
+
+    @staticmethod
+    def evict(max_bytes=MAX_STORE_BYTES):
+        """按 last_access 从旧到新淘汰，直到总大小降到上限的 EVICT_TARGET_RATIO 以下"""
+        ThumbnailStore._ensure()
+        with thumb_db.session() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails").fetchone()[0]
+            excess = total - int(max_bytes * EVICT_TARGET_RATIO)
+            freed = 0
+            if total > max_bytes:
+                while freed < excess:
+                    rows = conn.execute("SELECT id, nbytes FROM thumbnails ORDER BY last_access, id LIMIT 512").fetchall()
+                    if not rows: break
+                    victims = []
+                    for row in rows:
+                        if freed >= excess: break
+                        victims.append((row["id"],))
+                        freed += row["nbytes"]
+                    conn.executemany("DELETE FROM thumbnails WHERE id = ?", victims)
+        with ThumbnailStore._lock:
+            ThumbnailStore._total_bytes = total - freed
+        return freed
+
+    @staticmethod
+    def _source_root(path):
+        """判断原图是否可达的根：盘符 / UNC 共享的根目录；没有盘符时为所在文件夹"""
+        drive, _ = os.path.splitdrive(path)
+        return drive + os.sep if drive else os.path.dirname(path)
+
+    @staticmethod
+    def vacuum(should_stop=None):
+        """
+        整理缩略图库：删除原图已删除或已修改的记录，按容量淘汰，最后 VACUUM 回收文件空间。
+        - 原图所在的盘 / 共享不可达 (拔掉的移动硬盘、离线的网络盘) 时保留其缩略图，重新接入后仍可直接使用；
+          只有根目录可达而文件不存在 (FileNotFoundError) 或 mtime 不一致才算失效
+        - 需要逐个 stat 原图 (离线的网络盘会很慢)，应在工作线程调用；
+          should_stop() 为真时在检查原图阶段放弃，不做任何修改并返回 None
+        返回 {"removed", "evicted_bytes", "total_bytes", "file_bytes"}
+        """
+        ThumbnailStore._ensure()
+        conn = thumb_db.get_connection()
+        stale = []
+        reachable = {}          # 根目录 -> 是否可达 (每个根只探测一次)
+        last_path, deleted, current = None, False, None
+        # 同一原图的各档位相邻，只 stat 一次
+        for row in conn.execute("SELECT id, path, mtime FROM thumbnails ORDER BY path"):
+            if row["path"] != last_path:
+                if should_stop and should_stop(): return None
+                last_path = row["path"]
+                deleted, current = False, None
+                try:
+                    current = os.stat(last_path).st_mtime
+                except FileNotFoundError:
+                    root = ThumbnailStore._source_root(last_path)
+                    if root not in reachable: reachable[root] = os.path.isdir(root)
+                    deleted = reachable[root]
+                except OSError:
+                    pass                # 无权限 / 网络错误：无法判断，保留
+            if deleted or (current is not None and current != row["mtime"]): stale.append((row["id"],))
+        if stale:
+            with thumb_db.session() as wconn:
+                wconn.executemany("DELETE FROM thumbnails WHERE id = ?", stale)
+        evicted = ThumbnailStore.evict()
+        # VACUUM 不能在事务中执行，使用自动提交连接
+        conn.execute("VACUUM")
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails").fetchone()[0]
+        with ThumbnailStore._lock:
+            ThumbnailStore._total_bytes = total
+        try:
+            file_bytes = os.path.getsize(THUMB_DB_PATH)
+        except OSError:
+            file_bytes = 0
+        return {"removed": len(stale), "evicted_bytes": evicted, "total_bytes": total, "file_bytes": file_bytes}
@@ -0,0 +1,7 @@
+# G:\PYthon\AssetManager\tests\conftest.py
+
+import os
+import sys
+
+# 测试直接导入项目根目录下的模块 (core / data / services)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
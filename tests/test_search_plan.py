@@ -0,0 +1,128 @@
+# G:\PYthon\AssetManager\tests\test_search_plan.py
+"""
+结构化搜索的查询计划：每种条件都必须走索引 (EXPLAIN QUERY PLAN 中出现 USING INDEX / USING COVERING INDEX)，
+不允许对 assets / asset_tags / tags 做全表扫描。
+有无统计信息 (sqlite_stat1) 各跑一遍：新库迁移时是空的，退出时的 PRAGMA optimize 之后才可能有。
+"""
+
+import random
+import time
+import pytest
+
+from core.db_manager import db
+from services.asset_service import AssetService
+
+ASSET_COUNT = 5000
+TYPES = ["PNG", "JPG", "PSD", "AI", "TIF", "EXR", "MP4", "MOV", "BLEND", "FBX", "OBJ", "WAV"]
+
+def _seed(conn):
+    """近似真实资源库的分布：大多数资源没有星级 / 颜色 / 标签，少数大文件，修改时间分布在三年内"""
+    rng = random.Random(1)
+    now = time.time()
+    conn.execute("INSERT INTO volumes (id, serial_number, mount_point, is_active, name) VALUES (1, 'S1', 'D:', 1, '素材盘')")
+    conn.execute("INSERT INTO volumes (id, serial_number, mount_point, is_active, name) VALUES (2, 'S2', 'E:', 0, '离线盘')")
+    rows = []
+    for i in range(ASSET_COUNT):
+        size = rng.randint(1000, 200 * 2 ** 20) if i % 25 == 0 else rng.randint(1000, 2 ** 20)
+        rows.append((2 if i % 7 == 0 else 1, f"shot_{i}.png", f"\\proj\\seq{i % 40}\\shot_{i}.png", rng.choice(TYPES), size,
+                     rng.choice([4, 5]) if i % 30 == 0 else 0, "red" if i % 45 == 0 else "",
+                     now - rng.randint(0, 3 * 365) * 86400))
+    conn.executemany('''INSERT INTO assets (volume_id, name, rel_path, type, size, rating, color, mtime)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    conn.executemany("INSERT INTO tags (name) VALUES (?)", [("client-x",), ("client-y",), ("废弃",)])
+    tag_ids = {row["name"]: row["id"] for row in conn.execute("SELECT id, name FROM tags")}
+    links = [(asset_id, tag_ids["client-x"]) for asset_id in range(1, ASSET_COUNT + 1, 40)]
+    links += [(asset_id, tag_ids["client-y"]) for asset_id in range(7, ASSET_COUNT + 1, 55)]
+    links += [(asset_id, tag_ids["废弃"]) for asset_id in range(3, ASSET_COUNT + 1, 90)]
+    conn.executemany("INSERT INTO asset_tags (asset_id, tag_id) VALUES (?, ?)", links)
+
+@pytest.fixture(scope="module", params=[False, True], ids=["no-stats", "analyzed"])
+def library(request, tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("library")
+    with pytest.MonkeyPatch.context() as mp:
+        import data_manager
+        for name in ("FAVORITES_FILE", "TAGS_FILE", "COLOR_LABELS_FILE"):
+            mp.setattr(data_manager, name, str(tmp / f"{name.lower()}.json"))
+        mp.setattr(db, "db_path", str(tmp / "assets.db"))
+        db.close()
+        from data.schema import init_tables
+        init_tables()
+        with db.session() as conn:
+            _seed(conn)
+        if request.param: db.get_connection().execute("ANALYZE")
+        yield db.get_connection()
+        db.close()
+
+def _plan(keyword):
+    return AssetService.explain_search(keyword)
+
+def _assert_indexed(keyword, *indexes):
+    plan = _plan(keyword)
+    text = "\n".join(plan)
+    # volumes 只有几行，扫描它无所谓；其余表不允许 SCAN
+    scans = [d for d in plan if d.startswith("SCAN ") and d != "SCAN v"]
+    assert not scans, f"{keyword!r} 出现全表扫描:\n{text}"
+    for index in indexes:
+        assert any(index in d and ("USING INDEX" in d or "USING COVERING INDEX" in d) for d in plan), \
+            f"{keyword!r} 没有使用 {index}:\n{text}"
+    return plan
+
+@pytest.mark.parametrize("keyword, indexes", [
+    ("tag:client-x", ["idx_asset_tags_tag"]),
+    ("tag:client-*", ["sqlite_autoindex_tags_1", "idx_asset_tags_tag"]),
+    ("type:psd", ["idx_assets_type"]),
+    ("type:psd,ai", ["idx_assets_type"]),
+    ("color:red", ["idx_assets_color"]),
+    ("rating:5", ["idx_assets_rating"]),
+    ("rating>=4", ["idx_assets_rating"]),
+    ("rating>=3 rating<=4", ["idx_assets_rating"]),
+    ("size>10MB", ["idx_assets_size"]),
+    ("size<2KB", ["idx_assets_size"]),
+    ("modified<30d", ["idx_assets_mtime"]),
+    ("modified>1y", ["idx_assets_mtime"]),
+    ("modified:2024-01", ["idx_assets_mtime"]),
+    ("modified>2025-06-01", ["idx_assets_mtime"]),
+])
+def test_field_uses_index(library, keyword, indexes):
+    _assert_indexed(keyword, *indexes)
+
+def test_tag_prefix_is_index_range(library):
+    plan = _assert_indexed("tag:client-*", "sqlite_autoindex_tags_1")
+    assert any("name>? AND name<?" in d for d in plan)
+
+def test_rating_range_is_single_index_range(library):
+    plan = _assert_indexed("rating>=3 rating<=4", "idx_assets_rating")
+    assert any("rating>? AND rating<?" in d for d in plan)
+
+@pytest.mark.parametrize("keyword, indexes", [
+    ("-tag:废弃 rating>=4", ["idx_assets_rating", "idx_asset_tags_tag"]),
+    ("NOT tag:client-x color:red", ["idx_assets_color", "idx_asset_tags_tag"]),
+    ("-type:png size>10MB", ["idx_assets_size"]),
+    ("NOT (rating:5 OR color:red) modified<30d", ["idx_assets_mtime"]),
+])
+def test_not_keeps_positive_terms_indexed(library, keyword, indexes):
+    _assert_indexed(keyword, *indexes)
+
+@pytest.mark.parametrize("keyword, indexes", [
+    ("rating>=4 OR color:red", ["idx_assets_rating", "idx_assets_color"]),
+    ("(type:psd OR type:ai) rating>=4", []),
+    ("size>100MB OR modified<7d", ["idx_assets_size", "idx_assets_mtime"]),
+    ("tag:client-x OR rating:5", ["idx_asset_tags_tag", "idx_assets_rating"]),
+])
+def test_or_uses_index_per_branch(library, keyword, indexes):
+    plan = _assert_indexed(keyword, *indexes)
+    if len(indexes) > 1: assert any("MULTI-INDEX OR" in d for d in plan)
+
+@pytest.mark.parametrize("keyword, where", [
+    ("rating>=4", "a.rating >= 4"),
+    ("color:red type:psd", "a.color = 'red' AND a.type = 'PSD'"),
+    ("size>10MB OR rating:5", "a.size > 10485760 OR a.rating = 5"),
+    ("-tag:client-x rating>=4", '''a.rating >= 4 AND a.id NOT IN
+        (SELECT at.asset_id FROM asset_tags at JOIN tags t ON t.id = at.tag_id WHERE t.name = 'client-x')'''),
+])
+def test_hints_do_not_change_results(library, keyword, where):
+    # 选择性提示只影响规划：结果与不带提示的等价条件一致 (只统计在线卷)
+    count = library.execute(f'''SELECT COUNT(*) FROM assets a
+        WHERE ({where}) AND a.volume_id IN (SELECT id FROM volumes WHERE is_active = 1)''').fetchone()[0]
+    assert count > 0
+    assert len(AssetService.search_assets(keyword, limit=ASSET_COUNT)) == count
@@ -0,0 +1,63 @@
+# G:\PYthon\AssetManager\tests\test_search_query.py
+"""查询语法的解析与取值检查：无效输入只能抛 SearchQueryError (消息直接显示给用户)"""
+
+import datetime
+import pytest
+
+from services import search_query
+from services.search_query import SearchQueryError, compile_query, parse_size, parse_time
+
+@pytest.mark.parametrize("text", [
+    "modified:9999",
+    "modified:9999-12",
+    "modified:9999-12-31",
+    "modified>9999-12-31",
+    "modified<0001-01-01",
+])
+def test_out_of_range_dates_raise_query_error(text):
+    with pytest.raises(SearchQueryError):
+        compile_query(text)
+
+@pytest.mark.parametrize("text", [
+    "rating:99999999999999999999",
+    "rating>6",
+    "rating:-1",
+    "rating>=x",
+])
+def test_rating_must_be_between_0_and_5(text):
+    with pytest.raises(SearchQueryError):
+        compile_query(text)
+
+@pytest.mark.parametrize("text", [
+    "size>99999999999999999999TB",
+    "size>" + "9" * 400,
+    "size>abc",
+])
+def test_size_must_fit_sqlite_integer(text):
+    with pytest.raises(SearchQueryError):
+        compile_query(text)
+
+@pytest.mark.parametrize("text", ["rating:0", "rating>=5", "size>10MB", "modified:2024", "modified<30d"])
+def test_boundary_values_still_compile(text):
+    where, params = compile_query(text)
+    assert where and params
+
+def test_parse_size_units():
+    assert parse_size("10MB") == 10 * 1024 ** 2
+    assert parse_size("1.5k") == 1536
+    assert parse_size(str(search_query.MAX_SQL_INTEGER)) == search_query.MAX_SQL_INTEGER
+
+def test_parse_time_month_interval():
+    start, end, is_age = parse_time("2024-12")
+    assert not is_age
+    assert datetime.datetime.fromtimestamp(start) == datetime.datetime(2024, 12, 1)
+    assert datetime.datetime.fromtimestamp(end) == datetime.datetime(2025, 1, 1)
+
+def test_parse_time_relative_age():
+    start, end, is_age = parse_time("30d", now=1_000_000_000)
+    assert is_age and end == 1_000_000_000 and start == 1_000_000_000 - 30 * 86400
+
+@pytest.mark.parametrize("text", ["(tag:x", "tag>3", "tag:a )", "NOT"])
+def test_syntax_errors_raise_query_error(text):
+    with pytest.raises(SearchQueryError):
+        compile_query(text)
@@ -0,0 +1,70 @@
+# G:\PYthon\AssetManager\tests\test_thumbnail_store.py
+"""整理缩略图库：只清理确实失效的记录，离线的盘 / 共享上的缩略图必须保留"""
+
+import os
+import ntpath
+import pytest
+
+import services.thumbnail_store as thumbnail_store
+from services.thumbnail_store import ThumbnailStore, thumb_db
+
+TIERS = {128: ("PNG", b"s" * 10), 256: ("PNG", b"l" * 20)}
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(thumb_db, "db_path", str(tmp_path / "thumbs.db"))
+    monkeypatch.setattr(ThumbnailStore, "_ready", False)
+    thumb_db.close()
+    yield tmp_path
+    thumb_db.close()
+
+def _source(folder, name):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f: f.write(b"x")
+    return path, os.stat(path).st_mtime
+
+def _stored_paths():
+    rows = thumb_db.get_connection().execute("SELECT DISTINCT path FROM thumbnails").fetchall()
+    return {row["path"] for row in rows}
+
+def _put_raw(path, mtime):
+    """按原样的路径写入 (不经过 _key 的 abspath，用于模拟其他平台的盘符)"""
+    ThumbnailStore._ensure()
+    with thumb_db.session() as conn:
+        for tier, (fmt, data) in TIERS.items():
+            conn.execute('''INSERT INTO thumbnails (path, tier, mtime, format, data, nbytes, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, 0)''', (path, tier, mtime, fmt, data, len(data)))
+
+def test_vacuum_removes_deleted_and_modified_sources(store):
+    kept, kept_mtime = _source(store, "kept.png")
+    deleted, deleted_mtime = _source(store, "deleted.png")
+    modified, modified_mtime = _source(store, "modified.png")
+    for path, mtime in ((kept, kept_mtime), (deleted, deleted_mtime), (modified, modified_mtime)):
+        ThumbnailStore.put_many(path, mtime, TIERS)
+    os.remove(deleted)
+    os.utime(modified, (modified_mtime + 100, modified_mtime + 100))
+
+    result = ThumbnailStore.vacuum()
+    assert result["removed"] == 4
+    assert _stored_paths() == {ThumbnailStore._key(kept)}
+
+def test_vacuum_keeps_thumbnails_of_unreachable_folder(store):
+    offline = os.path.join(store, "unplugged", "proj")
+    _put_raw(os.path.join(offline, "a.png"), 1.0)
+    assert ThumbnailStore.vacuum()["removed"] == 0
+    assert len(_stored_paths()) == 1
+
+def test_vacuum_keeps_thumbnails_of_offline_drive(store, monkeypatch):
+    # Windows 盘符：Q:\ 不存在 (移动硬盘已拔出)，其上的缩略图全部保留
+    monkeypatch.setattr(thumbnail_store.os.path, "splitdrive", ntpath.splitdrive)
+    _put_raw("q:\\proj\\a.png", 1.0)
+    _put_raw("q:\\proj\\b.png", 2.0)
+    assert ThumbnailStore.vacuum()["removed"] == 0
+    assert _stored_paths() == {"q:\\proj\\a.png", "q:\\proj\\b.png"}
+
+def test_vacuum_can_be_interrupted_without_changes(store):
+    path, mtime = _source(store, "gone.png")
+    ThumbnailStore.put_many(path, mtime, TIERS)
+    os.remove(path)
+    assert ThumbnailStore.vacuum(should_stop=lambda: True) is None
+    assert _stored_paths() == {ThumbnailStore._key(path)}
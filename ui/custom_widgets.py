@@ -179,6 +179,9 @@ class NavBar(QFrame):
         self.search_bar = QLineEdit()
         self.search_bar.setObjectName("AddressBar") 
         self.search_bar.setPlaceholderText("搜索...")
+        self.search_bar.setToolTip("关键字或条件组合，例如:\n"
+                                   "tag:客户A rating>=4 type:png,jpg color:red size>10MB modified<30d\n"
+                                   "支持 AND / OR / NOT (或 -前缀) 与括号")
         self.search_bar.returnPressed.connect(lambda: self.sig_search_entered.emit(self.search_bar.text()))
         layout.addWidget(self.search_bar, 1)
 
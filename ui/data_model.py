@@ -1,27 +1,227 @@
 # G:\PYthon\AssetManager\ui\data_model.py
 
 import os
-from PyQt6.QtGui import QStandardItemModel, QStandardItem, QIcon, QPixmap
+from array import array
 from PyQt6.QtWidgets import QFileIconProvider
-from PyQt6.QtCore import Qt, QFileInfo, QSize, QMimeData, QUrl
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QFileInfo, QMimeData, QUrl
+from ui.thumbnail_loader import ThumbnailLoader
 
-class AssetModel(QStandardItemModel):
+# 每行的标志位
+FLAG_FOLDER = 1
+FLAG_PINNED = 2
+FLAG_IMAGE = 4
+
+# 已拆成独立列存储的元数据字段，其余字段放进稀疏的 extras
+_COLUMN_KEYS = {"type", "ext", "size", "mtime", "ctime", "atime", "rating", "color",
+                "tags", "pinned", "view_count", "file_count", "full_path_override"}
+
+# 与行一一对应的列 (删除行时一起删)
+_ROW_COLUMNS = ("_keys", "_names", "_sizes", "_mtimes", "_ctimes", "_atimes", "_ratings", "_view_counts",
+                "_file_counts", "_flags", "_versions", "_type_ids", "_ext_ids", "_color_ids", "_tag_ids")
+
+def _shift_rows(mapping, start, end, count):
+    """以行号为键的字典：丢弃 [start, end) 的项，其后的行号前移 count"""
+    return {(row - count if row >= end else row): value for row, value in mapping.items() if not start <= row < end}
+
+class _StringPool:
+    """字符串驻留：列里只存整数 id，相同的类型 / 颜色 / 标签名只保存一份"""
+    __slots__ = ("values", "ids")
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.values.append(value)
+            self.ids[value] = idx
+        return idx
+
+class AssetModel(QAbstractListModel):
+    """
+    列式存储的虚拟化资源模型。
+    - 每个字段一列 (array / list)，不再为每个文件创建 QStandardItem 和元数据字典
+    - data() 被调用时才按需拼出该行的元数据字典 (ROLE_META_DATA)
+    - canFetchMore / fetchMore 分批向视图暴露行，大目录首屏不必等全部行插入
+    """
     ROLE_FULL_PATH = Qt.ItemDataRole.UserRole + 1
     ROLE_META_DATA = Qt.ItemDataRole.UserRole + 2
-    
+    # (完整路径, 元数据版本)：委托据此判断缓存的渲染结果是否仍然有效
+    ROLE_RENDER_KEY = Qt.ItemDataRole.UserRole + 3
+
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+    # 这些类型的图标因文件而异，按路径缓存；其余按扩展名共用一个图标
+    PER_FILE_ICON_EXTS = {'.exe', '.lnk', '.ico', '.url'}
+    FETCH_BATCH = 2000
 
     def __init__(self):
         super().__init__()
-        self.icon_provider = QFileIconProvider() 
+        self.icon_provider = QFileIconProvider()
+        self.folder_icon = self.icon_provider.icon(QFileIconProvider.IconType.Folder)
+        # 图片缩略图异步加载：只有绘制到某一行时才请求缩略图
+        self.thumb_loader = ThumbnailLoader(parent=self)
+        self.thumb_loader.sig_ready.connect(self._on_thumbnail_ready)
+        self._ext_icons = {}        # 扩展名 -> 图标
+        self._file_icons = {}       # 路径 -> 图标 (PER_FILE_ICON_EXTS)
+        self._version_seq = 0       # 元数据版本号全局递增，重新装载后也不会与旧版本重复
+        self._reset_columns()
+
+    def _reset_columns(self):
+        # 代号：每次重置 +1；change_log：之后被 setData 修改过的行号 (按时间追加)。
+        # 代理模型据此判断自己的排序键 / 筛选掩码是否需要整体重建或只刷新个别行
+        self.generation = getattr(self, "generation", 0) + 1
+        self.change_log = []
+        self.folder_path = ""
+        self._keys = []                 # meta 中的键 (文件名 / 相对路径 / 搜索结果的完整路径)
+        self._names = []                # 显示名
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._ctimes = array('d')
+        self._atimes = array('d')
+        self._ratings = array('b')
+        self._view_counts = array('l')
+        self._file_counts = array('l')
+        self._flags = array('B')
+        self._versions = array('Q')     # 每行的元数据版本，装载 / setData 时取新号
+        self._type_ids = array('l')
+        self._ext_ids = array('l')
+        self._color_ids = array('l')
+        self._tag_ids = []              # 每行一个 tuple (驻留的标签 id)
+        self._types = _StringPool()
+        self._exts = _StringPool()
+        self._colors = _StringPool()
+        self._tags = _StringPool()
+        self._tag_sets = {}             # 相同的标签组合共用同一个 tuple
+        self._overrides = {}            # row -> 无法由 folder_path + key 推出的完整路径
+        self._extras = {}               # row -> 其他字段
+        self._image_rows = {}           # full_path -> row (需要缩略图的行)
+        self._loaded = 0                # 已暴露给视图的行数
+
+    # === 基本接口 ===
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def total_count(self):
+        return len(self._keys)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._keys)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid(): return
+        end = min(len(self._keys), self._loaded + self.FETCH_BATCH)
+        if end <= self._loaded: return
+        self.beginInsertRows(QModelIndex(), self._loaded, end - 1)
+        self._loaded = end
+        self.endInsertRows()
+
+    def flags(self, index):
+        if not index.isValid(): return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled
+
+    def full_path(self, row):
+        path = self._overrides.get(row)
+        return path if path is not None else os.path.join(self.folder_path, self._keys[row])
+
+    def row_meta(self, row):
+        """按列拼出该行的元数据字典 (每次返回新字典，调用方可随意修改)"""
+        flags = self._flags[row]
+        meta = {
+            "type": self._types.values[self._type_ids[row]],
+            "size": self._sizes[row],
+            "mtime": self._mtimes[row],
+            "ctime": self._ctimes[row],
+            "atime": self._atimes[row],
+            "rating": self._ratings[row],
+            "color": self._colors.values[self._color_ids[row]],
+            "tags": [self._tags.values[t] for t in self._tag_ids[row]],
+            "pinned": bool(flags & FLAG_PINNED),
+            "view_count": self._view_counts[row],
+        }
+        if flags & FLAG_FOLDER: meta["file_count"] = self._file_counts[row]
+        else: meta["ext"] = self._exts.values[self._ext_ids[row]]
+        override = self._overrides.get(row)
+        if override is not None: meta["full_path_override"] = override
+        extras = self._extras.get(row)
+        if extras: meta.update(extras)
+        return meta
+
+    # === 供代理模型建索引的列访问 (不拼元数据字典) ===
+    def facet_row(self, row):
+        """(类型 id, 星级, 颜色 id, 标签 id 元组)，id 对应 pool_values() 中的取值"""
+        return self._type_ids[row], self._ratings[row], self._color_ids[row], self._tag_ids[row]
+
+    def pool_values(self, facet):
+        """facet: "type" / "color" / "tag"，返回按 id 排列的取值列表 (只增不减)"""
+        return {"type": self._types, "color": self._colors, "tag": self._tags}[facet].values
+
+    def sort_group(self, row):
+        """置顶文件夹 0 < 置顶文件 1 < 文件夹 2 < 文件 3"""
+        flags = self._flags[row]
+        return (0 if flags & FLAG_PINNED else 2) + (0 if flags & FLAG_FOLDER else 1)
+
+    def sort_value(self, row, key):
+        if key == "name": return self._names[row].lower()
+        if key == "size": return self._sizes[row]
+        if key == "date": return self._mtimes[row]
+        if key == "rating": return self._ratings[row]
+        return 0
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        row = index.row()
+        if row >= self._loaded: return None
+
+        if role == Qt.ItemDataRole.DisplayRole: return self._names[row]
+        if role == self.ROLE_FULL_PATH: return self.full_path(row)
+        if role == self.ROLE_META_DATA: return self.row_meta(row)
+        if role == self.ROLE_RENDER_KEY: return (self.full_path(row), self._versions[row])
+        if role == Qt.ItemDataRole.DecorationRole: return self._icon(row)
+        if role == Qt.ItemDataRole.ToolTipRole: return self._names[row]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != self.ROLE_META_DATA or not isinstance(value, dict): return False
+        self._write_row(index.row(), value)
+        self.dataChanged.emit(index, index, [self.ROLE_META_DATA])
+        return True
+
+    # === 图标 / 缩略图 ===
+    def _icon(self, row):
+        flags = self._flags[row]
+        if flags & FLAG_FOLDER: return self.folder_icon
+        path = self.full_path(row)
+        if flags & FLAG_IMAGE:
+            icon = self.thumb_loader.get(path, self._mtimes[row])
+            if icon is not None: return icon
 
+        ext = self._exts.values[self._ext_ids[row]]
+        if ext in self.PER_FILE_ICON_EXTS:
+            icon = self._file_icons.get(path)
+            if icon is None:
+                icon = self.icon_provider.icon(QFileInfo(path))
+                self._file_icons[path] = icon
+            return icon
+        # 图片在缩略图就绪前也使用这个按扩展名共享的占位图标
+        icon = self._ext_icons.get(ext)
+        if icon is None:
+            icon = self.icon_provider.icon(QFileInfo(path))
+            self._ext_icons[ext] = icon
+        return icon
+
+    def _on_thumbnail_ready(self, path):
+        row = self._image_rows.get(path)
+        if row is None or row >= self._loaded: return
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    # === 拖拽 ===
     def mimeTypes(self):
-        types = super().mimeTypes()
-        types.append('text/uri-list')
-        return types
+        return ['text/uri-list']
 
     def mimeData(self, indexes):
-        mime_data = super().mimeData(indexes)
+        mime_data = QMimeData()
         urls = []
         processed_paths = set()
         for index in indexes:
@@ -33,84 +233,198 @@ class AssetModel(QStandardItemModel):
         if urls: mime_data.setUrls(urls)
         return mime_data
 
+    # === 写入列 ===
+    def _intern_tags(self, tags):
+        if not isinstance(tags, (list, tuple)) or not tags: return ()
+        ids = tuple(self._tags.intern(str(t)) for t in tags)
+        return self._tag_sets.setdefault(ids, ids)
+
+    def _append_row(self, key, info, is_folder):
+        row = len(self._keys)
+        display_name = os.path.basename(key) if os.path.isabs(key) else key
+        self._keys.append(key)
+        self._names.append(display_name)
+
+        default_path = os.path.join(self.folder_path, key)
+        override = info.get("full_path_override")
+        if override and override != default_path: self._overrides[row] = override
+        full_path = override or default_path
+
+        ext = info.get("ext")
+        if ext is None and not is_folder: ext = os.path.splitext(full_path)[1].lower()
+        ext = ext or ""
+        ftype = "FOLDER" if is_folder else (info.get("type") or (ext.replace(".", "").upper() if ext else "FILE"))
+
+        flags = FLAG_FOLDER if is_folder else 0
+        if info.get("pinned", False): flags |= FLAG_PINNED
+        if not is_folder and ext in self.IMAGE_EXTENSIONS:
+            flags |= FLAG_IMAGE
+            self._image_rows[full_path] = row
+
+        self._sizes.append(int(info.get("size", 0) or 0))
+        self._mtimes.append(float(info.get("mtime", 0) or 0))
+        self._ctimes.append(float(info.get("ctime", 0) or 0))
+        self._atimes.append(float(info.get("atime", 0) or 0))
+        self._ratings.append(int(info.get("rating", 0) or 0))
+        self._view_counts.append(int(info.get("view_count", 0) or 0))
+        self._file_counts.append(int(info.get("file_count", 0) or 0))
+        self._flags.append(flags)
+        self._version_seq += 1
+        self._versions.append(self._version_seq)
+        self._type_ids.append(self._types.intern(ftype))
+        self._ext_ids.append(self._exts.intern(ext))
+        self._color_ids.append(self._colors.intern(info.get("color") or ""))
+        self._tag_ids.append(self._intern_tags(info.get("tags")))
+
+        extras = {k: v for k, v in info.items() if k not in _COLUMN_KEYS}
+        if extras: self._extras[row] = extras
+
+    def _write_row(self, row, info):
+        """setData：把服务层返回的新元数据写回各列"""
+        self.change_log.append(row)
+        self._version_seq += 1
+        self._versions[row] = self._version_seq
+        if "rating" in info: self._ratings[row] = int(info.get("rating") or 0)
+        if "color" in info: self._color_ids[row] = self._colors.intern(info.get("color") or "")
+        if "tags" in info: self._tag_ids[row] = self._intern_tags(info.get("tags"))
+        if "pinned" in info:
+            if info.get("pinned"): self._flags[row] |= FLAG_PINNED
+            else: self._flags[row] &= ~FLAG_PINNED & 0xFF
+        if "view_count" in info: self._view_counts[row] = int(info.get("view_count") or 0)
+        if "file_count" in info: self._file_counts[row] = int(info.get("file_count") or 0)
+        if "size" in info: self._sizes[row] = int(info.get("size") or 0)
+        for key, column in (("mtime", self._mtimes), ("ctime", self._ctimes), ("atime", self._atimes)):
+            if key in info: column[row] = float(info.get(key) or 0)
+        extras = {k: v for k, v in info.items() if k not in _COLUMN_KEYS}
+        if extras: self._extras.setdefault(row, {}).update(extras)
+
+    # === 装载 ===
+    def clear(self):
+        self.beginResetModel()
+        self.thumb_loader.cancel_pending()
+        self._file_icons.clear()
+        self._reset_columns()
+        self.endResetModel()
+
     def load_data(self, folder_path, meta_data):
-        self.clear() 
-        if not meta_data: return
+        self.beginResetModel()
+        self.thumb_loader.cancel_pending()
+        self._reset_columns()
+        self.folder_path = folder_path
+        if meta_data:
+            sub_folders = meta_data.get("sub_folders", {})
+            files_info = meta_data.get("files", {})
+            if isinstance(sub_folders, list): sub_folders = {name: {} for name in sub_folders}
+            if not isinstance(files_info, dict): files_info = {}
 
+            # === 【核心排序逻辑】置顶文件夹 -> 置顶文件 -> 普通文件夹 -> 普通文件，桶内按名称排序 ===
+            entries = [(0 if info.get("pinned", False) else 2, name, info, True) for name, info in sub_folders.items()]
+            entries += [(1 if info.get("pinned", False) else 3, name, info, False) for name, info in files_info.items()]
+            entries.sort(key=lambda e: (e[0], os.path.basename(e[1]) if os.path.isabs(e[1]) else e[1]))
+            for _, name, info, is_folder in entries:
+                self._append_row(name, info if isinstance(info, dict) else {}, is_folder)
+
+            # 首批行直接暴露，其余由视图滚动到底部时通过 fetchMore 追加
+            self._loaded = min(len(self._keys), self.FETCH_BATCH)
+        self.endResetModel()
+
+        # 后台预热缩略图库：下次打开这个文件夹时不再需要解码原图
+        if self._image_rows: self.thumb_loader.prewarm(list(self._image_rows))
+
+    def append_data(self, meta_data):
+        """
+        流式追加 (递归扫描的分批结果)：新行接在末尾，排序交给代理模型。
+        视图还没拿满首批时直接暴露新行，让首屏尽快出现；之后仍由 fetchMore 分批暴露。
+        """
+        if not meta_data: return
+        old_total = len(self._keys)
         sub_folders = meta_data.get("sub_folders", {})
+        if isinstance(sub_folders, dict):
+            for name, info in sub_folders.items(): self._append_row(name, info if isinstance(info, dict) else {}, True)
         files_info = meta_data.get("files", {})
+        if isinstance(files_info, dict):
+            for name, info in files_info.items(): self._append_row(name, info if isinstance(info, dict) else {}, False)
+
+        if self._loaded == old_total and self._loaded < self.FETCH_BATCH:
+            end = min(len(self._keys), self.FETCH_BATCH)
+            if end > self._loaded:
+                self.beginInsertRows(QModelIndex(), self._loaded, end - 1)
+                self._loaded = end
+                self.endInsertRows()
+
+    def update_data(self, meta_data):
+        """
+        增量刷新 (目录监视触发)：把新扫描结果与当前各行按键比较，
+        只插入新增行、删除消失的行、对内容变化的行发 dataChanged，不重置模型，
+        视图的选区 / 滚动位置保持不变，也只有变化过的图片会重新解码缩略图。
+        """
+        sub_folders = meta_data.get("sub_folders", {}) if meta_data else {}
+        files_info = meta_data.get("files", {}) if meta_data else {}
+        if isinstance(sub_folders, list): sub_folders = {name: {} for name in sub_folders}
+        if not isinstance(files_info, dict): files_info = {}
+        incoming = {name: (info if isinstance(info, dict) else {}, True) for name, info in sub_folders.items()}
+        incoming.update((name, (info if isinstance(info, dict) else {}, False)) for name, info in files_info.items())
+
+        removed, changed = [], []
+        for row, key in enumerate(self._keys):
+            entry = incoming.pop(key, None)
+            if entry is None or bool(self._flags[row] & FLAG_FOLDER) != entry[1]:
+                removed.append(row)
+                if entry is not None: incoming[key] = entry     # 文件 / 文件夹互换：删掉旧行再按新类型追加
+            elif self._row_signature(row) != self._info_signature(entry[0], entry[1]):
+                changed.append((row, entry[0]))
+
+        for row, info in changed:
+            path = self.full_path(row)
+            if self._flags[row] & FLAG_IMAGE: self.thumb_loader.forget(path)
+            self._file_icons.pop(path, None)
+            self._write_row(row, info)
+            if row < self._loaded:
+                index = self.index(row, 0)
+                self.dataChanged.emit(index, index, [self.ROLE_META_DATA, Qt.ItemDataRole.DecorationRole])
+
+        if removed: self._remove_rows(removed)
+
+        if incoming:
+            old_total = len(self._keys)
+            for key, (info, is_folder) in incoming.items(): self._append_row(key, info, is_folder)
+            # 之前所有行都已暴露时直接暴露新行，否则留给 fetchMore
+            if self._loaded == old_total:
+                self.beginInsertRows(QModelIndex(), old_total, len(self._keys) - 1)
+                self._loaded = len(self._keys)
+                self.endInsertRows()
+        return len(incoming), len(removed), len(changed)
+
+    def _row_signature(self, row):
+        flags = self._flags[row]
+        return (self._sizes[row], self._mtimes[row], self._ratings[row],
+                self._colors.values[self._color_ids[row]], tuple(self._tags.values[t] for t in self._tag_ids[row]),
+                bool(flags & FLAG_PINNED), self._file_counts[row])
+
+    @staticmethod
+    def _info_signature(info, is_folder):
+        tags = info.get("tags")
+        return (int(info.get("size", 0) or 0), float(info.get("mtime", 0) or 0), int(info.get("rating", 0) or 0),
+                info.get("color") or "", tuple(str(t) for t in tags) if isinstance(tags, (list, tuple)) else (),
+                bool(info.get("pinned", False)), int(info.get("file_count", 0) or 0))
 
-        if isinstance(sub_folders, list):
-            temp = {}
-            for name in sub_folders: temp[name] = {}
-            sub_folders = temp
-
-        # === 【核心排序逻辑】定义 4 个桶 ===
-        pinned_folders = []
-        pinned_files = []
-        normal_folders = []
-        normal_files = []
-
-        def process_item(name, info, is_folder):
-            display_name = os.path.basename(name) if os.path.isabs(name) else name
-            item = QStandardItem(display_name)
-            
-            if "full_path_override" in info: full_path = info["full_path_override"]
-            else: full_path = os.path.join(folder_path, name)
-            
-            item.setData(full_path, self.ROLE_FULL_PATH)
-            
-            # 补全元数据
-            meta = info.copy()
-            if is_folder:
-                meta.update({
-                    "type": "FOLDER",
-                    "pinned": info.get("pinned", False),
-                    "file_count": info.get("file_count", 0), 
-                    "rating": info.get("rating", 0), 
-                    "color": info.get("color", ""),   
-                    "tags": info.get("tags", []),
-                    "ctime": info.get("ctime", 0),
-                    "mtime": info.get("mtime", 0)
-                })
-                item.setIcon(self.icon_provider.icon(QFileIconProvider.IconType.Folder))
-            else:
-                _, ext = os.path.splitext(full_path)
-                ext = ext.lower()
-                if "type" not in meta: meta["type"] = ext.replace(".", "").upper() if ext else "FILE"
-                if "ext" not in meta: meta["ext"] = ext
-                
-                if ext in self.IMAGE_EXTENSIONS and os.path.exists(full_path):
-                    pixmap = QPixmap(full_path)
-                    if not pixmap.isNull():
-                        scaled = pixmap.scaled(QSize(256, 256), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                        item.setIcon(QIcon(scaled))
-                    else: item.setIcon(self.icon_provider.icon(QFileInfo(full_path)))
-                else: item.setIcon(self.icon_provider.icon(QFileInfo(full_path)))
-
-            item.setData(meta, self.ROLE_META_DATA)
-            
-            # 分桶
-            is_pinned = meta.get("pinned", False)
-            if is_pinned:
-                if is_folder: pinned_folders.append(item)
-                else: pinned_files.append(item)
-            else:
-                if is_folder: normal_folders.append(item)
-                else: normal_files.append(item)
-
-        # 遍历数据
-        for dname, dinfo in sub_folders.items(): process_item(dname, dinfo, True)
-        for fname, finfo in files_info.items(): process_item(fname, finfo, False)
-
-        # === 【核心排序】依次添加：置顶文件夹 -> 置顶文件 -> 普通文件夹 -> 普通文件 ===
-        # 桶内按名称简单排序
-        pinned_folders.sort(key=lambda x: x.text())
-        pinned_files.sort(key=lambda x: x.text())
-        normal_folders.sort(key=lambda x: x.text())
-        normal_files.sort(key=lambda x: x.text())
-
-        for item in pinned_folders: self.appendRow(item)
-        for item in pinned_files: self.appendRow(item)
-        for item in normal_folders: self.appendRow(item)
-        for item in normal_files: self.appendRow(item)
\ No newline at end of file
+    def _remove_rows(self, rows):
+        """按连续区间从后往前删除行 (rows 升序)，每个区间内同步调整各列和按行号索引的字典"""
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row: ranges[-1][1] = row + 1
+            else: ranges.append([row, row + 1])
+        for start, end in reversed(ranges):
+            exposed = start < self._loaded
+            if exposed: self.beginRemoveRows(QModelIndex(), start, min(end, self._loaded) - 1)
+            for name in _ROW_COLUMNS: del getattr(self, name)[start:end]
+            count = end - start
+            self._overrides = _shift_rows(self._overrides, start, end, count)
+            self._extras = _shift_rows(self._extras, start, end, count)
+            self._image_rows = {path: (row - count if row >= end else row)
+                                for path, row in self._image_rows.items() if not start <= row < end}
+            if exposed: self._loaded -= min(end, self._loaded) - start
+            # 行号整体变化：代理模型按新的 generation 惰性重建排序键 / 筛选掩码
+            self.generation += 1
+            self.change_log = []
+            if exposed: self.endRemoveRows()
@@ -1,112 +1,179 @@
-﻿# G:\PYthon\AssetManager\ui\filter_proxy.py
+# G:\PYthon\AssetManager\ui\filter_proxy.py
 
+from array import array
 from PyQt6.QtCore import QSortFilterProxyModel, Qt
-from ui.data_model import AssetModel
+
+# 四个筛选维度在 AssetModel.facet_row() 元组中的位置
+FACET_TYPE, FACET_RATING, FACET_COLOR, FACET_TAG = range(4)
 
 class AssetFilterProxyModel(QSortFilterProxyModel):
+    """
+    筛选 / 排序都基于预先算好的索引，不在每次比较时拼元数据字典：
+    - 倒排表：每个维度的取值 -> 行号数组，模型装载 / 追加行时建立
+    - 筛选：勾选条件变化时把各维度命中行合成掩码 (每行一个字节，存成大整数后按位与)，
+      filterAcceptsRow 只查一个字节
+    - 排序：每行一个 (分组, 排序值) 键，lessThan 只比较两个键
+    索引随模型的 generation / change_log 惰性同步：模型重置时整体重建，setData 修改的行单独刷新，
+    Qt 对 dataChanged 的增量处理因此不需要 invalidateFilter()。
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.checked_tags = set()
         self.checked_ratings = set()
         self.checked_types = set()
         self.checked_colors = set()
-        self.sort_mode = "name_asc" 
+        self.sort_mode = "name_asc"
+        self._sort_key = "name"
+        self._reverse = False
+        self._reset_index()
+
+    def _reset_index(self, generation=None):
+        self._generation = generation
+        self._indexed = 0               # 已建立索引的行数
+        self._log_pos = 0               # 已处理到的 change_log 位置
+        self._groups = array('b')
+        self._values = []               # 当前排序模式下每行的排序值
+        self._postings = [{}, {}, {}, {}]   # 维度 -> {取值 id: array(行号)}
+        self._postings_stale = False    # 有行被修改过，倒排表要在下次筛选变化时重建
+        self._accept = None             # 无筛选条件时为 None
+        self._wanted = None             # 勾选条件换算成的各维度 id 集合
+
+    # === 索引同步 ===
+    def _sync_index(self):
+        model = self.sourceModel()
+        if model is None: return
+        if model.generation != self._generation:
+            self._reset_index(model.generation)
+        total = model.total_count()
+        log = model.change_log
+        if total == self._indexed and len(log) == self._log_pos: return
+        if self._wanted is not None or self._accept is not None or self._has_filter():
+            # 新行可能带来新的驻留 id (新标签 / 类型)，勾选条件要重新换算
+            self._wanted = self._wanted_ids()
+            if self._accept is None: self._accept = bytearray(self._indexed)
+        if total > self._indexed: self._index_rows(model, self._indexed, total)
+        if len(log) > self._log_pos:
+            for row in set(log[self._log_pos:]):
+                if row < self._indexed: self._refresh_row(model, row)
+            self._log_pos = len(log)
+            self._postings_stale = True
+
+    def _index_rows(self, model, start, end):
+        postings = self._postings
+        key = self._sort_key
+        for row in range(start, end):
+            facets = model.facet_row(row)
+            for facet in (FACET_TYPE, FACET_RATING, FACET_COLOR):
+                postings[facet].setdefault(facets[facet], array('l')).append(row)
+            for tag_id in facets[FACET_TAG]:
+                postings[FACET_TAG].setdefault(tag_id, array('l')).append(row)
+            self._groups.append(model.sort_group(row))
+            self._values.append(model.sort_value(row, key))
+        if self._accept is not None:
+            self._accept.extend(self._row_accepted(model.facet_row(row)) for row in range(start, end))
+        self._indexed = end
+
+    def _refresh_row(self, model, row):
+        self._groups[row] = model.sort_group(row)
+        self._values[row] = model.sort_value(row, self._sort_key)
+        if self._accept is not None:
+            self._accept[row] = self._row_accepted(model.facet_row(row))
+
+    def _rebuild_postings(self, model):
+        postings = self._postings = [{}, {}, {}, {}]
+        for row in range(self._indexed):
+            facets = model.facet_row(row)
+            for facet in (FACET_TYPE, FACET_RATING, FACET_COLOR):
+                postings[facet].setdefault(facets[facet], array('l')).append(row)
+            for tag_id in facets[FACET_TAG]:
+                postings[FACET_TAG].setdefault(tag_id, array('l')).append(row)
+        self._postings_stale = False
+
+    # === 筛选 ===
+    def _has_filter(self):
+        return bool(self.checked_types or self.checked_ratings or self.checked_colors or self.checked_tags)
+
+    def _wanted_ids(self):
+        """勾选的取值 -> 各维度的 id 集合 (None 表示该维度不限制)"""
+        model = self.sourceModel()
+        if model is None: return None
+        if not self._has_filter(): return None
+        wanted = [None, None, None, None]
+        if self.checked_types:
+            wanted[FACET_TYPE] = {i for i, v in enumerate(model.pool_values("type")) if str(v).upper() in self.checked_types}
+        if self.checked_ratings:
+            wanted[FACET_RATING] = {int(r) for r in self.checked_ratings}
+        if self.checked_colors:
+            wanted[FACET_COLOR] = {i for i, v in enumerate(model.pool_values("color")) if (str(v).lower() or "none") in self.checked_colors}
+        if self.checked_tags:
+            wanted[FACET_TAG] = {i for i, v in enumerate(model.pool_values("tag")) if v in self.checked_tags}
+        return wanted
+
+    def _row_accepted(self, facets):
+        """单行判断 (新追加 / 被修改的行)；各维度之间 AND，维度内 OR"""
+        for facet, ids in enumerate(self._wanted):
+            if ids is None: continue
+            if facet == FACET_TAG:
+                if ids.isdisjoint(facets[FACET_TAG]): return 0
+            elif facets[facet] not in ids: return 0
+        return 1
+
+    def _build_accept(self):
+        model = self.sourceModel()
+        self._wanted = self._wanted_ids()
+        if self._wanted is None:
+            self._accept = None
+            return
+        if self._postings_stale: self._rebuild_postings(model)
+        n = self._indexed
+        combined = None
+        for facet, ids in enumerate(self._wanted):
+            if ids is None: continue
+            hits = bytearray(n)
+            postings = self._postings[facet]
+            for value_id in ids:
+                for row in postings.get(value_id, ()): hits[row] = 1
+            mask = int.from_bytes(hits, "little")
+            combined = mask if combined is None else combined & mask
+        self._accept = bytearray(combined.to_bytes(n, "little")) if n else bytearray()
 
     def set_filter_conditions(self, tags, ratings, types, colors):
         self.checked_tags = set(tags)
         self.checked_ratings = set(ratings)
         self.checked_types = set(types)
         self.checked_colors = set(colors)
+        self._sync_index()
+        self._build_accept()
         self.invalidateFilter()
 
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._accept is None and not self._wanted:
+            # 没有筛选条件时不必同步索引
+            return True
+        self._sync_index()
+        if self._accept is None: return True
+        return source_row >= len(self._accept) or bool(self._accept[source_row])
+
+    # === 排序 ===
     def set_sort_mode(self, mode):
         self.sort_mode = mode
+        self._reverse = mode.endswith("_desc")
+        self._sort_key = mode.replace("_asc", "").replace("_desc", "")
+        model = self.sourceModel()
+        self._sync_index()
+        if model is not None:
+            self._values = [model.sort_value(row, self._sort_key) for row in range(self._indexed)]
         self.invalidate()
         # 强制视图保持升序，具体的顺序逻辑我们在 lessThan 里控制
         self.sort(0, Qt.SortOrder.AscendingOrder)
 
-    def filterAcceptsRow(self, source_row, source_parent):
-        model = self.sourceModel()
-        if not model: return True
-        index = model.index(source_row, 0, source_parent)
-        meta = model.data(index, AssetModel.ROLE_META_DATA)
-        if not meta: return True
-
-        if self.checked_types:
-            raw_type = str(meta.get("type", "FILE")).upper()
-            if "sub_folders" in meta or meta.get("type") == "FOLDER": raw_type = "FOLDER"
-            if raw_type not in self.checked_types: return False
-
-        if self.checked_ratings:
-            rating = int(meta.get("rating", 0))
-            if rating not in self.checked_ratings: return False
-
-        if self.checked_colors:
-            color = str(meta.get("color", "")).lower() or "none"
-            if color not in self.checked_colors: return False
-
-        if self.checked_tags:
-            file_tags = meta.get("tags", [])
-            if not (set(file_tags) & self.checked_tags): return False
-
-        return True
-
     def lessThan(self, left, right):
-        """
-        自定义排序逻辑
-        """
-        model = self.sourceModel()
-        l_meta = model.data(left, AssetModel.ROLE_META_DATA)
-        r_meta = model.data(right, AssetModel.ROLE_META_DATA)
-        
-        if not l_meta or not r_meta:
+        """置顶优先、文件夹优先 (分组始终升序)，组内按 sort_mode 的预计算排序值比较"""
+        self._sync_index()
+        l_row, r_row = left.row(), right.row()
+        if l_row >= self._indexed or r_row >= self._indexed:
             return super().lessThan(left, right)
-
-        # === 优先级 1：置顶 (Pinned) ===
-        # 核心修复：我们要让置顶项(True) 排在 非置顶项(False) 前面。
-        # 在升序中，小在前。所以我们要让 置顶 < 非置顶。
-        # 也就是 True 应该被视为 "0"，False 视为 "1"。
-        # 所以我们比较 (not pinned)。
-        l_pinned = bool(l_meta.get("pinned", False))
-        r_pinned = bool(r_meta.get("pinned", False))
-
-        if l_pinned != r_pinned:
-            # 如果左边置顶(True)，not l_pinned = False(0)
-            # 右边没置顶(False)，not r_pinned = True(1)
-            # 0 < 1，返回 True。左边排前面。完美。
-            return (not l_pinned) < (not r_pinned)
-
-        # === 优先级 2：文件夹永远在文件前面 ===
-        l_is_dir = (l_meta.get("type") == "FOLDER")
-        r_is_dir = (r_meta.get("type") == "FOLDER")
-        
-        if l_is_dir != r_is_dir:
-            # 同理，文件夹(True)要排在文件(False)前面
-            # 文件夹(0) < 文件(1)
-            return (not l_is_dir) < (not r_is_dir)
-
-        # === 优先级 3：根据 sort_mode 比较 ===
-        mode = self.sort_mode
-        reverse = "_desc" in mode
-        key = mode.replace("_asc", "").replace("_desc", "")
-
-        val_l = 0
-        val_r = 0
-
-        if key == "name":
-            val_l = model.data(left, Qt.ItemDataRole.DisplayRole).lower()
-            val_r = model.data(right, Qt.ItemDataRole.DisplayRole).lower()
-        elif key == "size":
-            val_l = l_meta.get("size", 0)
-            val_r = r_meta.get("size", 0)
-        elif key == "date":
-            val_l = l_meta.get("mtime", 0)
-            val_r = r_meta.get("mtime", 0)
-        elif key == "rating":
-            val_l = l_meta.get("rating", 0)
-            val_r = r_meta.get("rating", 0)
-
-        if reverse:
-            return val_l > val_r
-        else:
-            return val_l < val_r
\ No newline at end of file
+        l_group, r_group = self._groups[l_row], self._groups[r_row]
+        if l_group != r_group: return l_group < r_group
+        if self._reverse: return self._values[l_row] > self._values[r_row]
+        return self._values[l_row] < self._values[r_row]
@@ -7,10 +7,13 @@ from PyQt6.QtGui import (
     QPainter, QPixmap, QPolygonF
 )
 import math 
+from collections import OrderedDict
 
 from ui.data_model import AssetModel
 from services.rating_service import RatingService
 
+RENDER_CACHE_BYTES = 128 * 1024 * 1024     # 渲染图层 LRU 上限 (按像素字节估算)
+
 class AssetGridDelegate(QStyledItemDelegate):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -26,83 +29,141 @@ class AssetGridDelegate(QStyledItemDelegate):
             "purple": "#bd93f9", "none": "transparent"
         }
 
+        self._layers = OrderedDict()    # 渲染键 -> (QPixmap, nbytes)
+        self._layer_bytes = 0
+        self._frame_paths = {}          # (w, h) -> 圆角外框
+
+    # === 绘制 ===
+    # 每个格子的静态内容 (缩略图、类型标签、置顶、角标、星级、颜色条、省略后的文件名)
+    # 合成为一张图层缓存起来；逐帧只画随悬停 / 选中变化的背景和边框，再贴上图层
     def paint(self, painter, option, index):
         try:
-            meta = index.data(AssetModel.ROLE_META_DATA)
-            if not isinstance(meta, dict): meta = {}
-            
-            filename = index.data(Qt.ItemDataRole.DisplayRole)
-            if filename is None: filename = "Unknown"
-            
-            icon = index.data(Qt.ItemDataRole.DecorationRole)
-            
             painter.save()
             painter.setRenderHint(QPainter.RenderHint.Antialiasing)
             painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
 
-            rect = option.rect
-            draw_rect = rect.adjusted(6, 6, -6, -6)
-
+            draw_rect = option.rect.adjusted(6, 6, -6, -6)
             is_selected = option.state & QStyle.StateFlag.State_Selected
             is_hover = option.state & QStyle.StateFlag.State_MouseOver
-            
+
             bg_color = QColor("#2b2b2b")
-            if is_selected: bg_color = QColor("#383838") 
+            if is_selected: bg_color = QColor("#383838")
             elif is_hover: bg_color = QColor("#333333")
-            
-            path = QPainterPath()
-            path.addRoundedRect(QRectF(draw_rect), self.radius, self.radius)
+
+            path = self._frame_path(draw_rect.size()).translated(QPointF(draw_rect.topLeft()))
             painter.fillPath(path, bg_color)
-            
             if is_selected:
                 painter.setPen(QPen(QColor("#0078d7"), 2))
                 painter.drawPath(path)
 
-            painter.setClipPath(path)
+            layer = self._layer(painter, option, index, draw_rect.size())
+            if layer is not None: painter.drawPixmap(draw_rect.topLeft(), layer)
+
+            painter.restore()
+
+        except Exception as e:
+            print(f"Paint Error: {e}")
+            painter.restore()
+
+    def _frame_path(self, size):
+        """格子圆角外框 (原点在左上角)，按尺寸缓存"""
+        key = (size.width(), size.height())
+        path = self._frame_paths.get(key)
+        if path is None:
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(0, 0, size.width(), size.height()), self.radius, self.radius)
+            self._frame_paths[key] = path
+        return path
+
+    def _layer(self, painter, option, index, size):
+        """取 (行标识 + 元数据版本, 格子尺寸, 设备像素比, 图标) 对应的静态图层，未命中时渲染并放入 LRU"""
+        if size.width() <= 0 or size.height() <= 0: return None
+        icon = index.data(Qt.ItemDataRole.DecorationRole)
+        dpr = painter.device().devicePixelRatioF() if painter.device() else 1.0
+        icon_key = icon.cacheKey() if isinstance(icon, QIcon) else 0
+        key = (index.data(AssetModel.ROLE_RENDER_KEY), size.width(), size.height(), dpr, icon_key)
+
+        cached = self._layers.get(key)
+        if cached is not None:
+            self._layers.move_to_end(key)
+            return cached[0]
+
+        layer = self._render_layer(painter.font(), index, icon, size, dpr)
+        nbytes = int(size.width() * dpr) * int(size.height() * dpr) * 4
+        self._layers[key] = (layer, nbytes)
+        self._layer_bytes += nbytes
+        while self._layer_bytes > RENDER_CACHE_BYTES and len(self._layers) > 1:
+            _, (_, freed) = self._layers.popitem(last=False)
+            self._layer_bytes -= freed
+        return layer
+
+    def _render_layer(self, base_font, index, icon, size, dpr):
+        meta = index.data(AssetModel.ROLE_META_DATA)
+        if not isinstance(meta, dict): meta = {}
+
+        filename = index.data(Qt.ItemDataRole.DisplayRole)
+        if filename is None: filename = "Unknown"
+
+        layer = QPixmap(int(size.width() * dpr), int(size.height() * dpr))
+        layer.setDevicePixelRatio(dpr)
+        layer.fill(Qt.GlobalColor.transparent)
 
-            bottom_reserved = 70 
+        painter = QPainter(layer)
+        try:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            painter.setFont(base_font)
+            draw_rect = QRect(0, 0, size.width(), size.height())
+            painter.setClipPath(self._frame_path(size))
+
+            bottom_reserved = 70
             available_h = draw_rect.height() - bottom_reserved
             if available_h < 0: available_h = 0
-            
-            img_rect = QRect(draw_rect.left() + 8, draw_rect.top() + 8, 
+
+            img_rect = QRect(draw_rect.left() + 8, draw_rect.top() + 8,
                             draw_rect.width() - 16, available_h)
-            
+
             if isinstance(icon, QIcon) and not icon.isNull():
                 base_pixmap = icon.pixmap(QSize(256, 256))
-                if not base_pixmap.isNull():
+                if not base_pixmap.isNull() and not img_rect.isEmpty():
+                    # 按物理像素缩放，高分屏上缩略图不发虚
                     scaled = base_pixmap.scaled(
-                        img_rect.size(),
+                        img_rect.size() * dpr,
                         Qt.AspectRatioMode.KeepAspectRatio,
                         Qt.TransformationMode.SmoothTransformation
                     )
-                    x = img_rect.left() + (img_rect.width() - scaled.width()) // 2
-                    y = img_rect.top() + (img_rect.height() - scaled.height()) // 2
+                    scaled.setDevicePixelRatio(dpr)
+                    w, h = int(scaled.width() / dpr), int(scaled.height() / dpr)
+                    x = img_rect.left() + (img_rect.width() - w) // 2
+                    y = img_rect.top() + (img_rect.height() - h) // 2
                     painter.drawPixmap(x, y, scaled)
 
             ftype = str(meta.get("type", "")).upper()
             if not ftype or ftype == "FILE":
                 ext = str(meta.get("ext", ""))
                 ftype = ext.replace(".", "").upper() if ext else "FILE"
-            
+
             tag_bg = "#555"
             if ftype == "FOLDER": tag_bg = "#000"
             elif ftype in ["JPG", "PNG", "GIF", "BMP", "PSD"]: tag_bg = "#0078d7"
             elif ftype in ["PY", "JS", "HTML", "JSON", "AHK"]: tag_bg = "#e0aa00"
-            
+
             self.draw_tag(painter, img_rect.topLeft(), ftype, tag_bg)
 
             # === 【核心修复】绘制置顶 Emoji (📌) ===
             if meta.get("pinned", False):
                 # 绘制在右上角
                 pin_rect = QRect(img_rect.right() - 24, img_rect.top(), 28, 28)
-                
+
                 # 字体设置 (Emoji 需要较大字号)
+                painter.save()
                 f = painter.font()
-                f.setPointSize(16) 
+                f.setPointSize(16)
                 painter.setFont(f)
-                
+
                 # 直接绘制文本，让系统负责渲染 Emoji 颜色和阴影
                 painter.drawText(pin_rect, Qt.AlignmentFlag.AlignCenter, "📌")
+                painter.restore()
 
             if ftype == "FOLDER":
                 try:
@@ -121,22 +182,22 @@ class AssetGridDelegate(QStyledItemDelegate):
             bottom_margin = 4
             name_y = draw_rect.bottom() - text_height - bottom_margin
             name_rect = QRect(draw_rect.left(), name_y, draw_rect.width(), text_height)
-            
+
             user_color = meta.get("color")
             text_color = QColor("#cccccc")
-            
+
             if user_color and isinstance(user_color, str) and user_color.strip():
                 try:
                     hex_c = self.color_map.get(user_color, user_color)
                     if QColor.isValidColor(hex_c):
                         fill_c = QColor(hex_c)
                         fill_c.setAlpha(200)
-                        
+
                         c_path = QPainterPath()
                         c_rect = name_rect.adjusted(4, 2, -4, -2)
                         c_path.addRoundedRect(QRectF(c_rect), 4.0, 4.0)
                         painter.fillPath(c_path, fill_c)
-                        
+
                         brightness = (fill_c.red()*299 + fill_c.green()*587 + fill_c.blue()*114)/1000
                         text_color = QColor("black") if brightness > 128 else QColor("white")
                 except: pass
@@ -146,17 +207,14 @@ class AssetGridDelegate(QStyledItemDelegate):
             font.setBold(True)
             font.setPointSize(9)
             painter.setFont(font)
-            
+
             metrics = painter.fontMetrics()
             text_draw_rect = name_rect.adjusted(8, 0, -8, 0)
             elided_text = metrics.elidedText(filename, Qt.TextElideMode.ElideMiddle, text_draw_rect.width())
             painter.drawText(text_draw_rect, Qt.AlignmentFlag.AlignCenter, elided_text)
-
-            painter.restore()
-            
-        except Exception as e:
-            print(f"Paint Error: {e}")
-            painter.restore()
+        finally:
+            painter.end()
+        return layer
 
     def draw_star_rating(self, painter, rect, rating):
         total_w = self.clear_icon_size + self.star_spacing + 5 * (self.star_size + self.star_spacing)
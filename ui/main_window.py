@@ -5,6 +5,7 @@ import ctypes
 import subprocess
 import logging
 import time
+import queue
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QDockWidget, QListView, QTreeView,
     QWidget, QVBoxLayout, QStackedWidget,
@@ -24,6 +25,7 @@ from ui.menus import AssetContextMenu
 from ui.color_picker import ColorPickerDialog
 from ui.item_delegate import AssetGridDelegate
 from ui.dialogs import AutoTagDialog 
+from ui.search_executor import SearchExecutor
 
 # 业务服务引用
 from services.local_store import LocalStoreService
@@ -34,53 +36,169 @@ from services.tag_service import TagService
 from services.preference_service import PreferenceService
 from services.pin_service import PinService
 from services.folder_tag_service import FolderTagService
+from services.thumbnail_store import ThumbnailStore, thumb_db
+from services.indexer_service import IndexerService, library_indexer
+from core.tree_walker import TreeWalker
+from core.db_manager import db
 
 # === 后台数据加载线程 (支持递归) ===
-class DataLoaderThread(QThread):
-    sig_loaded = pyqtSignal(dict, str) 
+class LoadRequest:
+    """一次文件夹加载请求；facets 由工作线程在非递归模式下填入当前文件夹的分面统计"""
+    __slots__ = ("generation", "path", "recursive", "limit", "max_depth", "incremental", "facets")
 
-    def __init__(self, folder_path, recursive=False, parent=None):
-        super().__init__(parent)
-        self.folder_path = folder_path
+    def __init__(self, generation, path, recursive=False, limit=0, max_depth=0, incremental=False):
+        self.generation = generation
+        self.path = path
         self.recursive = recursive
+        self.limit = limit              # 0 = 不限文件数
+        self.max_depth = max_depth      # 0 = 不限深度；1 = 只含直接子文件夹中的文件
+        self.incremental = incremental  # 结果按差异合并进现有模型 (目录监视触发的自动刷新)
+        self.facets = None              # AssetService.get_facet_counts 的结果
+
+class DataLoaderThread(QThread):
+    """
+    常驻的文件夹加载线程：请求经队列串行处理，不再为每次导航创建线程。
+    - submit() 递增代号，旧请求随即过期：排队中的直接跳过，执行中的在步骤之间检查代号后放弃
+    - 结果信号带上请求对象，界面只接收 is_current() 的结果
+    - 扫描 → 自动标签 → 数据库同步视为一个整体 (meta 已写回时数据库必须跟上)，
+      只在其前后检查取消，不会在写 .am_meta.json 或 SQLite 事务中途停下
+    """
+    sig_loaded = pyqtSignal(dict, object)   # meta, LoadRequest
+    # 递归模式下分批推送的结果 (files 子集, LoadRequest)
+    sig_batch = pyqtSignal(dict, object)
+
+    BATCH_SIZE = 500        # 每批最多条目数
+    BATCH_INTERVAL = 0.05   # 秒，距上次推送超过这个时间就推送 (即使不足一批)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.requests = queue.Queue()
+        self.generation = 0
+        self.current = None             # 最近一次提交、尚未完成的请求 (只在 GUI 线程读写)
+
+    # === GUI 线程接口 ===
+    def submit(self, path, recursive=False, limit=0, max_depth=0, incremental=False):
+        """提交新请求 (之前的请求全部过期)，返回 LoadRequest"""
+        self.generation += 1
+        request = LoadRequest(self.generation, path, recursive, limit, max_depth, incremental)
+        self.current = request
+        self.requests.put(request)
+        return request
+
+    def cancel(self):
+        """放弃当前请求 (例如切换到搜索结果)"""
+        self.generation += 1
+        self.current = None
+
+    def is_current(self, request):
+        return request is self.current and request.generation == self.generation
+
+    def finish(self, request):
+        """界面处理完结果后调用，之后 is_busy() 返回 False"""
+        if request is self.current: self.current = None
+
+    def is_busy(self):
+        return self.current is not None
+
+    def shutdown(self, timeout=3000):
+        self.cancel()
+        self.requests.put(None)
+        self.wait(timeout)
+
+    # === 工作线程 ===
+    def _stale(self, request):
+        return request.generation != self.generation or self.isInterruptionRequested()
 
     def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None: break
+            # 快速连续导航时队列里积压了更新的请求，只执行最后一个
+            while not self.requests.empty():
+                newer = self.requests.get()
+                if newer is None:
+                    self.requests.put(newer)
+                    break
+                request = newer
+            if self._stale(request): continue
+            try:
+                self._load(request)
+            except Exception as e:
+                logging.error(f"后台加载出错: {request.path} - {e}")
+                if not self._stale(request): self.sig_loaded.emit({}, request)
+        db.close()
+
+    def _scan_recursive(self, request):
+        """
+        流式递归扫描：由 TreeWalker 多线程并行枚举目录 (os.scandir 自带 stat 缓存)，
+        每 BATCH_SIZE 条或 BATCH_INTERVAL 秒通过 sig_batch 推送一次；
+        请求过期时 TreeWalker 协作式退出，返回 None。
+        """
+        flat_files = {}
+        batch = {}
+        last_emit = time.monotonic()
+        walker = TreeWalker(max_depth=request.max_depth, skip_prefixes=(LocalStoreService.META_FILENAME,))
+        results = walker.walk([request.path], should_stop=lambda: self._stale(request))
         try:
-            if self.recursive:
-                flat_files = {}
-                count = 0
-                max_files = 3000
-                for root, dirs, files in os.walk(self.folder_path):
-                    if count > max_files: break
-                    for f in files:
-                        full_path = os.path.join(root, f)
-                        try:
-                            stat = os.stat(full_path)
-                            _, ext = os.path.splitext(f)
-                            rel_path = os.path.relpath(full_path, self.folder_path)
-                            flat_files[rel_path] = {
-                                "size": stat.st_size,
-                                "ctime": stat.st_ctime,
-                                "mtime": stat.st_mtime,
-                                "ext": ext.lower(),
-                                "type": ext.replace(".", "").upper() if ext else "FILE",
-                                "full_path_override": full_path
-                            }
-                            count += 1
-                        except: pass
-                meta_data = { "files": flat_files, "sub_folders": {} }
-            else:
-                meta_data = LocalStoreService.scan_and_update(self.folder_path)
-                if meta_data:
-                    try:
-                        FolderTagService.scan_and_apply_auto_tags(self.folder_path, meta_data)
-                        AssetService.sync_from_meta(self.folder_path, 1, meta_data)
-                    except Exception as e:
-                        logging.error(f"线程内数据库同步出错: {e}")
-            self.sig_loaded.emit(meta_data if meta_data else {}, self.folder_path)
+            for result in results:
+                for name, record in result.files.items():
+                    rel_path = os.path.join(result.rel, name) if result.rel else name
+                    ext = record["ext"]
+                    info = dict(record, type=ext.replace(".", "").upper() if ext else "FILE",
+                                full_path_override=os.path.join(result.path, name))
+                    flat_files[rel_path] = info
+                    batch[rel_path] = info
+                    if request.limit and len(flat_files) >= request.limit: break
+
+                now = time.monotonic()
+                if batch and (len(batch) >= self.BATCH_SIZE or now - last_emit >= self.BATCH_INTERVAL):
+                    self.sig_batch.emit({"files": batch, "sub_folders": {}}, request)
+                    batch = {}
+                    last_emit = now
+                if request.limit and len(flat_files) >= request.limit: break
+        finally:
+            results.close()
+
+        if self._stale(request): return None
+        if batch: self.sig_batch.emit({"files": batch, "sub_folders": {}}, request)
+        return flat_files
+
+    def _load(self, request):
+        if request.recursive:
+            # 模型已改为列式存储 + 分批暴露，不再需要 3000 个文件的上限；条目已经通过 sig_batch 推送过
+            flat_files = self._scan_recursive(request)
+            if flat_files is None: return
+            meta_data = { "files": flat_files, "sub_folders": {} }
+        else:
+            meta_data, changes = LocalStoreService.scan_changes(request.path)
+            if meta_data:
+                try:
+                    FolderTagService.scan_and_apply_auto_tags(request.path, meta_data, changes)
+                    volume_id = AssetService.get_volume_id_by_path(request.path)
+                    synced = AssetService.sync_from_meta(request.path, volume_id, meta_data, changes)
+                    # 数据库与 meta 一致 (同步成功或没有变更) 时，筛选面板直接读聚合统计
+                    unchanged = changes and not any(changes.get(k) for k in ("full", "added", "modified", "removed"))
+                    if (synced is not None or unchanged) and not self._stale(request):
+                        request.facets = AssetService.get_facet_counts(request.path)
+                except Exception as e:
+                    logging.error(f"线程内数据库同步出错: {e}")
+        if self._stale(request): return
+        self.sig_loaded.emit(meta_data if meta_data else {}, request)
+
+class ThumbnailVacuumThread(QThread):
+    """整理缩略图库 (逐个 stat 原图 + VACUUM，可能持续很久)，在后台执行，结果通过信号交回界面"""
+    sig_done = pyqtSignal(dict)
+    sig_failed = pyqtSignal(str)
+
+    def run(self):
+        try:
+            result = ThumbnailStore.vacuum(should_stop=self.isInterruptionRequested)
+            if result is not None: self.sig_done.emit(result)
         except Exception as e:
-            logging.error(f"后台加载线程崩溃: {e}")
-            self.sig_loaded.emit({}, self.folder_path)
+            logging.error(f"整理缩略图缓存失败: {e}")
+            self.sig_failed.emit(str(e))
+        finally:
+            thumb_db.close()
 
 class AssetManagerWindow(QMainWindow):
     EDGE_NONE, EDGE_LEFT, EDGE_TOP, EDGE_RIGHT, EDGE_BOTTOM = 0, 1, 2, 4, 8
@@ -112,7 +230,9 @@ class AssetManagerWindow(QMainWindow):
         self.view_settings = {
             "show_folders": True,       
             "show_hidden": False,       
-            "recursive": False          
+            "recursive": False,
+            "recursive_limit": 0,       # 递归视图最多加载的文件数 (0 = 不限)
+            "recursive_depth": 0        # 递归视图最大深度 (0 = 不限)
         }
 
         self.file_watcher = QFileSystemWatcher(self)
@@ -133,7 +253,17 @@ class AssetManagerWindow(QMainWindow):
         self.proxy_model.setSourceModel(self.asset_model)
         self.proxy_model.setDynamicSortFilter(True)
         
-        self.loader_thread = None
+        self.loader = DataLoaderThread(self)
+        self.loader.sig_loaded.connect(self.on_folder_loaded)
+        self.loader.sig_batch.connect(self.on_folder_batch)
+        self.loader.start()
+
+        self.search_executor = SearchExecutor(self)
+        self.search_executor.sig_page.connect(self.on_search_page)
+        self.search_executor.sig_finished.connect(self.on_search_finished)
+        self.search_executor.sig_failed.connect(self.on_search_failed)
+
+        self.vacuum_thread = None
         
         self.setup_header()
         self.setup_central_widget()
@@ -173,32 +303,44 @@ class AssetManagerWindow(QMainWindow):
         geo = self.saveGeometry().toHex().data().decode()
         state = self.saveState().toHex().data().decode()
         PreferenceService.save_window_layout(geo, state)
+        # 退出前让常驻加载线程处理完当前步骤后结束，避免线程对象随窗口销毁时仍在运行
+        self.loader.shutdown()
+        self.search_executor.shutdown()
+        if self.vacuum_thread is not None:
+            # 检查原图阶段可以中途放弃；已经开始的 VACUUM 只能等它完成
+            self.vacuum_thread.requestInterruption()
+            self.vacuum_thread.wait()
         event.accept()
 
     def on_directory_changed(self, path):
-        if self.loader_thread and self.loader_thread.isRunning(): return
+        if self.loader.is_busy(): return
         if self.view_settings["recursive"]: return
+        # 元数据写回 (临时文件 + rename) 也会触发目录变动，忽略自己的写入
+        if LocalStoreService.is_own_write(path): return
         print(f"检测到变动 (防抖中): {path}")
         self.refresh_timer.start()
 
     def execute_auto_refresh(self):
         current_path = self.nav_bar.address_bar.text()
         print(f"执行自动刷新: {current_path}")
-        self.update_middle_column(current_path, record_history=False, force_reload=True)
+        self.update_middle_column(current_path, record_history=False, force_reload=True, incremental=True)
 
     def execute_global_search(self, keyword):
+        """搜索在 SearchExecutor 的工作线程执行，结果按页流入模型；新搜索会中止旧搜索"""
         keyword = keyword.strip()
         if not keyword: return
         print(f"正在全局搜索: {keyword}")
         self.pause_monitoring()
+        self.loader.cancel()
         self.panel_filter.tree.clear()
-        self.asset_model.clear()
-        self.setCursor(Qt.CursorShape.WaitCursor)
-        results = AssetService.search_assets(keyword)
+        self.asset_model.load_data("SEARCH_RESULTS", {})
+        self.search_executor.submit(keyword)
+
+    def on_search_page(self, rows):
         files_data = {}
-        for row in results:
+        for row in rows:
             full_path = row["full_path"]
-            row_type = row.get("type", "FILE").upper()
+            row_type = (row.get("type") or "FILE").upper()
             files_data[full_path] = {
                 "size": row.get("size", 0),
                 "rating": row.get("rating", 0),
@@ -206,10 +348,13 @@ class AssetManagerWindow(QMainWindow):
                 "type": row_type,
                 "full_path_override": full_path
             }
-        meta_data = {"files": files_data, "sub_folders": {}}
-        self.asset_model.load_data("SEARCH_RESULTS", meta_data)
-        self.setCursor(Qt.CursorShape.ArrowCursor)
-        QToolTip.showText(self.nav_bar.search_bar.mapToGlobal(QPoint(0,0)), f"找到 {len(results)} 个结果")
+        self.asset_model.append_data({"files": files_data, "sub_folders": {}})
+
+    def on_search_finished(self, keyword, total):
+        QToolTip.showText(self.nav_bar.search_bar.mapToGlobal(QPoint(0,0)), f"找到 {total} 个结果")
+
+    def on_search_failed(self, keyword, message):
+        QToolTip.showText(self.nav_bar.search_bar.mapToGlobal(QPoint(0,0)), f"搜索失败: {message}")
 
     def pause_monitoring(self):
         if self.current_watch_path:
@@ -254,29 +399,8 @@ class AssetManagerWindow(QMainWindow):
 
     def paste_tags(self):
         if not self._copied_tags: return
-        current_view = self.central_stack.currentWidget()
-        selection_model = current_view.selectionModel()
-        indexes = selection_model.selectedIndexes()
-        if not indexes: return
-        self.pause_monitoring()
-        try:
-            rows_processed = set()
-            count = 0
-            for index in indexes:
-                source_index = self.proxy_model.mapToSource(index)
-                if source_index.row() in rows_processed: continue
-                rows_processed.add(source_index.row())
-                full_path = self.asset_model.data(source_index, AssetModel.ROLE_FULL_PATH)
-                if full_path:
-                    new_info = TagService.add_tags_batch(full_path, self._copied_tags)
-                    if new_info:
-                        count += 1
-                        self.asset_model.setData(source_index, new_info, AssetModel.ROLE_META_DATA)
-                        if index == selection_model.currentIndex():
-                            filename = self.asset_model.data(source_index, Qt.ItemDataRole.DisplayRole)
-                            self.panel_meta.update_info(filename, new_info)
-        finally:
-            self.resume_monitoring()
+        tags = list(self._copied_tags)
+        self._batch_update_selection(lambda paths: TagService.add_tags_many(paths, tags))
 
     def handle_pin_file(self, full_path):
         self.pause_monitoring()
@@ -390,38 +514,46 @@ class AssetManagerWindow(QMainWindow):
         super().keyPressEvent(event)
 
     def apply_rating_to_selection(self, rating):
-        self._batch_update_selection(lambda path: RatingService.set_rating(path, rating))
+        self._batch_update_selection(lambda paths: RatingService.set_rating_many(paths, rating))
 
     def apply_color_to_selection(self, color_arg):
         target_color = ""
         if isinstance(color_arg, int): target_color = ColorLabelService.SHORTCUT_MAP.get(color_arg, "")
         elif isinstance(color_arg, str): target_color = color_arg
-        self._batch_update_selection(lambda path: ColorLabelService.set_color(path, target_color))
+        self._batch_update_selection(lambda paths: ColorLabelService.set_color_many(paths, target_color))
 
-    def _batch_update_selection(self, service_func):
+    def _batch_update_selection(self, batch_func):
+        """
+        对选中项执行批量服务调用：batch_func(paths) -> {full_path: 更新后的元数据}。
+        服务层按文件夹合并 meta 读写、数据库只开一个事务，这里只负责收集选区和刷新模型。
+        """
         current_view = self.central_stack.currentWidget()
         if not current_view: return
         selection_model = current_view.selectionModel()
         if not selection_model: return
         indexes = selection_model.selectedIndexes()
         if not indexes: return
+
+        current = selection_model.currentIndex()
+        current_row = self.proxy_model.mapToSource(current).row() if current.isValid() else -1
+        rows_by_path = {}
+        for index in indexes:
+            source_index = self.proxy_model.mapToSource(index)
+            full_path = self.asset_model.data(source_index, AssetModel.ROLE_FULL_PATH)
+            if full_path and full_path not in rows_by_path: rows_by_path[full_path] = source_index
+        if not rows_by_path: return
+
         self.pause_monitoring()
         try:
-            rows_processed = set()
-            count = 0
-            for index in indexes:
-                source_index = self.proxy_model.mapToSource(index) 
-                if source_index.row() in rows_processed: continue
-                rows_processed.add(source_index.row())
-                full_path = self.asset_model.data(source_index, AssetModel.ROLE_FULL_PATH)
-                if full_path:
-                    new_info = service_func(full_path)
-                    if new_info:
-                        count += 1
-                        self.asset_model.setData(source_index, new_info, AssetModel.ROLE_META_DATA)
-                        if len(rows_processed) == 1:
-                            filename = self.asset_model.data(source_index, Qt.ItemDataRole.DisplayRole)
-                            self.panel_meta.update_info(filename, new_info)
+            updated = batch_func(list(rows_by_path))
+            for full_path, new_info in updated.items():
+                source_index = rows_by_path[full_path]
+                self.asset_model.setData(source_index, new_info, AssetModel.ROLE_META_DATA)
+            # 元数据面板显示当前项 (没有当前项时显示第一个)
+            focus = next((p for p, idx in rows_by_path.items() if idx.row() == current_row), next(iter(rows_by_path)))
+            if focus in updated:
+                filename = self.asset_model.data(rows_by_path[focus], Qt.ItemDataRole.DisplayRole)
+                self.panel_meta.update_info(filename, updated[focus])
         finally:
             self.resume_monitoring()
 
@@ -533,9 +665,52 @@ class AssetManagerWindow(QMainWindow):
         act_recursive.setChecked(self.view_settings["recursive"])
         act_recursive.triggered.connect(lambda c: self.toggle_view_setting("recursive", c))
         menu.addAction(act_recursive)
+        menu.addSeparator()
+        act_vacuum = QAction("整理缩略图缓存", self)
+        act_vacuum.setEnabled(self.vacuum_thread is None)
+        act_vacuum.triggered.connect(self.vacuum_thumbnail_store)
+        menu.addAction(act_vacuum)
+        act_index = QAction("将当前文件夹加入索引库", self)
+        act_index.setEnabled(os.path.isdir(self.nav_bar.address_bar.text()))
+        act_index.triggered.connect(self.add_current_to_library)
+        menu.addAction(act_index)
         btn = self.title_bar.btn_view
         menu.exec(btn.mapToGlobal(QPoint(0, btn.height())))
 
+    def vacuum_thumbnail_store(self):
+        """在后台线程整理缩略图库，界面保持可用；完成后弹出结果"""
+        if self.vacuum_thread is not None: return
+        self.vacuum_thread = ThumbnailVacuumThread(self)
+        self.vacuum_thread.sig_done.connect(self.on_vacuum_done)
+        self.vacuum_thread.sig_failed.connect(self.on_vacuum_failed)
+        self.vacuum_thread.finished.connect(self.on_vacuum_thread_finished)
+        self.vacuum_thread.start()
+
+    def on_vacuum_thread_finished(self):
+        self.vacuum_thread.deleteLater()
+        self.vacuum_thread = None
+
+    def on_vacuum_failed(self, message):
+        QMessageBox.warning(self, "整理失败", message)
+
+    def on_vacuum_done(self, result):
+        QMessageBox.information(self, "整理完成",
+            f"清理失效缩略图 {result['removed']} 个\n"
+            f"容量淘汰 {result['evicted_bytes'] / 1048576:.1f} MB\n"
+            f"当前占用 {result['file_bytes'] / 1048576:.1f} MB")
+
+    def add_current_to_library(self):
+        """把当前文件夹登记为资源库根目录，由后台索引线程低优先级地完整索引"""
+        path = self.nav_bar.address_bar.text()
+        if not path: return
+        root_id = IndexerService.add_root(path)
+        if root_id is None:
+            QMessageBox.warning(self, "加入失败", f"无法访问: {path}")
+            return
+        library_indexer.wake()
+        QMessageBox.information(self, "已加入索引库",
+            f"{path}\n将在后台逐步索引 (当前队列 {IndexerService.pending_count()} 个目录)")
+
     def toggle_view_setting(self, key, checked):
         self.view_settings[key] = checked
         self.update_middle_column(self.nav_bar.address_bar.text(), record_history=False, force_reload=True)
@@ -600,7 +775,8 @@ class AssetManagerWindow(QMainWindow):
         common_config(self.list_view)
         self.central_stack.addWidget(self.list_view)
 
-    def update_middle_column(self, path, record_history=True, force_reload=False):
+    def update_middle_column(self, path, record_history=True, force_reload=False, incremental=False):
+        """incremental: 仍是当前文件夹时不清空模型，加载完成后只应用差异 (保留选区 / 滚动位置 / 筛选勾选)"""
         path = str(path).strip().strip('"')
         if not os.path.exists(path): return
 
@@ -623,28 +799,74 @@ class AssetManagerWindow(QMainWindow):
             self.file_watcher.removePath(self.current_watch_path)
             self.current_watch_path = None
 
-        if self.loader_thread and self.loader_thread.isRunning():
-            self.loader_thread.terminate()
-            self.loader_thread.wait()
+        # 仍在流入的搜索结果不能混进文件夹视图
+        self.search_executor.cancel()
 
-        self.setCursor(Qt.CursorShape.WaitCursor) 
-        self.asset_model.clear() 
-        
         is_recursive = self.view_settings["recursive"]
-        self.loader_thread = DataLoaderThread(path, recursive=is_recursive, parent=self)
-        self.loader_thread.sig_loaded.connect(self.on_folder_loaded)
-        self.loader_thread.start()
-
-    def on_folder_loaded(self, meta_data, path):
-        if not meta_data: meta_data = {}
+        incremental = incremental and not is_recursive and self._model_shows(path)
+        if not incremental:
+            # 增量刷新保留现有模型，等加载完成后再合并差异
+            self.setCursor(Qt.CursorShape.WaitCursor)
+            if is_recursive:
+                # 递归结果分批流入：先建立空模型，之后每批追加
+                self.asset_model.load_data(path, {})
+            else:
+                self.asset_model.clear() 
+        # 常驻加载线程：新请求使之前的请求过期 (排队中的跳过，执行中的在步骤之间放弃)
+        self.loader.submit(path, recursive=is_recursive,
+                           limit=self.view_settings["recursive_limit"],
+                           max_depth=self.view_settings["recursive_depth"],
+                           incremental=incremental)
+
+    def _model_shows(self, path):
+        """模型当前装载的是否就是该文件夹 (不是搜索结果)"""
+        folder = self.asset_model.folder_path
+        return bool(folder) and folder != "SEARCH_RESULTS" and os.path.normcase(os.path.abspath(folder)) == os.path.normcase(os.path.abspath(path))
+
+    def _filter_meta_for_view(self, meta_data):
         if not self.view_settings["show_folders"]: meta_data["sub_folders"] = {}
         if not self.view_settings["show_hidden"]:
             if "files" in meta_data:
                 meta_data["files"] = {k: v for k, v in meta_data["files"].items() if not k.startswith(".")}
+        return meta_data
 
-        self.asset_model.load_data(path, meta_data)
+    def _hidden_meta_for_view(self, meta_data):
+        """_filter_meta_for_view 会去掉的条目 (隐藏文件 / 关闭显示时的文件夹)"""
+        hidden = {"files": {}, "sub_folders": {}}
+        if not self.view_settings["show_folders"]: hidden["sub_folders"] = meta_data.get("sub_folders") or {}
+        if not self.view_settings["show_hidden"]:
+            hidden["files"] = {k: v for k, v in meta_data.get("files", {}).items() if k.startswith(".")}
+        return hidden
+
+    def on_folder_batch(self, batch, request):
+        # 排队中的旧批次在信号到达时可能已经过期
+        if not self.loader.is_current(request): return
+        self.asset_model.append_data(self._filter_meta_for_view(batch))
+        self.setCursor(Qt.CursorShape.ArrowCursor)
+
+    def on_folder_loaded(self, meta_data, request):
+        if not self.loader.is_current(request): return
+        self.loader.finish(request)
+        path = request.path
+        if not meta_data: meta_data = {}
+        # 聚合统计包含文件夹的全部直接子项：只逐条统计视图隐藏的少数条目并扣除
+        facets = request.facets
+        if facets is not None:
+            hidden = self._hidden_meta_for_view(meta_data)
+            if hidden["files"] or hidden["sub_folders"]:
+                facets = FilterPanel.subtract_facets(facets, AssetService.count_meta_facets(hidden))
+        meta_data = self._filter_meta_for_view(meta_data)
+
+        # 递归模式的条目已经由 on_folder_batch 逐批加入模型，这里只刷新筛选面板
+        streamed = request.recursive
+        incremental = request.incremental and self._model_shows(path)
+        if incremental:
+            added, removed, changed = self.asset_model.update_data(meta_data)
+            logging.debug(f"增量刷新: 新增 {added}, 删除 {removed}, 变化 {changed}")
+        elif not streamed: self.asset_model.load_data(path, meta_data)
         self.setCursor(Qt.CursorShape.ArrowCursor)
-        self.panel_filter.load_filters(meta_data)
+        # 递归视图没有聚合统计 (facets 为 None)，由面板逐条统计
+        self.panel_filter.load_filters(meta_data, facets, keep_checked=incremental)
 
         if path == self.nav_bar.address_bar.text() and not self.view_settings["recursive"]:
             self.file_watcher.addPath(path)
@@ -760,6 +982,7 @@ class AssetManagerWindow(QMainWindow):
         size = QSize(value, value)
         self.grid_view.setIconSize(size)
         self.grid_view.setGridSize(QSize(value + 20, value + 80))
+        self.asset_model.thumb_loader.set_icon_size(value)
 
     def go_back(self):
         if self.history_index > 0:
@@ -532,14 +532,9 @@ class FilterPanel(QWidget):
         layout.addWidget(self.tree)
         self._is_updating = False
 
-    def load_filters(self, meta_data):
-        self._is_updating = True
-        self.tree.clear()
-        
-        if not meta_data:
-            self._is_updating = False
-            return
-
+    @staticmethod
+    def count_facets(meta_data):
+        """逐条统计 meta (递归视图 / 隐藏了部分条目时使用；普通文件夹视图直接读数据库聚合表)"""
         files_map = meta_data.get("files", {})
         sub_folders = meta_data.get("sub_folders", {})
         
@@ -573,6 +568,33 @@ class FilterPanel(QWidget):
         for name, info in files_map.items(): process_item(name, info, is_folder=False)
         if isinstance(sub_folders, dict):
             for name, info in sub_folders.items(): process_item(name, info, is_folder=True)
+        return stats
+
+    @staticmethod
+    def subtract_facets(stats, excluded):
+        """从聚合统计中扣除视图隐藏的条目 (excluded 为 count_facets 的结果)，计数归零的值不再显示"""
+        result = {}
+        for facet, counts in stats.items():
+            removed = excluded.get(facet, {})
+            result[facet] = {value: n - removed.get(value, 0) for value, n in counts.items()
+                             if n - removed.get(value, 0) > 0}
+        return result
+
+    def load_filters(self, meta_data, stats=None, keep_checked=False):
+        """
+        stats: AssetService.get_facet_counts() 的结果；不传则从 meta_data 统计
+        keep_checked: 保留之前的勾选 (自动刷新)；勾选项在新数据中消失时重新发出筛选条件
+        """
+        previous = self.checked_values() if keep_checked else set()
+        self._is_updating = True
+        self.tree.clear()
+        
+        if not meta_data:
+            self._is_updating = False
+            if previous: self.on_item_changed(None, 0)
+            return
+
+        if stats is None: stats = self.count_facets(meta_data)
 
         # 1. 标签
         if stats["tags"]:
@@ -627,7 +649,27 @@ class FilterPanel(QWidget):
                 self._add_child(root, f"{display_name} ({count})", "type", ftype_code)
             root.setExpanded(True)
 
+        if previous:
+            iterator = QTreeWidgetItemIterator(self.tree)
+            while iterator.value():
+                it = iterator.value()
+                data = it.data(0, Qt.ItemDataRole.UserRole)
+                if data and (data["cat"], data["val"]) in previous:
+                    it.setCheckState(0, Qt.CheckState.Checked)
+                iterator += 1
+
         self._is_updating = False
+        if previous and self.checked_values() != previous: self.on_item_changed(None, 0)
+
+    def checked_values(self):
+        """当前勾选的 {(类别, 取值)}"""
+        checked = set()
+        iterator = QTreeWidgetItemIterator(self.tree, QTreeWidgetItemIterator.IteratorFlag.Checked)
+        while iterator.value():
+            data = iterator.value().data(0, Qt.ItemDataRole.UserRole)
+            if data: checked.add((data["cat"], data["val"]))
+            iterator += 1
+        return checked
 
     def _add_root(self, text):
         item = QTreeWidgetItem(self.tree)
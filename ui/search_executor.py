@@ -0,0 +1,161 @@
+# G:\PYthon\AssetManager\ui\search_executor.py
+
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from collections import deque
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from core.db_manager import db
+from services.asset_service import AssetService
+
+# === 搜索执行参数 ===
+SEARCH_PAGE_SIZE = 500          # 每页推送给界面的行数
+LATENCY_HISTORY = 50            # 保留最近多少次查询的耗时记录
+
+class _SearchWorker(QThread):
+    """
+    常驻的搜索线程：一次只执行一个查询，结果逐页 fetchmany 推送。
+    查询只执行一次 (不用 OFFSET 反复重跑 bm25 排序)，页与页之间检查代号，过期立即停止。
+    """
+    sig_page = pyqtSignal(int, list)                 # generation, rows
+    sig_done = pyqtSignal(int, int, float, float)    # generation, total, 首页耗时, 总耗时
+    sig_failed = pyqtSignal(int, str)
+
+    def __init__(self, executor):
+        super().__init__()
+        self.executor = executor
+        self.requests = queue.Queue()
+        self.conn = None
+        self.state_lock = threading.Lock()   # 保护 conn / running_generation，只短暂持有
+        self.running_generation = 0
+
+    def run(self):
+        # 连接在本线程打开 (DBManager 按线程池化)，GUI 线程只会对它调用 interrupt()
+        self.conn = db.get_connection()
+        while True:
+            generation, keyword = self.requests.get()
+            if generation is None: break
+            # 队列里积压了更新的请求时只执行最后一个
+            while not self.requests.empty():
+                newer = self.requests.get()
+                if newer[0] is None:
+                    self.requests.put(newer)
+                    break
+                generation, keyword = newer
+            if generation != self.executor.generation: continue
+            self._execute(generation, keyword)
+        with self.state_lock:
+            self.conn = None
+        db.close()
+
+    def _execute(self, generation, keyword):
+        started = time.perf_counter()
+        first_page = None
+        total = 0
+        try:
+            sql, params = AssetService.build_search_query(self.conn, keyword)
+            with self.state_lock:
+                self.running_generation = generation
+            # 语句执行期间不持锁：GUI 线程随时可以 interrupt()，不会被慢查询卡住
+            cursor = self.conn.execute(sql, params)
+            while generation == self.executor.generation:
+                rows = cursor.fetchmany(SEARCH_PAGE_SIZE)
+                if not rows: break
+                if first_page is None: first_page = time.perf_counter() - started
+                total += len(rows)
+                self.sig_page.emit(generation, [dict(row) for row in rows])
+            cursor.close()
+        except sqlite3.OperationalError as e:
+            # 被新查询 interrupt() 打断属于正常取消
+            if generation == self.executor.generation:
+                logging.error(f"搜索失败: {keyword} - {e}")
+                self.sig_failed.emit(generation, str(e))
+            return
+        except Exception as e:
+            logging.error(f"搜索失败: {keyword} - {e}")
+            self.sig_failed.emit(generation, str(e))
+            return
+        finally:
+            with self.state_lock:
+                self.running_generation = 0
+
+        if generation != self.executor.generation: return
+        elapsed = time.perf_counter() - started
+        self.sig_done.emit(generation, total, first_page if first_page is not None else elapsed, elapsed)
+
+class SearchExecutor(QObject):
+    """
+    全局搜索执行器：查询在工作线程执行，GUI 线程永远不等待数据库。
+    - submit() 发起新查询时，正在执行的旧查询通过 sqlite3 interrupt() 立即中止
+    - 结果按页通过 sig_page 推送，界面边收边显示
+    - 每次查询的首页耗时与总耗时记录在 latencies / last_stats 中
+    """
+    sig_started = pyqtSignal(str)
+    sig_page = pyqtSignal(list)
+    sig_finished = pyqtSignal(str, int)
+    sig_failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.keyword = ""
+        self.last_stats = None
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self._worker = _SearchWorker(self)
+        self._worker.sig_page.connect(self._on_page)
+        self._worker.sig_done.connect(self._on_done)
+        self._worker.sig_failed.connect(self._on_failed)
+        self._worker.start()
+
+    def submit(self, keyword):
+        """发起新查询 (取消旧查询)，返回本次查询的代号"""
+        self.generation += 1
+        self.keyword = keyword
+        self._interrupt_running()
+        self._worker.requests.put((self.generation, keyword))
+        self.sig_started.emit(keyword)
+        return self.generation
+
+    def cancel(self):
+        """放弃当前查询 (例如切换回文件夹浏览)"""
+        self.generation += 1
+        self._interrupt_running()
+
+    def shutdown(self, timeout=3000):
+        self.cancel()
+        self._worker.requests.put((None, None))
+        self._worker.wait(timeout)
+
+    def is_busy(self):
+        return self._worker.running_generation != 0
+
+    def _interrupt_running(self):
+        # 只在旧查询执行中时打断。新语句开始执行时 SQLite 会清除中断标记，
+        # 因此不会误伤随后开始的新查询；残留的旧页由代号过滤
+        with self._worker.state_lock:
+            running = self._worker.running_generation
+            if running and running != self.generation and self._worker.conn is not None:
+                self._worker.conn.interrupt()
+
+    def _on_page(self, generation, rows):
+        # 排队中的旧页在信号到达时可能已经过期
+        if generation != self.generation: return
+        self.sig_page.emit(rows)
+
+    def _on_done(self, generation, total, first_page, elapsed):
+        if generation != self.generation: return
+        self.last_stats = {
+            "keyword": self.keyword,
+            "rows": total,
+            "first_page_seconds": first_page,
+            "seconds": elapsed,
+        }
+        self.latencies.append(elapsed)
+        logging.info(f"搜索完成: {self.keyword} - {total} 条, 首页 {first_page * 1000:.1f} ms, 总计 {elapsed * 1000:.1f} ms")
+        self.sig_finished.emit(self.keyword, total)
+
+    def _on_failed(self, generation, message):
+        if generation != self.generation: return
+        self.sig_failed.emit(self.keyword, message)
@@ -8,6 +8,7 @@ from PyQt6.QtGui import QColor, QCursor, QPainter, QPen
 
 import data_manager
 from services.preference_service import PreferenceService
+from services.tag_suggest_service import TagSuggestService, SUGGEST_LIMIT
 
 # ==================== 0. 基础：流式布局 ====================
 class FlowLayout(QLayout):
@@ -157,39 +158,51 @@ class TagGridItem(QFrame):
             QFrame { background-color: #2D2D2D; border-radius: 3px; border: 1px solid #0078D7; }
         """
         
-        if is_selected:
-            self.setStyleSheet(self.selected_style)
-        else:
-            self.setStyleSheet(self.default_style)
-
         layout = QHBoxLayout(self)
         layout.setContentsMargins(8, 0, 8, 0)
         layout.setSpacing(8)
 
-        lbl_icon = QLabel()
-        if is_recent:
-            lbl_icon.setText("🕒")
-            lbl_icon.setStyleSheet("color: #888; font-size: 11px; border: none; background: transparent;")
-        else:
-            lbl_icon.setText("#") 
-            lbl_icon.setStyleSheet("color: #555; font-size: 12px; font-weight: bold; border: none; background: transparent;")
-        layout.addWidget(lbl_icon)
+        self.lbl_icon = QLabel()
+        layout.addWidget(self.lbl_icon)
 
-        self.lbl_text = QLabel(text)
-        text_color = "#FFFFFF" if is_selected else "#CCCCCC"
-        self.lbl_text.setStyleSheet(f"color: {text_color}; font-size: 12px; border: none; background: transparent;")
+        self.lbl_text = QLabel()
         layout.addWidget(self.lbl_text, 1)
 
         self.lbl_check = QLabel("✔")
         self.lbl_check.setStyleSheet("color: #4CAF50; font-weight: bold; font-size: 12px; border: none; background: transparent;")
-        if not is_selected:
-            self.lbl_check.hide()
         layout.addWidget(self.lbl_check)
 
-        self.is_selected = is_selected
+        self.is_recent = None
+        self.is_selected = None
+        self.is_highlighted = False
+        self.set_data(text, is_recent, is_selected)
+
+    def set_data(self, text, is_recent=False, is_selected=False):
+        """复用同一个控件显示另一个标签 (弹窗的控件池)，只更新有变化的部分"""
+        self.text_val = text
+        self.lbl_text.setText(text)
+        if is_recent != self.is_recent:
+            if is_recent:
+                self.lbl_icon.setText("🕒")
+                self.lbl_icon.setStyleSheet("color: #888; font-size: 11px; border: none; background: transparent;")
+            else:
+                self.lbl_icon.setText("#") 
+                self.lbl_icon.setStyleSheet("color: #555; font-size: 12px; font-weight: bold; border: none; background: transparent;")
+            self.is_recent = is_recent
+        if is_selected != self.is_selected:
+            self.setStyleSheet(self.selected_style if is_selected else self.default_style)
+            text_color = "#FFFFFF" if is_selected else "#CCCCCC"
+            self.lbl_text.setStyleSheet(f"color: {text_color}; font-size: 12px; border: none; background: transparent;")
+            self.lbl_check.setVisible(bool(is_selected))
+            self.is_selected = is_selected
+            self.is_highlighted = False
+        else:
+            # 导航高亮可能残留，恢复为普通样式
+            self.set_highlight(False)
 
     def set_highlight(self, active):
-        if self.is_selected: return
+        if self.is_selected or active == self.is_highlighted: return
+        self.is_highlighted = active
         if active:
             self.setStyleSheet(self.highlight_style)
         else:
@@ -199,6 +212,49 @@ class TagGridItem(QFrame):
         if event.button() == Qt.MouseButton.LeftButton:
             self.sig_clicked.emit(self.text_val)
 
+# ==================== 2.5 标签分区 (控件池) ====================
+class TagSection(QWidget):
+    """标题 + 两列网格。TagGridItem 只在数量不够时新建，多余的隐藏，刷新时逐个 set_data 复用"""
+    def __init__(self, on_clicked, parent=None):
+        super().__init__(parent)
+        self.on_clicked = on_clicked
+        self.items = []
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(8)
+
+        self.lbl_title = QLabel()
+        self.lbl_title.setStyleSheet("color: #888; font-size: 11px; font-weight: bold; text-transform: uppercase;")
+        layout.addWidget(self.lbl_title)
+
+        grid_widget = QWidget()
+        self.grid = QGridLayout(grid_widget)
+        self.grid.setContentsMargins(0, 0, 0, 0)
+        self.grid.setVerticalSpacing(2) 
+        self.grid.setHorizontalSpacing(8)
+        layout.addWidget(grid_widget)
+
+    def fill(self, title, tags, selected_tags, is_recent=False, total=None):
+        """显示 tags，返回可导航的控件列表"""
+        if not tags:
+            self.hide()
+            return []
+        self.lbl_title.setText(f"{title} ({len(tags)})" if total is None or total == len(tags) else f"{title} ({len(tags)} / {total})")
+        while len(self.items) < len(tags):
+            i = len(self.items)
+            item = TagGridItem("", is_recent)
+            item.sig_clicked.connect(self.on_clicked)
+            self.grid.addWidget(item, i // 2, i % 2)
+            self.items.append(item)
+        for item, tag in zip(self.items, tags):
+            item.set_data(tag, is_recent, tag in selected_tags)
+            item.show()
+        for item in self.items[len(tags):]:
+            item.hide()
+        self.show()
+        return self.items[:len(tags)]
+
 # ==================== 3. 弹窗容器 (Popup) ====================
 class TagSelectionPopup(QDialog):
     sig_tags_changed = pyqtSignal(list) 
@@ -223,7 +279,6 @@ class TagSelectionPopup(QDialog):
         """)
         
         self.selected_tags = set(current_tags) 
-        self.all_db_tags = []
         self.recent_tags = []
         self.nav_items = [] 
         self.current_nav_index = -1
@@ -274,6 +329,8 @@ class TagSelectionPopup(QDialog):
         self.content_layout.setContentsMargins(12, 12, 12, 12)
         self.content_layout.setSpacing(8) 
         
+        self.build_pool()
+        
         self.scroll_area.setWidget(self.content_widget)
         layout.addWidget(self.scroll_area)
 
@@ -324,100 +381,67 @@ class TagSelectionPopup(QDialog):
                 self.create_and_select_tag(text)
 
     def load_data(self):
-        self.all_db_tags = data_manager.get_all_tags()
+        TagSuggestService.sync()
         self.recent_tags = PreferenceService.get_recent_tags()
         self.refresh_ui()
 
+    def build_pool(self):
+        """弹窗内的控件只创建一次：新建按钮、空提示、两个分区 (标签项按需扩充后复用)"""
+        self.lbl_empty = QLabel("暂无标签，请输入文字创建")
+        self.lbl_empty.setStyleSheet("color: #666; font-style: italic; margin-top: 20px;")
+        self.lbl_empty.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.content_layout.addWidget(self.lbl_empty)
+
+        self.btn_create = QPushButton()
+        self.btn_create.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_create.clicked.connect(lambda: self.create_and_select_tag(self.search_input.text().strip()))
+        self.btn_create.set_highlight = lambda active: self.btn_create.setStyleSheet(
+            f"QPushButton {{ text-align: left; padding: 8px; color: #4CAF50; font-weight: bold; background: {'#2D2D2D' if active else '#252526'}; border: 1px dashed #4CAF50; border-radius: 4px; }}"
+            + ("" if active else " QPushButton:hover { background-color: #2D2D2D; }")
+        )
+        self.btn_create.set_highlight(False)
+        self.btn_create.is_create_btn = True
+        self.content_layout.addWidget(self.btn_create)
+
+        self.section_first = TagSection(self.toggle_tag)
+        self.section_second = TagSection(self.toggle_tag)
+        self.content_layout.addWidget(self.section_first)
+        self.content_layout.addWidget(self.section_second)
+        self.content_layout.addStretch()
+
     def refresh_ui(self, filter_text=""):
-        while self.content_layout.count():
-            item = self.content_layout.takeAt(0)
-            if item.widget(): item.widget().deleteLater()
-        
+        """候选由 TagSuggestService 给出前 SUGGEST_LIMIT 个，池中控件只改内容不重建"""
         self.nav_items = []
         self.current_nav_index = -1
-        filter_text = filter_text.strip().lower()
-
-        if not self.all_db_tags and not filter_text:
-            lbl = QLabel("暂无标签，请输入文字创建")
-            lbl.setStyleSheet("color: #666; font-style: italic; margin-top: 20px;")
-            lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.content_layout.addWidget(lbl)
-            self.content_layout.addStretch()
-            return
-
-        matches = []
-        if filter_text:
-            matches = [t for t in self.all_db_tags if filter_text in t.lower()]
-            db_tags_lower = [t.lower() for t in self.all_db_tags]
-            
-            if filter_text not in db_tags_lower:
-                self.add_create_button(self.search_input.text().strip())
-            
-            if matches:
-                self.add_section("搜索结果", matches)
+        raw_text = filter_text.strip()
+
+        total = TagSuggestService.count()
+        self.lbl_empty.setVisible(not total and not raw_text)
+
+        show_create = bool(raw_text) and TagSuggestService.find(raw_text) is None
+        self.btn_create.setVisible(show_create)
+        if show_create:
+            self.btn_create.setText(f"＋ 新建标签 \"{raw_text}\"")
+            self.btn_create.set_highlight(False)
+            self.nav_items.append(self.btn_create)
+
+        if raw_text:
+            matches = TagSuggestService.suggest(raw_text, SUGGEST_LIMIT)
+            self.nav_items += self.section_first.fill("搜索结果", matches, self.selected_tags)
+            self.section_second.fill("", [], self.selected_tags)
+        elif total:
+            self.nav_items += self.section_first.fill("最近使用", self.recent_tags, self.selected_tags, is_recent=True)
+            others = TagSuggestService.suggest("", SUGGEST_LIMIT, exclude=self.recent_tags)
+            shown_total = max(total - len(self.recent_tags), len(others))
+            self.nav_items += self.section_second.fill("所有标签", others, self.selected_tags, total=shown_total)
         else:
-            if self.recent_tags:
-                self.add_section("最近使用", self.recent_tags, is_recent=True)
-            
-            others = [t for t in self.all_db_tags if t not in self.recent_tags]
-            if others:
-                self.add_section("所有标签", others, is_recent=False)
-
-        self.content_layout.addStretch() 
+            self.section_first.fill("", [], self.selected_tags)
+            self.section_second.fill("", [], self.selected_tags)
 
         if self.nav_items:
             self.current_nav_index = 0
             self.nav_items[0].set_highlight(True)
 
-    def add_create_button(self, text):
-        btn = QPushButton(f"＋ 新建标签 \"{text}\"")
-        btn.setStyleSheet("""
-            QPushButton { 
-                text-align: left; 
-                padding: 8px; 
-                color: #4CAF50; 
-                font-weight: bold; 
-                background: #252526; 
-                border: 1px dashed #4CAF50; 
-                border-radius: 4px;
-            }
-            QPushButton:hover { background-color: #2D2D2D; }
-        """)
-        btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn.clicked.connect(lambda: self.create_and_select_tag(text))
-        
-        btn.set_highlight = lambda active: btn.setStyleSheet(
-            f"QPushButton {{ text-align: left; padding: 8px; color: #4CAF50; font-weight: bold; background: {'#2D2D2D' if active else '#252526'}; border: 1px dashed #4CAF50; border-radius: 4px; }}"
-        )
-        btn.is_create_btn = True
-        
-        self.content_layout.addWidget(btn)
-        self.nav_items.append(btn)
-
-    def add_section(self, title, tags, is_recent=False):
-        lbl_title = QLabel(f"{title} ({len(tags)})")
-        lbl_title.setStyleSheet("color: #888; font-size: 11px; font-weight: bold; text-transform: uppercase;")
-        self.content_layout.addWidget(lbl_title)
-
-        grid_widget = QWidget()
-        grid = QGridLayout(grid_widget)
-        grid.setContentsMargins(0, 0, 0, 0)
-        grid.setVerticalSpacing(2) 
-        grid.setHorizontalSpacing(8)
-        
-        for i, tag in enumerate(tags):
-            row = i // 2
-            col = i % 2
-            
-            is_selected = tag in self.selected_tags
-            item = TagGridItem(tag, is_recent, is_selected)
-            item.sig_clicked.connect(self.toggle_tag)
-            
-            grid.addWidget(item, row, col)
-            self.nav_items.append(item)
-            
-        self.content_layout.addWidget(grid_widget)
-
     def on_search(self, text):
         self.refresh_ui(text)
 
@@ -440,11 +464,12 @@ class TagSelectionPopup(QDialog):
             self.nav_items[old_idx].set_highlight(True)
 
     def create_and_select_tag(self, tag):
+        if not tag: return
         data_manager.add_tag(tag)
+        TagSuggestService.add_tags([tag])
         PreferenceService.add_recent_tag(tag)
         self.selected_tags.add(tag)
         
-        self.all_db_tags = data_manager.get_all_tags()
         self.recent_tags = PreferenceService.get_recent_tags()
         
         self.search_input.clear()
@@ -0,0 +1,179 @@
+# G:\PYthon\AssetManager\ui\thumbnail_loader.py
+
+import os
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, QByteArray, QBuffer, QIODevice, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap, QIcon
+from services.thumbnail_store import ThumbnailStore, THUMB_TIERS
+
+# === 缩略图参数 ===
+MEMORY_CACHE_BYTES = 192 * 1024 * 1024     # 内存 LRU 上限 (按像素字节估算)
+MAX_WORKERS = max(2, min(8, (os.cpu_count() or 4) - 1))
+JPEG_QUALITY = 85
+PREWARM_PRIORITY = 0                       # 预热任务优先级最低，可见项的请求总是先执行
+PREWARM_LIMIT = 5000                       # 单次预热最多排队的图片数 (超大递归视图只预热前面部分)
+
+def decode_thumbnail(path, size):
+    """
+    在工作线程中解码并缩放 (只用 QImage，不碰 QPixmap)。
+    QImageReader.setScaledSize 让 JPEG 在解码阶段直接按比例缩小，大图不必完整解码。
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)   # 按 EXIF 方向旋转
+    src = reader.size()
+    if src.isValid() and (src.width() > size or src.height() > size):
+        reader.setScaledSize(src.scaled(QSize(size, size), Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull(): return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(QSize(size, size), Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+    return image
+
+def _encode(image):
+    """带透明通道的存 PNG，其余存体积更小的 JPEG"""
+    fmt = "PNG" if image.hasAlphaChannel() else "JPG"
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, fmt, -1 if fmt == "PNG" else JPEG_QUALITY)
+    buffer.close()
+    return fmt, bytes(data)
+
+def build_tiers(path, mtime):
+    """解码一次原图，生成全部尺寸档位并写入缩略图库，返回 {tier: QImage}"""
+    image = decode_thumbnail(path, max(THUMB_TIERS))
+    if image.isNull(): return {}
+    images, encoded = {}, {}
+    for tier in THUMB_TIERS:
+        if image.width() > tier or image.height() > tier:
+            images[tier] = image.scaled(QSize(tier, tier), Qt.AspectRatioMode.KeepAspectRatio,
+                                        Qt.TransformationMode.SmoothTransformation)
+        else:
+            images[tier] = image
+        encoded[tier] = _encode(images[tier])
+    ThumbnailStore.put_many(path, mtime, encoded)
+    return images
+
+class _TaskSignals(QObject):
+    # path, tier, mtime, generation, image
+    finished = pyqtSignal(str, int, float, int, QImage)
+
+class _ThumbTask(QRunnable):
+    def __init__(self, loader, path, tier, generation, prewarm=False):
+        super().__init__()
+        self.loader = loader
+        self.signals = loader._signals
+        self.path = path
+        self.tier = tier
+        self.generation = generation
+        self.prewarm = prewarm
+        self.setAutoDelete(True)
+
+    def run(self):
+        # 排队期间已切换文件夹，直接放弃
+        if self.generation != self.loader.generation: return
+        image = QImage()
+        mtime = 0.0
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if self.prewarm:
+                if not ThumbnailStore.has_all_tiers(self.path, mtime): build_tiers(self.path, mtime)
+                return
+
+            # 先查缩略图库：看过的文件夹重新打开时只需解码几 KB 的小图
+            hit = ThumbnailStore.get(self.path, self.tier, mtime)
+            if hit is not None:
+                fmt, data = hit
+                image.loadFromData(data, fmt)
+            if image.isNull():
+                image = build_tiers(self.path, mtime).get(self.tier, QImage())
+        except Exception as e:
+            print(f"缩略图生成失败: {self.path} -> {e}")
+            if self.prewarm: return
+        self.signals.finished.emit(self.path, self.tier, mtime, self.generation, image)
+
+class ThumbnailLoader(QObject):
+    """
+    异步缩略图加载器：
+    - get() 命中内存 LRU 直接返回 QIcon，否则投递到线程池并返回 None (视图先显示占位图标)
+    - 只有真正被绘制的行才会调用 get()，因此只加载可见项
+    - 后提交的任务优先级更高，滚动时当前屏幕的缩略图先出来
+    - 工作线程先查持久化缩略图库 (ThumbnailStore)，未命中才解码原图
+    - 加载完成后发出 sig_ready(path)
+    """
+    sig_ready = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tier = THUMB_TIERS[0]
+        self.generation = 0
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_WORKERS)
+        self._signals = _TaskSignals()
+        self._signals.finished.connect(self._on_finished)
+        self._cache = OrderedDict()     # path -> (mtime, QIcon, nbytes)
+        self._cache_bytes = 0
+        self._pending = set()
+        self._failed = set()
+        self._priority = PREWARM_PRIORITY
+
+    def set_icon_size(self, size):
+        """选择不小于图标尺寸的最小档位；档位变化时清空内存缓存，视图重绘时按新档位重新请求"""
+        tier = next((t for t in THUMB_TIERS if t >= size), THUMB_TIERS[-1])
+        if tier == self.tier: return
+        self.tier = tier
+        self.cancel_pending()
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def get(self, path, mtime=None):
+        """返回已就绪的缩略图 QIcon；未就绪则排队加载并返回 None"""
+        hit = self._cache.get(path)
+        if hit is not None and (not mtime or hit[0] == mtime):
+            self._cache.move_to_end(path)
+            return hit[1]
+        if path not in self._pending and path not in self._failed:
+            self._pending.add(path)
+            self._priority += 1
+            self.pool.start(_ThumbTask(self, path, self.tier, self.generation), self._priority)
+        return None
+
+    def prewarm(self, paths):
+        """后台预热：为缩略图库中缺失的图片生成全部档位 (不进内存缓存、不发信号)"""
+        for path in paths[:PREWARM_LIMIT]:
+            if path in self._cache: continue
+            self.pool.start(_ThumbTask(self, path, self.tier, self.generation, prewarm=True), PREWARM_PRIORITY)
+
+    def forget(self, path):
+        """文件内容变化：丢弃该路径的内存缓存和失败记录，下次绘制时重新加载"""
+        old = self._cache.pop(path, None)
+        if old is not None: self._cache_bytes -= old[2]
+        self._failed.discard(path)
+
+    def cancel_pending(self):
+        """切换文件夹时调用：丢弃尚未开始的任务，正在执行的任务结果只进缓存"""
+        self.generation += 1
+        self.pool.clear()
+        self._pending.clear()
+        self._failed.clear()
+
+    def _on_finished(self, path, tier, mtime, generation, image):
+        if generation == self.generation: self._pending.discard(path)
+        if image.isNull():
+            if generation == self.generation: self._failed.add(path)
+            return
+        if tier != self.tier: return
+
+        # QPixmap 只能在 GUI 线程创建，这里 (槽函数) 已回到主线程
+        icon = QIcon(QPixmap.fromImage(image))
+        nbytes = image.sizeInBytes()
+        old = self._cache.pop(path, None)
+        if old is not None: self._cache_bytes -= old[2]
+        self._cache[path] = (mtime, icon, nbytes)
+        self._cache_bytes += nbytes
+        while self._cache_bytes > MEMORY_CACHE_BYTES and len(self._cache) > 1:
+            _, (_, _, freed) = self._cache.popitem(last=False)
+            self._cache_bytes -= freed
+
+        self.sig_ready.emit(path)